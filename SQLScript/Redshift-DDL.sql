@@ -150,8 +150,371 @@ CREATE TABLE BRONZE.DailyNurseStaffingBK(
 	Hrs_MedAide_ctr DECIMAL
 );
 
+-- The table the pipeline loads, with the layout above
+CREATE TABLE IF NOT EXISTS BRONZE.DailyNurseStaffing (LIKE BRONZE.DailyNurseStaffingBK);
+
 CREATE TABLE IF NOT EXISTS bronze.ingested_files (
     filename     VARCHAR(512) PRIMARY KEY,
     table_name   VARCHAR(128) NOT NULL,
     load_time    TIMESTAMP DEFAULT GETDATE()
-);
\ No newline at end of file
+);
+
+-- Incremental bronze -> silver processing.
+-- Every COPY is a load batch: its rows carry ingest_batch_id and its files are
+-- recorded in bronze.ingested_files.batch_id. Rows loaded before this change
+-- keep a NULL batch id; they are picked up by the first run of each silver
+-- step and by full refreshes.
+ALTER TABLE BRONZE.ProviderInfo ADD COLUMN ingest_batch_id BIGINT;
+ALTER TABLE BRONZE.DailyNurseStaffing ADD COLUMN ingest_batch_id BIGINT;
+ALTER TABLE bronze.ingested_files ADD COLUMN batch_id BIGINT;
+
+-- Per-target watermark: highest batch each step has consumed. updated_at is the
+-- as-of time of the last run; the gold refresh compares silver updated_at to it.
+CREATE TABLE IF NOT EXISTS silver.etl_watermark (
+    target_name    VARCHAR(128) PRIMARY KEY,
+    last_batch_id  BIGINT NOT NULL,
+    updated_at     TIMESTAMP DEFAULT GETDATE()
+);
+-- CSV -> Parquet conversion lineage: which Parquet object (and partition)
+-- every landed CSV produced. Written in the same transaction as the COPY.
+CREATE TABLE IF NOT EXISTS bronze.file_lineage (
+    filename         VARCHAR(512) NOT NULL,
+    source_key       VARCHAR(1024) NOT NULL,
+    parquet_key      VARCHAR(1024) NOT NULL,
+    partition_value  VARCHAR(128),
+    row_count        BIGINT,
+    size_bytes       BIGINT,
+    created_at       TIMESTAMP DEFAULT GETDATE()
+);
+
+-- Silver and gold tables the stored procedures maintain, with the columns
+-- they were first created with, so the physical design and the ADD COLUMNs
+-- below also apply on a new cluster (a no-op where a procedure already
+-- created them).
+CREATE TABLE IF NOT EXISTS silver.providerdim (
+    ccn VARCHAR,
+    providername VARCHAR,
+    provideraddress VARCHAR,
+    city VARCHAR,
+    state VARCHAR,
+    zipcode INT,
+    NumberOfBed INT,
+    latitude DECIMAL(10,6),
+    longitude DECIMAL(10,6),
+    updated_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS silver.StaffingTypeDim (
+    StaffingTypeID INT,
+    Title VARCHAR,
+    StaffingType VARCHAR,
+    Updated_At TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS silver.WorkDateDim (
+    WorkDateID INTEGER,
+    WorkDate DATE,
+    Month INTEGER,
+    MonthName VARCHAR,
+    Year INTEGER,
+    Quarter INTEGER,
+    updated_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS silver.Stage_DailyFacilityLogFact (
+    CCN VARCHAR,
+    WorkDateID VARCHAR,
+    NumOfPatient VARCHAR,
+    StaffingTypeID VARCHAR,
+    WorkHours DECIMAL,
+    Updated_At TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS silver.DailyFacilityLogFact (
+    CCN VARCHAR,
+    WorkDateID VARCHAR,
+    NumOfPatient INTEGER,
+    StaffingTypeID VARCHAR,
+    WorkHours DECIMAL,
+    updated_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS gold.provider_staffing_utilization_metric (
+    ccn VARCHAR(10),
+    month INTEGER,
+    monthname VARCHAR(20),
+    year INTEGER,
+    providername VARCHAR(255),
+    city VARCHAR(100),
+    state VARCHAR(2),
+    longitude DECIMAL(10,6),
+    latitude DECIMAL(10,6),
+    title VARCHAR(100),
+    staffingtype VARCHAR(100),
+    totalworkhour DECIMAL(10,2),
+    bedutilizationrate DECIMAL(10,2),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS gold.metric_refresh_log (
+    target_name VARCHAR(128),
+    year INTEGER,
+    month INTEGER,
+    refreshed_at TIMESTAMP
+);
+
+-- (year, month) groups each fact upsert touched, tagged with the load batch;
+-- the gold refresh reads and clears them instead of scanning the fact
+CREATE TABLE IF NOT EXISTS silver.fact_changed_months (
+    year INTEGER,
+    month INTEGER,
+    batch_id BIGINT,
+    recorded_at TIMESTAMP DEFAULT GETDATE()
+);
+
+-- Physical design.
+-- The fact rows, the provider dimension and their stage tables are
+-- distributed on the provider (ccn / PROVNUM / CMS_Certification_Number_CCN),
+-- so silver upserts and the gold join run slice-local instead of
+-- redistributing. Small dimensions and bookkeeping tables are DISTSTYLE ALL.
+-- Sort keys follow the access paths: bronze by load batch (silver steps read
+-- a batch window), the fact by its upsert key with WorkDateID first, gold by
+-- (year, month). Leading sort key columns stay RAW; other columns use AZ64
+-- (numbers, dates, timestamps) or ZSTD (text).
+-- The CREATE TABLE IF NOT EXISTS blocks in Redshift-StoreProcedure.sql
+-- carry the same design; the ALTERs below apply it to the tables above.
+ALTER TABLE BRONZE.ProviderInfo ALTER DISTKEY CMS_Certification_Number_CCN;
+ALTER TABLE BRONZE.ProviderInfo ALTER SORTKEY (ingest_batch_id);
+ALTER TABLE BRONZE.ProviderInfo ALTER ENCODE AUTO;
+
+ALTER TABLE BRONZE.DailyNurseStaffing ALTER DISTKEY PROVNUM;
+ALTER TABLE BRONZE.DailyNurseStaffing ALTER SORTKEY (ingest_batch_id);
+ALTER TABLE BRONZE.DailyNurseStaffing ALTER ENCODE AUTO;
+
+ALTER TABLE bronze.ingested_files ALTER DISTSTYLE ALL;
+ALTER TABLE bronze.ingested_files ALTER SORTKEY (batch_id);
+ALTER TABLE bronze.file_lineage ALTER SORTKEY (created_at);
+ALTER TABLE silver.etl_watermark ALTER DISTSTYLE ALL;
+
+ALTER TABLE silver.providerdim ALTER DISTKEY ccn;
+ALTER TABLE silver.providerdim ALTER SORTKEY (ccn);
+ALTER TABLE silver.providerdim ALTER COLUMN providername ENCODE ZSTD;
+ALTER TABLE silver.providerdim ALTER COLUMN provideraddress ENCODE ZSTD;
+ALTER TABLE silver.providerdim ALTER COLUMN city ENCODE ZSTD;
+ALTER TABLE silver.providerdim ALTER COLUMN state ENCODE ZSTD;
+ALTER TABLE silver.providerdim ALTER COLUMN zipcode ENCODE AZ64;
+ALTER TABLE silver.providerdim ALTER COLUMN numberofbed ENCODE AZ64;
+ALTER TABLE silver.providerdim ALTER COLUMN latitude ENCODE AZ64;
+ALTER TABLE silver.providerdim ALTER COLUMN longitude ENCODE AZ64;
+ALTER TABLE silver.providerdim ALTER COLUMN updated_at ENCODE AZ64;
+
+ALTER TABLE silver.StaffingTypeDim ALTER DISTSTYLE ALL;
+ALTER TABLE silver.StaffingTypeDim ALTER SORTKEY (StaffingTypeID);
+
+ALTER TABLE silver.WorkDateDim ALTER DISTSTYLE ALL;
+ALTER TABLE silver.WorkDateDim ALTER SORTKEY (WorkDateID);
+
+ALTER TABLE silver.Stage_DailyFacilityLogFact ALTER DISTKEY CCN;
+ALTER TABLE silver.Stage_DailyFacilityLogFact ALTER COMPOUND SORTKEY (WorkDateID, CCN, StaffingTypeID);
+
+ALTER TABLE silver.DailyFacilityLogFact ALTER DISTKEY CCN;
+ALTER TABLE silver.DailyFacilityLogFact ALTER COMPOUND SORTKEY (WorkDateID, CCN, StaffingTypeID);
+ALTER TABLE silver.DailyFacilityLogFact ALTER COLUMN StaffingTypeID ENCODE ZSTD;
+ALTER TABLE silver.DailyFacilityLogFact ALTER COLUMN NumOfPatient ENCODE AZ64;
+ALTER TABLE silver.DailyFacilityLogFact ALTER COLUMN WorkHours ENCODE AZ64;
+ALTER TABLE silver.DailyFacilityLogFact ALTER COLUMN updated_at ENCODE AZ64;
+
+ALTER TABLE gold.provider_staffing_utilization_metric ALTER DISTKEY ccn;
+ALTER TABLE gold.provider_staffing_utilization_metric ALTER COMPOUND SORTKEY (year, month);
+ALTER TABLE gold.metric_refresh_log ALTER DISTSTYLE ALL;
+ALTER TABLE silver.fact_changed_months ALTER DISTSTYLE ALL;
+ALTER TABLE silver.fact_changed_months ALTER SORTKEY (batch_id);
+
+-- Provider dimension change detection and optional type-2 history.
+-- row_hash is filled by sp_generate_silver_provider_dim for rows written
+-- before this change. Existing rows become the current version.
+ALTER TABLE silver.providerdim ADD COLUMN row_hash VARCHAR(32) ENCODE ZSTD;
+ALTER TABLE silver.providerdim ADD COLUMN effective_from TIMESTAMP ENCODE AZ64;
+ALTER TABLE silver.providerdim ADD COLUMN effective_to TIMESTAMP ENCODE AZ64;
+ALTER TABLE silver.providerdim ADD COLUMN is_current BOOLEAN DEFAULT TRUE;
+
+-- Data-quality history: one row per rule (plus the row count) per run of a
+-- rule set from airflow/dags/health_data/dq_rules.py. The row_count row's
+-- passed is the outcome of the whole run; the row-count delta rules compare
+-- against the row_count of the last run that passed.
+CREATE TABLE IF NOT EXISTS silver.dq_results (
+    run_id        VARCHAR(256) NOT NULL,
+    rule_set      VARCHAR(128) NOT NULL,
+    rule_name     VARCHAR(256) NOT NULL,
+    severity      VARCHAR(16),
+    metric_value  BIGINT,
+    passed        BOOLEAN,
+    checked_at    TIMESTAMP DEFAULT GETDATE()
+)
+DISTSTYLE ALL
+SORTKEY (rule_set, checked_at);
+
+-- File identity and the pending-files queue.
+-- A landed file is identified by its full S3 key plus ETag, so files with the
+-- same name under different prefixes no longer collide and a re-uploaded file
+-- with new content is loaded again. Runs enqueue the keys they are handed
+-- (S3 events via the trigger_mwaa Lambda) into bronze.pending_files and only
+-- read that queue; sp_ingest_batch_from_s3 records the loaded (s3_key, etag)
+-- in bronze.ingested_files and removes it from the queue in the same
+-- transaction. Files recorded before this change keep a NULL s3_key and etag
+-- (their prefix was not recorded) and are matched by filename, as the old
+-- list-and-diff did; they count as ingested whatever their content.
+ALTER TABLE bronze.ingested_files ADD COLUMN s3_key VARCHAR(1024);
+ALTER TABLE bronze.ingested_files ADD COLUMN etag VARCHAR(64);
+ALTER TABLE bronze.ingested_files ALTER SORTKEY (s3_key);
+
+CREATE TABLE IF NOT EXISTS bronze.pending_files (
+    s3_key      VARCHAR(1024) NOT NULL,
+    etag        VARCHAR(64) NOT NULL,
+    size_bytes  BIGINT,
+    queued_at   TIMESTAMP DEFAULT GETDATE(),
+    PRIMARY KEY (s3_key, etag)
+)
+DISTSTYLE ALL
+SORTKEY (s3_key);
+
+-- Staffing-type catalog: maps each BRONZE.DailyNurseStaffing hours column to
+-- a StaffingTypeID. silver.StaffingTypeDim and the fact unpivot are both
+-- generated from it. The seed is generated from STAFFING_TYPE_CATALOG in
+-- airflow/dags/health_data/staffing_types.py; change it there and paste
+-- catalog_seed_sql() here. Only the original types (1-4) are enabled; the
+-- others are catalogued but disabled. Enabling a type only affects batches
+-- loaded afterwards, run the DAG with {"full_refresh": true} to backfill it.
+CREATE TABLE IF NOT EXISTS silver.staffingtypecatalog (
+    StaffingTypeID  INT NOT NULL,
+    HoursColumn     VARCHAR(128) NOT NULL,
+    Title           VARCHAR(256) NOT NULL,
+    StaffingType    VARCHAR(64) NOT NULL,
+    Enabled         BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (StaffingTypeID)
+)
+DISTSTYLE ALL
+SORTKEY (StaffingTypeID);
+
+DELETE FROM silver.staffingtypecatalog;
+INSERT INTO silver.staffingtypecatalog (StaffingTypeID, HoursColumn, Title, StaffingType, Enabled) VALUES
+    (1, 'Hrs_RNDON_emp', 'Full Time Registered Nurse', 'Full Time', TRUE),
+    (2, 'Hrs_RNDON_ctr', 'Contract Registered Nurse', 'Contractor', TRUE),
+    (3, 'Hrs_CNA_emp', 'Full Time CNA', 'Full Time', TRUE),
+    (4, 'Hrs_CNA_ctr', 'Contract CNA', 'Contractor', TRUE),
+    (5, 'Hrs_RNadmin_emp', 'Full Time RN Admin', 'Full Time', FALSE),
+    (6, 'Hrs_RNadmin_ctr', 'Contract RN Admin', 'Contractor', FALSE),
+    (7, 'Hrs_RN_emp', 'Full Time RN Direct Care', 'Full Time', FALSE),
+    (8, 'Hrs_RN_ctr', 'Contract RN Direct Care', 'Contractor', FALSE),
+    (9, 'Hrs_LPNadmin_emp', 'Full Time LPN Admin', 'Full Time', FALSE),
+    (10, 'Hrs_LPNadmin_ctr', 'Contract LPN Admin', 'Contractor', FALSE),
+    (11, 'Hrs_LPN_emp', 'Full Time LPN', 'Full Time', FALSE),
+    (12, 'Hrs_LPN_ctr', 'Contract LPN', 'Contractor', FALSE),
+    (13, 'Hrs_NAtrn_emp', 'Full Time Nurse Aide in Training', 'Full Time', FALSE),
+    (14, 'Hrs_NAtrn_ctr', 'Contract Nurse Aide in Training', 'Contractor', FALSE),
+    (15, 'Hrs_MedAide_emp', 'Full Time Medication Aide', 'Full Time', FALSE),
+    (16, 'Hrs_MedAide_ctr', 'Contract Medication Aide', 'Contractor', FALSE);
+
+-- Power BI rollups. The base gold table gains its calendar quarter and the
+-- additive parts of bedutilizationrate (utilizationsum / utilizationcount)
+-- plus the fact row count, so coarser tables can be re-aggregated exactly.
+-- Rows written before this change have NULL sums: run the DAG once with
+-- {"full_refresh": true} to fill them and build the rollups.
+-- sp_refresh_gold_rollups creates and maintains the rollup tables; the seed
+-- below is generated from ROLLUPS in airflow/dags/health_data/rollups.py
+-- (catalog_seed_sql()) and lists, coarsest first, which table answers which
+-- grouping.
+ALTER TABLE gold.provider_staffing_utilization_metric ADD COLUMN quarter INTEGER ENCODE AZ64;
+ALTER TABLE gold.provider_staffing_utilization_metric ADD COLUMN utilizationsum DECIMAL(18,6) ENCODE AZ64;
+ALTER TABLE gold.provider_staffing_utilization_metric ADD COLUMN utilizationcount BIGINT ENCODE AZ64;
+ALTER TABLE gold.provider_staffing_utilization_metric ADD COLUMN recordcount BIGINT ENCODE AZ64;
+UPDATE gold.provider_staffing_utilization_metric SET quarter = (month + 2) / 3 WHERE quarter IS NULL;
+
+CREATE TABLE IF NOT EXISTS gold.rollup_catalog (
+    search_order  INT NOT NULL,
+    table_name    VARCHAR(128) NOT NULL,
+    grain         VARCHAR(256) NOT NULL,
+    dimensions    VARCHAR(512) NOT NULL,
+    description   VARCHAR(256),
+    PRIMARY KEY (table_name)
+)
+DISTSTYLE ALL
+SORTKEY (search_order);
+
+DELETE FROM gold.rollup_catalog;
+INSERT INTO gold.rollup_catalog (search_order, table_name, grain, dimensions, description) VALUES
+    (1, 'gold.rollup_staffingtype_year', 'title, staffingtype, year', 'title, staffingtype, year', 'Hours and utilization per staffing title and year, all providers'),
+    (2, 'gold.rollup_national_daily', 'workdateid', 'workdateid, workdate, year, quarter, month, monthname', 'National hours and utilization per day, all providers and titles'),
+    (3, 'gold.rollup_state_month', 'state, year, month', 'state, year, quarter, month, monthname', 'Hours and utilization per state and month, all staffing titles'),
+    (4, 'gold.rollup_provider_quarter', 'ccn, year, quarter', 'ccn, providername, city, state, year, quarter', 'Hours and utilization per provider and quarter, all staffing titles'),
+    (5, 'gold.provider_staffing_utilization_metric', 'ccn, year, month, title, staffingtype', 'ccn, providername, city, state, longitude, latitude, year, quarter, month, monthname, title, staffingtype', 'Base gold grain: provider, month and staffing title');
+
+-- Skip-if-unchanged cache: the fingerprint of the inputs (ingested file set,
+-- deployed procedures, DAG code) each validation / transform step last
+-- succeeded with, one row per step. Written by airflow/dags/health_data/step_cache.py.
+CREATE TABLE IF NOT EXISTS silver.step_cache (
+    step_name    VARCHAR(256) NOT NULL,
+    fingerprint  VARCHAR(64) NOT NULL,
+    run_id       VARCHAR(256),
+    outcome      VARCHAR(65535),
+    cached_at    TIMESTAMP DEFAULT GETDATE(),
+    PRIMARY KEY (step_name)
+)
+DISTSTYLE ALL
+SORTKEY (step_name);
+
+-- Per-stage metrics of each DAG run: one row per task (and map index), with
+-- wall time, rows / bytes and the Redshift queue / execution time of the
+-- step's queries. Written by the summarize_run task
+-- (airflow/dags/health_data/run_metrics.py), which also reads the p50 / p95
+-- of previous runs from it.
+CREATE TABLE IF NOT EXISTS silver.pipeline_run_metrics (
+    run_id         VARCHAR(256) NOT NULL,
+    task_id        VARCHAR(256) NOT NULL,
+    map_index      INTEGER,
+    state          VARCHAR(32),
+    started_at     TIMESTAMP,
+    ended_at       TIMESTAMP,
+    wall_seconds   DOUBLE PRECISION,
+    cached         BOOLEAN,
+    rows_read      BIGINT,
+    rows_written   BIGINT,
+    bytes_read     BIGINT,
+    bytes_written  BIGINT,
+    queries        INTEGER,
+    queue_seconds  DOUBLE PRECISION,
+    exec_seconds   DOUBLE PRECISION,
+    recorded_at    TIMESTAMP DEFAULT GETDATE()
+)
+DISTSTYLE ALL
+SORTKEY (task_id, recorded_at);
+
+-- Deduplication at ingest.
+-- Each landed file's SHA-256 is recorded in bronze.ingested_files.content_hash;
+-- a file with the same bytes as one already loaded is rejected and recorded
+-- with duplicate_of (the key it duplicates) and no batch_id. Bronze rows carry
+-- key_hash, the MD5 of the table's natural key (PROVNUM + WorkDate,
+-- CMS_Certification_Number_CCN); sp_merge_bronze_rows keeps the latest row
+-- per key, so bronze holds each key once and the silver procedures and
+-- validators read it without DISTINCT / UNION.
+ALTER TABLE bronze.ingested_files ADD COLUMN content_hash VARCHAR(64);
+ALTER TABLE bronze.ingested_files ADD COLUMN duplicate_of VARCHAR(1024);
+ALTER TABLE BRONZE.ProviderInfo ADD COLUMN key_hash VARCHAR(32) ENCODE ZSTD;
+ALTER TABLE BRONZE.DailyNurseStaffing ADD COLUMN key_hash VARCHAR(32) ENCODE ZSTD;
+-- Rows loaded before this change are merged by Redshift-Migration.sql.
+
+-- Historical backfill checkpoints: the last stage ('loaded', 'done') each
+-- partition (a CY_Qtr, or 'providerinfo') of a backfill reached. Written by
+-- health_data_backfill_dag (airflow/dags/health_data/backfill.py); partitions
+-- done under the same backfill_id are not run again.
+CREATE TABLE IF NOT EXISTS bronze.backfill_partitions (
+    backfill_id    VARCHAR(256) NOT NULL,
+    partition_key  VARCHAR(32) NOT NULL,
+    stage          VARCHAR(16) NOT NULL,
+    file_count     INTEGER,
+    run_id         VARCHAR(256),
+    updated_at     TIMESTAMP DEFAULT GETDATE(),
+    PRIMARY KEY (backfill_id, partition_key)
+)
+DISTSTYLE ALL
+SORTKEY (backfill_id);
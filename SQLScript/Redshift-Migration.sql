@@ -0,0 +1,8 @@
+-- One-off data migrations for clusters that held data before a change.
+-- Run once, after Redshift-DDL.sql and Redshift-StoreProcedure.sql; a new
+-- cluster does not need them.
+
+-- Deduplication at ingest: merge the bronze rows loaded before key_hash
+-- existed, keeping the latest row per natural key.
+CALL sp_merge_bronze_rows('ProviderInfo', 'bronze.ProviderInfo');
+CALL sp_merge_bronze_rows('DailyNurseStaffing', 'bronze.DailyNurseStaffing');
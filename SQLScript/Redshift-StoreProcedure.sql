@@ -7,6 +7,7 @@ DECLARE
     v_iam_role TEXT := 'arn:aws:iam::891662393358:role/health-data-project-role';
     v_filename TEXT;
     v_target_table TEXT;
+    v_batch_id BIGINT;
 BEGIN
     -- Extract just the filename
     v_filename := REGEXP_SUBSTR(v_file_path, '[^/]+$');
@@ -20,8 +21,17 @@ BEGIN
         RAISE EXCEPTION 'No matching table for file: %', v_filename;
     END IF;
 
-    -- Load into the right Bronze table
-    EXECUTE 'COPY bronze.' || v_target_table || '
+    -- Every load is a new batch; silver steps consume batches above their watermark
+    -- Numbered under a lock, as in sp_ingest_batch_from_s3
+    LOCK bronze.ingested_files;
+    SELECT COALESCE(MAX(batch_id), 0) + 1 INTO v_batch_id FROM bronze.ingested_files;
+
+    -- COPY into a staging copy of the Bronze table. FILLRECORD leaves the
+    -- trailing ingest_batch_id column NULL; it is stamped before the append.
+    DROP TABLE IF EXISTS stage_ingest;
+    EXECUTE 'CREATE TEMP TABLE stage_ingest (LIKE bronze.' || v_target_table || ')';
+
+    EXECUTE 'COPY stage_ingest
              FROM ''' || v_file_path || '''
              IAM_ROLE ''' || v_iam_role || '''
              CSV
@@ -32,42 +42,300 @@ BEGIN
              TRUNCATECOLUMNS
              ACCEPTINVCHARS;';
 
+    UPDATE stage_ingest SET ingest_batch_id = v_batch_id;
+
+    -- Load into the right Bronze table, one row per natural key
+    CALL sp_merge_bronze_rows(v_target_table, 'stage_ingest');
+
     -- Record ingestion in manifest using MERGE with dummy WHEN MATCHED clause
     EXECUTE '
         MERGE INTO bronze.ingested_files
         USING (
             SELECT ''' || v_filename || ''' AS filename,
+                   ''' || REGEXP_REPLACE(v_file_path, '^s3://[^/]+/', '') || ''' AS s3_key,
                    ''' || v_target_table || ''' AS table_name,
-                   GETDATE() AS load_time
+                   GETDATE() AS load_time,
+                   ' || v_batch_id || ' AS batch_id
         ) source
-        ON bronze.ingested_files.filename = source.filename
+        ON bronze.ingested_files.s3_key = source.s3_key
         WHEN MATCHED THEN
             UPDATE SET filename = bronze.ingested_files.filename
         WHEN NOT MATCHED THEN
-            INSERT (filename, table_name, load_time)
-            VALUES (source.filename, source.table_name, source.load_time);
+            INSERT (filename, s3_key, table_name, load_time, batch_id)
+            VALUES (source.filename, source.s3_key, source.table_name, source.load_time, source.batch_id);
     ';
 END;
 $$;
 
 
+CREATE OR REPLACE PROCEDURE sp_merge_bronze_rows(v_target_table VARCHAR, v_source VARCHAR)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_key TEXT;
+    v_latest TEXT;
+    v_columns TEXT := '';
+    v_source_rows BIGINT;
+    v_unique_rows BIGINT;
+    rec RECORD;
+BEGIN
+    -- Merges the rows of v_source (laid out like bronze.<v_target_table>) into
+    -- that table so it holds each natural key once: key_hash is stamped, the
+    -- latest row per key is kept and replaces the bronze row of the same key.
+    -- Downstream SQL can then read bronze without DISTINCT / UNION dedupes.
+    -- The keys are KEY_COLUMNS of airflow/dags/health_data/prevalidate.py.
+    IF v_target_table = 'DailyNurseStaffing' THEN
+        v_key := 'TRIM(PROVNUM) || ''|'' || TRIM(WorkDate)';
+        v_latest := 'ingest_batch_id DESC NULLS LAST';
+    ELSIF v_target_table = 'ProviderInfo' THEN
+        v_key := 'TRIM(CMS_Certification_Number_CCN)';
+        v_latest := 'ingest_batch_id DESC NULLS LAST, Processing_Date DESC NULLS LAST';
+    ELSE
+        RAISE EXCEPTION 'No matching table: %', v_target_table;
+    END IF;
+
+    EXECUTE 'UPDATE ' || v_source || ' SET key_hash = MD5(' || v_key || ') WHERE key_hash IS NULL';
+
+    FOR rec IN
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = 'bronze' AND table_name = LOWER(v_target_table)
+        ORDER BY ordinal_position
+    LOOP
+        v_columns := v_columns || CASE WHEN v_columns = '' THEN '' ELSE ', ' END
+            || QUOTE_IDENT(rec.column_name);
+    END LOOP;
+
+    DROP TABLE IF EXISTS stage_bronze_unique;
+    EXECUTE 'CREATE TEMP TABLE stage_bronze_unique (LIKE bronze.' || v_target_table || ')';
+
+    EXECUTE 'INSERT INTO stage_bronze_unique
+    SELECT ' || v_columns || '
+    FROM (
+        SELECT *, ROW_NUMBER() OVER (PARTITION BY key_hash ORDER BY ' || v_latest || ') AS key_rank
+        FROM ' || v_source || '
+    ) ranked
+    WHERE key_rank = 1';
+
+    EXECUTE 'SELECT COUNT(*) FROM ' || v_source INTO v_source_rows;
+    SELECT COUNT(*) INTO v_unique_rows FROM stage_bronze_unique;
+
+    -- Keys seen before are replaced by the new row; the join reads only the
+    -- key_hash column of bronze
+    EXECUTE 'DELETE FROM bronze.' || v_target_table || '
+    USING stage_bronze_unique s
+    WHERE bronze.' || v_target_table || '.key_hash = s.key_hash';
+
+    EXECUTE 'INSERT INTO bronze.' || v_target_table || ' SELECT * FROM stage_bronze_unique';
+
+    RAISE INFO 'bronze.%: % row(s) merged as % unique key(s)', v_target_table, v_source_rows, v_unique_rows;
+END;
+$$;
+
+
+CREATE OR REPLACE PROCEDURE sp_ingest_batch_from_s3(v_manifest_path VARCHAR, v_target_table VARCHAR)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    CALL sp_ingest_batch_from_s3(v_manifest_path, v_target_table, 'CSV');
+END;
+$$;
+
+
+CREATE OR REPLACE PROCEDURE sp_ingest_batch_from_s3(v_manifest_path VARCHAR, v_target_table VARCHAR, v_format VARCHAR)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_iam_role TEXT := 'arn:aws:iam::891662393358:role/health-data-project-role';
+    v_batch_id BIGINT;
+    v_format_options TEXT;
+BEGIN
+    -- Loads every file listed in a COPY manifest into one Bronze table as a
+    -- single batch. The caller stages the manifest's files in the temp
+    -- table stage_ingest_files(filename, s3_key, etag, content_hash) within
+    -- the same transaction. Rows are merged by natural key, so a key loaded
+    -- again replaces its earlier row instead of duplicating it.
+    -- v_format is 'CSV' for the raw landed files or 'PARQUET' for the typed
+    -- files written by the DAG's convert_to_parquet task.
+    IF v_target_table NOT IN ('DailyNurseStaffing', 'ProviderInfo') THEN
+        RAISE EXCEPTION 'No matching table: %', v_target_table;
+    END IF;
+
+    IF UPPER(v_format) = 'PARQUET' THEN
+        -- Columns are already typed, truncated and filled by the conversion
+        v_format_options := 'FORMAT AS PARQUET';
+    ELSIF UPPER(v_format) = 'CSV' THEN
+        v_format_options := 'CSV
+             IGNOREHEADER 1
+             DELIMITER '',''
+             QUOTE ''"''
+             FILLRECORD
+             TRUNCATECOLUMNS
+             ACCEPTINVCHARS';
+    ELSE
+        RAISE EXCEPTION 'Unsupported load format: %', v_format;
+    END IF;
+
+    -- Loads of different tables run at the same time (the DAG's mapped,
+    -- deferred COPYs): hold bronze.ingested_files until this batch commits,
+    -- so the next load numbers its batch after this one instead of taking
+    -- the same id or aborting on a serializable isolation violation
+    LOCK bronze.ingested_files;
+
+    SELECT COALESCE(MAX(batch_id), 0) + 1 INTO v_batch_id FROM bronze.ingested_files;
+
+    DROP TABLE IF EXISTS stage_ingest;
+    EXECUTE 'CREATE TEMP TABLE stage_ingest (LIKE bronze.' || v_target_table || ')';
+
+    -- One COPY for the whole group, Redshift spreads the files over the slices
+    EXECUTE 'COPY stage_ingest
+             FROM ''' || v_manifest_path || '''
+             IAM_ROLE ''' || v_iam_role || '''
+             MANIFEST
+             ' || v_format_options || ';';
+
+    UPDATE stage_ingest SET ingest_batch_id = v_batch_id;
+
+    CALL sp_merge_bronze_rows(v_target_table, 'stage_ingest');
+
+    -- Record every file of the batch in the manifest with one statement; a
+    -- key loaded again (new content) keeps one row with its latest ETag
+    MERGE INTO bronze.ingested_files
+    USING (SELECT DISTINCT filename, s3_key, etag, content_hash FROM stage_ingest_files) source
+    ON bronze.ingested_files.s3_key = source.s3_key
+    WHEN MATCHED THEN
+        UPDATE SET etag = source.etag, content_hash = source.content_hash,
+                   duplicate_of = NULL, table_name = v_target_table,
+                   load_time = GETDATE(), batch_id = v_batch_id
+    WHEN NOT MATCHED THEN
+        INSERT (filename, s3_key, etag, content_hash, table_name, load_time, batch_id)
+        VALUES (source.filename, source.s3_key, source.etag, source.content_hash,
+                v_target_table, GETDATE(), v_batch_id);
+
+    -- Loaded files leave the pending queue with the batch
+    DELETE FROM bronze.pending_files
+    USING stage_ingest_files s
+    WHERE bronze.pending_files.s3_key = s.s3_key
+      AND bronze.pending_files.etag = s.etag;
+END;
+$$;
+
+
+CREATE OR REPLACE PROCEDURE sp_set_etl_watermark(p_target_name VARCHAR, p_last_batch_id BIGINT)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    CALL sp_set_etl_watermark(p_target_name, p_last_batch_id, GETDATE());
+END;
+$$;
+
+
+CREATE OR REPLACE PROCEDURE sp_set_etl_watermark(p_target_name VARCHAR, p_last_batch_id BIGINT, p_as_of TIMESTAMP)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Record the highest bronze batch consumed by a target, as of p_as_of
+    MERGE INTO silver.etl_watermark
+    USING (
+        SELECT p_target_name AS target_name,
+               p_last_batch_id AS last_batch_id,
+               p_as_of AS updated_at
+    ) source
+    ON silver.etl_watermark.target_name = source.target_name
+    WHEN MATCHED THEN
+        UPDATE SET last_batch_id = source.last_batch_id,
+                   updated_at = source.updated_at
+    WHEN NOT MATCHED THEN
+        INSERT (target_name, last_batch_id, updated_at)
+        VALUES (source.target_name, source.last_batch_id, source.updated_at);
+END;
+$$;
+
+
+-- Row hash over the tracked provider attributes. Stage rows and dimension
+-- rows are compared on it, so unchanged providers are never rewritten.
+CREATE OR REPLACE FUNCTION f_provider_row_hash(
+    VARCHAR, VARCHAR, VARCHAR, VARCHAR, INT, INT, DECIMAL(10,6), DECIMAL(10,6)
+)
+RETURNS VARCHAR(32)
+IMMUTABLE
+AS $$
+    SELECT MD5(
+        COALESCE($1, '<NULL>') || '|' ||
+        COALESCE($2, '<NULL>') || '|' ||
+        COALESCE($3, '<NULL>') || '|' ||
+        COALESCE($4, '<NULL>') || '|' ||
+        COALESCE($5::VARCHAR, '<NULL>') || '|' ||
+        COALESCE($6::VARCHAR, '<NULL>') || '|' ||
+        COALESCE($7::VARCHAR, '<NULL>') || '|' ||
+        COALESCE($8::VARCHAR, '<NULL>')
+    )
+$$ LANGUAGE sql;
+
+
 CREATE OR REPLACE PROCEDURE sp_generate_silver_provider_dim()
 LANGUAGE plpgsql
 AS $$
 BEGIN
+    CALL sp_generate_silver_provider_dim(FALSE, FALSE);
+END;
+$$;
+
+
+CREATE OR REPLACE PROCEDURE sp_generate_silver_provider_dim(p_full_refresh BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    CALL sp_generate_silver_provider_dim(p_full_refresh, FALSE);
+END;
+$$;
+
+
+CREATE OR REPLACE PROCEDURE sp_generate_silver_provider_dim(p_full_refresh BOOLEAN, p_track_history BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_last_batch BIGINT;
+    v_max_batch BIGINT;
+    v_now TIMESTAMP := GETDATE();
+BEGIN
+    -- p_track_history FALSE: type 1, changed providers are updated in place.
+    -- p_track_history TRUE: type 2, a changed provider's current row is closed
+    -- (effective_to, is_current = FALSE) and a new version is inserted.
+    -- Either way only new or changed providers (by row_hash) are written.
+
+    -- Batch window (v_last_batch, v_max_batch]; -1 reprocesses all of bronze
+    SELECT last_batch_id INTO v_last_batch
+    FROM silver.etl_watermark
+    WHERE target_name = 'silver.providerdim';
+
+    IF p_full_refresh OR v_last_batch IS NULL THEN
+        v_last_batch := -1;
+    END IF;
+
+    SELECT COALESCE(MAX(batch_id), 0) INTO v_max_batch FROM bronze.ingested_files;
+
     -- Create silver table if not exists
+    -- Distributed on ccn like the fact table, so the gold join and the
+    -- upsert below stay slice-local
     CREATE TABLE IF NOT EXISTS silver.providerdim (
-        ccn VARCHAR,
-        providername VARCHAR,
-        provideraddress VARCHAR,
-        city VARCHAR,
-        state VARCHAR,
-        zipcode INT,
-        NumberOfBed INT,
-        latitude DECIMAL(10,6),
-        longitude DECIMAL(10,6),
-        updated_at TIMESTAMP
-    );
+        ccn VARCHAR ENCODE RAW,
+        providername VARCHAR ENCODE ZSTD,
+        provideraddress VARCHAR ENCODE ZSTD,
+        city VARCHAR ENCODE ZSTD,
+        state VARCHAR ENCODE ZSTD,
+        zipcode INT ENCODE AZ64,
+        NumberOfBed INT ENCODE AZ64,
+        latitude DECIMAL(10,6) ENCODE AZ64,
+        longitude DECIMAL(10,6) ENCODE AZ64,
+        updated_at TIMESTAMP ENCODE AZ64,
+        row_hash VARCHAR(32) ENCODE ZSTD,
+        effective_from TIMESTAMP ENCODE AZ64,
+        effective_to TIMESTAMP ENCODE AZ64,
+        is_current BOOLEAN DEFAULT TRUE
+    )
+    DISTKEY (ccn)
+    SORTKEY (ccn);
 
     -- Drop temp table if it exists
     DROP TABLE IF EXISTS stage_provider_dim;
@@ -83,10 +351,12 @@ BEGIN
         NumberOfBed INT,
         latitude DECIMAL(10,6),
         longitude DECIMAL(10,6),
-        updated_at TIMESTAMP
-    );
+        row_hash VARCHAR(32)
+    )
+    DISTKEY (ccn);
 
-    -- Populate staging table
+    -- Populate staging table: bronze holds one row per provider (merged by
+    -- key at load), so the batch window is read as is
     INSERT INTO stage_provider_dim (
         ccn,
         providername,
@@ -97,37 +367,86 @@ BEGIN
         numberofbed,
         latitude,
         longitude,
-        updated_at
+        row_hash
     )
-    SELECT DISTINCT
-        CMS_Certification_Number_CCN,
-        Provider_Name,
-        Provider_Address,
-        City_Town,
-        State,
-        ZIP_Code,
-        Number_of_Certified_Beds,
-        Latitude,
-        Longitude,
-        CURRENT_TIMESTAMP
-    FROM bronze.providerinfo;
+    SELECT
+        ccn,
+        providername,
+        provideraddress,
+        city,
+        state,
+        zipcode,
+        numberofbed,
+        latitude,
+        longitude,
+        f_provider_row_hash(
+            providername, provideraddress, city, state,
+            zipcode, numberofbed, latitude, longitude
+        )
+    FROM (
+        SELECT
+            CMS_Certification_Number_CCN AS ccn,
+            Provider_Name AS providername,
+            Provider_Address AS provideraddress,
+            City_Town AS city,
+            State AS state,
+            ZIP_Code AS zipcode,
+            Number_of_Certified_Beds AS numberofbed,
+            Latitude::DECIMAL(10,6) AS latitude,
+            Longitude::DECIMAL(10,6) AS longitude
+        FROM bronze.providerinfo
+        WHERE (v_last_batch < 0 AND ingest_batch_id IS NULL)
+           OR ingest_batch_id BETWEEN v_last_batch + 1 AND v_max_batch
+    ) latest;
 
-    -- Update existing records
-    UPDATE silver.providerdim AS d
-    SET
-        providername = s.providername,
-        provideraddress = s.provideraddress,
-        city = s.city,
-        state = s.state,
-        zipcode = s.zipcode,
-        numberofbed=s.numberofbed,
-        latitude = s.latitude,
-        longitude = s.longitude,
-        updated_at = CURRENT_TIMESTAMP
+    -- Rows written before row_hash existed get theirs once; a no-op afterwards
+    UPDATE silver.providerdim
+    SET row_hash = f_provider_row_hash(
+            providername, provideraddress, city, state,
+            zipcode, numberofbed, latitude, longitude
+        ),
+        effective_from = COALESCE(effective_from, updated_at),
+        is_current = COALESCE(is_current, TRUE)
+    WHERE row_hash IS NULL;
+
+    -- Providers whose attributes changed; unchanged ones are left untouched
+    -- (in Redshift an UPDATE is a delete plus an insert)
+    DROP TABLE IF EXISTS stage_provider_changed;
+
+    CREATE TEMP TABLE stage_provider_changed DISTKEY (ccn) AS
+    SELECT s.*
     FROM stage_provider_dim s
-    WHERE d.ccn = s.ccn;
+    INNER JOIN silver.providerdim d ON d.ccn = s.ccn AND d.is_current
+    WHERE d.row_hash <> s.row_hash;
 
-    -- Insert new records
+    IF p_track_history THEN
+        -- Close the current version of every changed provider
+        UPDATE silver.providerdim AS d
+        SET
+            effective_to = v_now,
+            is_current = FALSE,
+            updated_at = v_now
+        FROM stage_provider_changed s
+        WHERE d.ccn = s.ccn AND d.is_current;
+    ELSE
+        -- Update changed records in place
+        UPDATE silver.providerdim AS d
+        SET
+            providername = s.providername,
+            provideraddress = s.provideraddress,
+            city = s.city,
+            state = s.state,
+            zipcode = s.zipcode,
+            numberofbed=s.numberofbed,
+            latitude = s.latitude,
+            longitude = s.longitude,
+            row_hash = s.row_hash,
+            updated_at = v_now
+        FROM stage_provider_changed s
+        WHERE d.ccn = s.ccn AND d.is_current;
+    END IF;
+
+    -- Insert new providers (and, with history, the new version of changed ones)
     INSERT INTO silver.providerdim (
         ccn,
         providername,
@@ -138,7 +457,11 @@ BEGIN
         numberofbed,
         latitude,
         longitude,
-        updated_at
+        updated_at,
+        row_hash,
+        effective_from,
+        effective_to,
+        is_current
     )
     SELECT
         s.ccn,
@@ -150,10 +473,16 @@ BEGIN
         s.numberofbed,
         s.latitude,
         s.longitude,
-        CURRENT_TIMESTAMP
+        v_now,
+        s.row_hash,
+        v_now,
+        NULL,
+        TRUE
     FROM stage_provider_dim s
-    LEFT JOIN silver.providerdim d ON s.ccn = d.ccn
+    LEFT JOIN silver.providerdim d ON s.ccn = d.ccn AND d.is_current
     WHERE d.ccn IS NULL;
+
+    CALL sp_set_etl_watermark('silver.providerdim', v_max_batch);
 END;
 $$;
 
@@ -166,27 +495,30 @@ BEGIN
     
 
     -- Optional: create silver table if not exists
+    -- A handful of rows: copied to every node so no join redistributes it
     CREATE TABLE IF NOT EXISTS silver.StaffingTypeDim (
-         StaffingTypeID INT,
-         Title VARCHAR,
-         StaffingType VARCHAR,
-         Updated_At TIMESTAMP
-    );
+         StaffingTypeID INT ENCODE RAW,
+         Title VARCHAR ENCODE ZSTD,
+         StaffingType VARCHAR ENCODE ZSTD,
+         Updated_At TIMESTAMP ENCODE AZ64
+    )
+    DISTSTYLE ALL
+    SORTKEY (StaffingTypeID);
 
     --DROP TEMP TABLE
     -- Drop temp table if it exists
     DROP TABLE IF EXISTS stage_staffingtype_dim;
     
-    -- Upsert using staging table
+    -- Upsert using staging table, built from the staffing-type catalog (all
+    -- types, so disabled ones keep their dimension row)
     CREATE TEMP TABLE stage_staffingtype_dim AS
     (
-        SELECT 1 AS StaffingTypeID,'Full Time Registered Nurse' AS Title,'Full Time' AS StaffingType,CURRENT_TIMESTAMP AS Updated_At
-        UNION
-        SELECT 2 AS StaffingTypeID,'Contract Registered Nurse' AS Title,'Contractor' AS StaffingType,CURRENT_TIMESTAMP AS Updated_At
-        UNION
-        SELECT 3 AS StaffingTypeID,'Full Time CNA' AS Title,'Full Time' AS StaffingType,CURRENT_TIMESTAMP AS Updated_At
-        UNION
-        SELECT 4 AS StaffingTypeID,'Contract CNA' AS Title,'Contractor' AS StaffingType,CURRENT_TIMESTAMP AS Updated_At
+        SELECT
+            StaffingTypeID,
+            Title,
+            StaffingType,
+            CURRENT_TIMESTAMP AS Updated_At
+        FROM silver.staffingtypecatalog
     );
 
     -- Update existing records
@@ -196,7 +528,10 @@ BEGIN
         StaffingType=s.StaffingType,
         Updated_At = CURRENT_TIMESTAMP
     FROM stage_staffingtype_dim s
-    WHERE d.StaffingTypeID = s.StaffingTypeID;
+    WHERE d.StaffingTypeID = s.StaffingTypeID
+      -- Only touch rows that changed, so the gold refresh does not see every
+      -- staffing type as updated on each run
+      AND (d.Title <> s.Title OR d.StaffingType <> s.StaffingType);
 
     -- Insert new records
     INSERT INTO silver.StaffingTypeDim (
@@ -217,67 +552,118 @@ BEGIN
 END;
 $$;
 
-CREATE OR REPLACE PROCEDURE sp_generate_silver_fact_table()
+CREATE OR REPLACE PROCEDURE sp_stage_silver_fact_table()
 LANGUAGE plpgsql
 AS $$
+BEGIN
+    CALL sp_stage_silver_fact_table(FALSE);
+END;
+$$;
 
+CREATE OR REPLACE PROCEDURE sp_stage_silver_fact_table(p_full_refresh BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_last_batch BIGINT;
+    v_max_batch BIGINT;
+    v_hours_case TEXT := '';
+    rec RECORD;
 BEGIN
-    -- Optional: create silver table if not exists
-    CREATE TABLE IF NOT EXISTS silver.DailyFacilityLogFact (
-        CCN VARCHAR,
-        WorkDateID VARCHAR,
-        NumOfPatient INTEGER,
-        StaffingTypeID VARCHAR,
-        WorkHours DECIMAL, 
-        updated_at TIMESTAMP
-    );
+    -- Stage only the batches the fact table has not consumed yet;
+    -- -1 reprocesses all of bronze
+    SELECT last_batch_id INTO v_last_batch
+    FROM silver.etl_watermark
+    WHERE target_name = 'silver.dailyfacilitylogfact';
 
-    --DROP TEMP TABLE
-    -- Drop temp table if it exists
-    DROP TABLE IF EXISTS stage_fact_table;
-    
-    -- Upsert using staging table
-    CREATE TEMP TABLE stage_fact_table AS
-    SELECT *
-    FROM (
-        SELECT 
-            PROVNUM AS CCN, 
-            WorkDate AS WorkDateID, 
-            MDScensus AS NumOfPatient, 
-            '1' AS StaffingTypeID, 
-            Hrs_RNDON_emp AS WorkHours,
-            CURRENT_TIMESTAMP AS Updated_At
-        FROM BRONZE.DailyNurseStaffing
-        UNION
-        SELECT 
-            PROVNUM, 
-            WorkDate, 
-            MDScensus, 
-            '2', 
-            Hrs_RNDON_ctr, 
-            CURRENT_TIMESTAMP
-        FROM BRONZE.DailyNurseStaffing
-        UNION
-        SELECT PROVNUM, 
-            WorkDate,
-            MDScensus, 
-            '3', 
-            Hrs_CNA_emp, 
-            CURRENT_TIMESTAMP
-        FROM BRONZE.DailyNurseStaffing
-        UNION
-        SELECT 
-            PROVNUM, 
-            WorkDate,
-             MDScensus, 
-             '4', 
-             Hrs_CNA_ctr, 
-             CURRENT_TIMESTAMP
-        FROM BRONZE.DailyNurseStaffing
-    ) AS unioned_data
-    ORDER BY WorkDateID ASC;
+    IF p_full_refresh OR v_last_batch IS NULL THEN
+        v_last_batch := -1;
+    END IF;
+
+    SELECT COALESCE(MAX(batch_id), 0) INTO v_max_batch FROM bronze.ingested_files;
+
+    -- Staged, unpivoted fact rows shared by validate_fact_table and
+    -- sp_generate_silver_fact_table (one row per provider/day/staffing type)
+    -- Same distribution and sort order as silver.DailyFacilityLogFact, so
+    -- the upsert joins slice-local and merge-joins on the sort key
+    CREATE TABLE IF NOT EXISTS silver.Stage_DailyFacilityLogFact (
+        CCN VARCHAR ENCODE RAW,
+        WorkDateID VARCHAR ENCODE RAW,
+        NumOfPatient VARCHAR ENCODE ZSTD,
+        StaffingTypeID VARCHAR ENCODE ZSTD,
+        WorkHours DECIMAL ENCODE AZ64,
+        Updated_At TIMESTAMP ENCODE AZ64
+    )
+    DISTKEY (CCN)
+    COMPOUND SORTKEY (WorkDateID, CCN, StaffingTypeID);
+
+    -- DELETE, not TRUNCATE: TRUNCATE commits, which breaks the procedure's
+    -- atomicity and fails when it is CALLed inside a transaction block
+    DELETE FROM silver.Stage_DailyFacilityLogFact;
 
+    -- One CASE branch per enabled type of silver.staffingtypecatalog picks
+    -- the type's hours column
+    FOR rec IN
+        SELECT StaffingTypeID, HoursColumn
+        FROM silver.staffingtypecatalog
+        WHERE Enabled
+        ORDER BY StaffingTypeID
+    LOOP
+        v_hours_case := v_hours_case || '
+            WHEN ' || rec.StaffingTypeID || ' THEN b.' || QUOTE_IDENT(LOWER(rec.HoursColumn));
+    END LOOP;
 
+    IF v_hours_case = '' THEN
+        RAISE EXCEPTION 'No enabled staffing types in silver.staffingtypecatalog';
+    END IF;
+
+    -- Single pass over bronze: each row is fanned out to the enabled staffing
+    -- types through a cross join with the catalog. No UNION dedupe sort and
+    -- no global ORDER BY, however many types are enabled.
+    EXECUTE 'INSERT INTO silver.Stage_DailyFacilityLogFact
+    (CCN, WorkDateID, NumOfPatient, StaffingTypeID, WorkHours, Updated_At)
+    SELECT
+        b.PROVNUM,
+        b.WorkDate,
+        b.MDScensus,
+        CAST(t.StaffingTypeID AS VARCHAR),
+        CASE t.StaffingTypeID' || v_hours_case || '
+        END,
+        CURRENT_TIMESTAMP
+    FROM BRONZE.DailyNurseStaffing b
+    CROSS JOIN (
+        SELECT StaffingTypeID FROM silver.staffingtypecatalog WHERE Enabled
+    ) AS t
+    WHERE (' || v_last_batch || ' < 0 AND b.ingest_batch_id IS NULL)
+       OR b.ingest_batch_id BETWEEN ' || (v_last_batch + 1) || ' AND ' || v_max_batch;
+
+    -- Pending high mark; sp_generate_silver_fact_table() commits it to the
+    -- fact watermark once the staged rows are upserted
+    CALL sp_set_etl_watermark('silver.stage_dailyfacilitylogfact', v_max_batch);
+END
+$$;
+
+CREATE OR REPLACE PROCEDURE sp_generate_silver_fact_table()
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_staged_batch BIGINT;
+BEGIN
+    -- Optional: create silver table if not exists
+    -- Distributed on CCN (co-located with silver.providerdim and the stage
+    -- table) and sorted on the upsert key, WorkDateID first so the gold
+    -- refresh of changed months reads a range of blocks
+    CREATE TABLE IF NOT EXISTS silver.DailyFacilityLogFact (
+        CCN VARCHAR ENCODE RAW,
+        WorkDateID VARCHAR ENCODE RAW,
+        NumOfPatient INTEGER ENCODE AZ64,
+        StaffingTypeID VARCHAR ENCODE ZSTD,
+        WorkHours DECIMAL ENCODE AZ64,
+        updated_at TIMESTAMP ENCODE AZ64
+    )
+    DISTKEY (CCN)
+    COMPOUND SORTKEY (WorkDateID, CCN, StaffingTypeID);
+
+    -- Upsert from the staged unpivot built by sp_stage_silver_fact_table()
 
     -- Update existing records
    UPDATE silver.DailyFacilityLogFact AS d
@@ -285,7 +671,7 @@ BEGIN
         NumOfPatient = CAST(s.NumOfPatient AS INTEGER),
     	WorkHours = CAST(s.WorkHours AS DECIMAL),
         updated_at = CURRENT_TIMESTAMP
-    FROM stage_fact_table s
+    FROM silver.Stage_DailyFacilityLogFact s
     WHERE d.CCN = s.CCN AND d.WorkDateID = s.WorkDateID AND d.StaffingTypeID = s.StaffingTypeID;
 
 
@@ -299,9 +685,35 @@ BEGIN
     	s.StaffingTypeID,
     	CAST(s.WorkHours AS DECIMAL),
         CURRENT_TIMESTAMP
-    FROM stage_fact_table s 
+    FROM silver.Stage_DailyFacilityLogFact s 
     LEFT JOIN silver.DailyFacilityLogFact d ON d.CCN = s.CCN AND d.WorkDateID = s.WorkDateID AND d.StaffingTypeID = s.StaffingTypeID
     WHERE d.CCN IS NULL AND d.WorkDateID IS NULL AND d.StaffingTypeID IS NULL;
+
+    SELECT last_batch_id INTO v_staged_batch
+    FROM silver.etl_watermark
+    WHERE target_name = 'silver.stage_dailyfacilitylogfact';
+
+    -- Months this upsert touched, for the gold refresh. Read from the stage,
+    -- so the work follows the delta, and kept until gold has covered the batch.
+    CREATE TABLE IF NOT EXISTS silver.fact_changed_months (
+        year INTEGER ENCODE RAW,
+        month INTEGER ENCODE RAW,
+        batch_id BIGINT ENCODE AZ64,
+        recorded_at TIMESTAMP DEFAULT GETDATE() ENCODE AZ64
+    )
+    DISTSTYLE ALL
+    SORTKEY (batch_id);
+
+    INSERT INTO silver.fact_changed_months (year, month, batch_id)
+    SELECT DISTINCT
+        CAST(LEFT(s.WorkDateID, 4) AS INTEGER),
+        CAST(SUBSTRING(s.WorkDateID, 5, 2) AS INTEGER),
+        COALESCE(v_staged_batch, 0)
+    FROM silver.Stage_DailyFacilityLogFact s;
+
+    IF v_staged_batch IS NOT NULL THEN
+        CALL sp_set_etl_watermark('silver.dailyfacilitylogfact', v_staged_batch);
+    END IF;
 END
 $$;
 
@@ -309,16 +721,41 @@ CREATE OR REPLACE PROCEDURE sp_generate_silver_workdate_dim()
 LANGUAGE plpgsql
 AS $$
 BEGIN
+    CALL sp_generate_silver_workdate_dim(FALSE);
+END
+$$;
+
+CREATE OR REPLACE PROCEDURE sp_generate_silver_workdate_dim(p_full_refresh BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_last_batch BIGINT;
+    v_max_batch BIGINT;
+BEGIN
+    -- Batch window (v_last_batch, v_max_batch]; -1 reprocesses all of bronze
+    SELECT last_batch_id INTO v_last_batch
+    FROM silver.etl_watermark
+    WHERE target_name = 'silver.workdatedim';
+
+    IF p_full_refresh OR v_last_batch IS NULL THEN
+        v_last_batch := -1;
+    END IF;
+
+    SELECT COALESCE(MAX(batch_id), 0) INTO v_max_batch FROM bronze.ingested_files;
+
     -- Create silver table if not exists
+    -- One row per day: replicated to every node for the fact joins
     CREATE TABLE IF NOT EXISTS silver.WorkDateDim (
-        WorkDateID INTEGER,
-        WorkDate DATE,
-        Month INTEGER,
-        MonthName VARCHAR,
-        Year INTEGER,
-        Quarter INTEGER,
-        updated_at TIMESTAMP
-    );
+        WorkDateID INTEGER ENCODE RAW,
+        WorkDate DATE ENCODE AZ64,
+        Month INTEGER ENCODE AZ64,
+        MonthName VARCHAR ENCODE ZSTD,
+        Year INTEGER ENCODE AZ64,
+        Quarter INTEGER ENCODE AZ64,
+        updated_at TIMESTAMP ENCODE AZ64
+    )
+    DISTSTYLE ALL
+    SORTKEY (WorkDateID);
 
     -- Drop temp table if it exists
     DROP TABLE IF EXISTS stage_workdate_dim;
@@ -333,7 +770,9 @@ BEGIN
         EXTRACT(YEAR FROM WorkDate::DATE) AS Year,
         EXTRACT(QUARTER FROM WorkDate::DATE) AS Quarter,
         CURRENT_TIMESTAMP AS updated_at
-    FROM BRONZE.DailyNurseStaffing;
+    FROM BRONZE.DailyNurseStaffing
+    WHERE (v_last_batch < 0 AND ingest_batch_id IS NULL)
+       OR ingest_batch_id BETWEEN v_last_batch + 1 AND v_max_batch;
 
     -- Update existing records
     UPDATE silver.WorkDateDim AS d
@@ -361,6 +800,8 @@ BEGIN
     FROM stage_workdate_dim s
     LEFT JOIN silver.WorkDateDim d ON d.WorkDateID = s.WorkDateID
     WHERE d.WorkDateID IS NULL;
+
+    CALL sp_set_etl_watermark('silver.workdatedim', v_max_batch);
 END
 $$;
 
@@ -368,22 +809,157 @@ $$;
 CREATE OR REPLACE PROCEDURE sp_generate_gold_provider_staffing_utilization_metric()
 LANGUAGE plpgsql
 AS $$
+BEGIN
+    CALL sp_generate_gold_provider_staffing_utilization_metric(FALSE);
+END;
+$$;
+
+
+CREATE OR REPLACE PROCEDURE sp_generate_gold_provider_staffing_utilization_metric(p_full_refresh BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_refresh_started TIMESTAMP := GETDATE();
+    v_last_refresh TIMESTAMP;
+    v_fact_batch BIGINT;
+    v_changed_months INTEGER;
 BEGIN
     -- Create gold table if not exists
+    -- Sorted by (year, month): the refresh deletes and readers filter by month
     CREATE TABLE IF NOT EXISTS gold.provider_staffing_utilization_metric (
-        ccn VARCHAR(10),                     -- Provider identifier
-        providername VARCHAR(255),          -- Facility name
-        city VARCHAR(100),                  -- City location
-        state VARCHAR(2),                   -- State abbreviation
-        title VARCHAR(100),                 -- Staffing role/title
-        staffingtype VARCHAR(100),          -- Staffing category
-        totalworkhour DECIMAL(10,2),        -- Sum of work hours
-        bedutilizationrate DECIMAL(10,2),   -- Bed utilization percentage
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
+        ccn VARCHAR(10) ENCODE ZSTD,                     -- Provider identifier
+        month INTEGER ENCODE RAW,                       -- Calendar month (1-12)
+        monthname VARCHAR(20) ENCODE ZSTD,              -- Month name
+        year INTEGER ENCODE RAW,                        -- Calendar year
+        providername VARCHAR(255) ENCODE ZSTD,          -- Facility name
+        city VARCHAR(100) ENCODE ZSTD,                  -- City location
+        state VARCHAR(2) ENCODE ZSTD,                   -- State abbreviation
+        longitude DECIMAL(10,6) ENCODE AZ64,            -- Facility longitude
+        latitude DECIMAL(10,6) ENCODE AZ64,             -- Facility latitude
+        title VARCHAR(100) ENCODE ZSTD,                 -- Staffing role/title
+        staffingtype VARCHAR(100) ENCODE ZSTD,          -- Staffing category
+        totalworkhour DECIMAL(10,2) ENCODE AZ64,        -- Sum of work hours
+        bedutilizationrate DECIMAL(10,2) ENCODE AZ64,   -- Bed utilization percentage
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ENCODE AZ64,
+        quarter INTEGER ENCODE AZ64,                    -- Calendar quarter (1-4)
+        utilizationsum DECIMAL(18,6) ENCODE AZ64,       -- Sum of daily census / beds (additive)
+        utilizationcount BIGINT ENCODE AZ64,            -- Days in utilizationsum (additive)
+        recordcount BIGINT ENCODE AZ64                  -- Fact rows aggregated (additive)
+    )
+    DISTKEY (ccn)
+    COMPOUND SORTKEY (year, month);
+
+    -- Months replaced by each refresh (read by downstream gold consumers)
+    CREATE TABLE IF NOT EXISTS gold.metric_refresh_log (
+        target_name VARCHAR(128),
+        year INTEGER,
+        month INTEGER,
+        refreshed_at TIMESTAMP
+    )
+    DISTSTYLE ALL
+    SORTKEY (refreshed_at);
+
+    -- Last successful refresh; NULL (first run or full refresh) rebuilds every month
+    SELECT updated_at INTO v_last_refresh
+    FROM silver.etl_watermark
+    WHERE target_name = 'gold.provider_staffing_utilization_metric';
+
+    IF p_full_refresh THEN
+        v_last_refresh := NULL;
+    END IF;
+
+    -- Fact batch this refresh covers, read before the changed months so a
+    -- concurrent upsert is picked up by the next refresh
+    SELECT last_batch_id INTO v_fact_batch
+    FROM silver.etl_watermark
+    WHERE target_name = 'silver.dailyfacilitylogfact';
+
+    CREATE TABLE IF NOT EXISTS silver.fact_changed_months (
+        year INTEGER ENCODE RAW,
+        month INTEGER ENCODE RAW,
+        batch_id BIGINT ENCODE AZ64,
+        recorded_at TIMESTAMP DEFAULT GETDATE() ENCODE AZ64
+    )
+    DISTSTYLE ALL
+    SORTKEY (batch_id);
+
+    -- (year, month) groups touched by fact or dimension changes since the last
+    -- refresh. The fact's months were recorded by each upsert, so the fact
+    -- table is not scanned for them.
+    DROP TABLE IF EXISTS stage_month_candidates;
+    DROP TABLE IF EXISTS stage_changed_months;
+
+    CREATE TEMP TABLE stage_month_candidates (year INTEGER, month INTEGER) DISTSTYLE ALL;
 
-    -- Optional: truncate or refresh logic
-    DELETE FROM gold.provider_staffing_utilization_metric;
+    IF v_last_refresh IS NULL THEN
+        INSERT INTO stage_month_candidates
+        SELECT DISTINCT year, month FROM silver.workdatedim;
+    ELSE
+        -- Upserted fact rows, and calendar rows changed since the last refresh
+        INSERT INTO stage_month_candidates
+        SELECT year, month
+        FROM silver.fact_changed_months
+        WHERE batch_id <= COALESCE(v_fact_batch, 0)
+        UNION
+        SELECT year, month
+        FROM silver.workdatedim
+        WHERE updated_at > v_last_refresh;
+
+        -- Changed providers: the months gold already holds for them ...
+        INSERT INTO stage_month_candidates
+        SELECT DISTINCT g.year, g.month
+        FROM gold.provider_staffing_utilization_metric g
+        INNER JOIN silver.providerdim p ON p.ccn = g.ccn
+        WHERE p.updated_at > v_last_refresh;
+
+        -- ... and, for providers that had no gold rows yet (facts that arrived
+        -- before the provider), their fact months
+        IF EXISTS (
+            SELECT 1
+            FROM silver.providerdim p
+            WHERE p.updated_at > v_last_refresh
+              AND NOT EXISTS (
+                  SELECT 1 FROM gold.provider_staffing_utilization_metric g
+                  WHERE g.ccn = p.ccn
+              )
+        ) THEN
+            INSERT INTO stage_month_candidates
+            SELECT DISTINCT d.year, d.month
+            FROM silver.dailyfacilitylogfact f
+            INNER JOIN silver.workdatedim d ON d.workdateid = f.workdateid
+            WHERE f.ccn IN (
+                SELECT p.ccn
+                FROM silver.providerdim p
+                WHERE p.updated_at > v_last_refresh
+                  AND NOT EXISTS (
+                      SELECT 1 FROM gold.provider_staffing_utilization_metric g
+                      WHERE g.ccn = p.ccn
+                  )
+            );
+        END IF;
+
+        -- A renamed staffing type appears in every month; this is rare
+        -- (a catalog change), so it rebuilds every month
+        IF EXISTS (
+            SELECT 1 FROM silver.staffingtypedim WHERE updated_at > v_last_refresh
+        ) THEN
+            INSERT INTO stage_month_candidates
+            SELECT DISTINCT year, month FROM silver.workdatedim;
+        END IF;
+    END IF;
+
+    CREATE TEMP TABLE stage_changed_months DISTSTYLE ALL AS
+    SELECT DISTINCT year, month FROM stage_month_candidates;
+
+    SELECT COUNT(*) INTO v_changed_months FROM stage_changed_months;
+    RAISE INFO 'Refreshing % month(s) of gold.provider_staffing_utilization_metric', v_changed_months;
+
+    -- Replace only the changed months; the procedure runs in one transaction,
+    -- so readers see either the old or the new version of each month
+    DELETE FROM gold.provider_staffing_utilization_metric
+    USING stage_changed_months c
+    WHERE gold.provider_staffing_utilization_metric.year = c.year
+      AND gold.provider_staffing_utilization_metric.month = c.month;
 
     -- Insert aggregated metrics
     INSERT INTO gold.provider_staffing_utilization_metric (
@@ -400,7 +976,11 @@ BEGIN
         staffingtype,
         totalworkhour,
         bedutilizationrate,
-        updated_at
+        updated_at,
+        quarter,
+        utilizationsum,
+        utilizationcount,
+        recordcount
     )
     SELECT
         p.ccn,
@@ -419,13 +999,273 @@ BEGIN
             AVG(f.numofpatient::DECIMAL(10,2) / NULLIF(p.numberofbed, 0)) * 100
             AS DECIMAL(10,2)
         ) AS bedutilizationrate,
-        CURRENT_TIMESTAMP
+        CURRENT_TIMESTAMP,
+        d.quarter,
+        -- additive parts of bedutilizationrate, so rollups can re-aggregate it
+        SUM(f.numofpatient::DECIMAL(10,2) / NULLIF(p.numberofbed, 0)) AS utilizationsum,
+        COUNT(f.numofpatient::DECIMAL(10,2) / NULLIF(p.numberofbed, 0)) AS utilizationcount,
+        COUNT(*) AS recordcount
     FROM silver.dailyfacilitylogfact f
-    INNER JOIN silver.providerdim p ON f.ccn = p.ccn
+    INNER JOIN silver.providerdim p ON f.ccn = p.ccn AND p.is_current
     INNER JOIN silver.staffingtypedim s ON f.staffingtypeid = s.staffingtypeid
     inner join  silver.workdatedim d on d.workdateid=f.workdateid
-    GROUP BY p.ccn, p.providername, p.city, p.state, s.title, s.staffingtype,d.month,d.monthname,d.year,p.longitude,p.latitude;
+    INNER JOIN stage_changed_months c ON c.year = d.year AND c.month = d.month
+    GROUP BY p.ccn, p.providername, p.city, p.state, s.title, s.staffingtype,d.month,d.monthname,d.year,d.quarter,p.longitude,p.latitude;
+
+    INSERT INTO gold.metric_refresh_log (target_name, year, month, refreshed_at)
+    SELECT 'gold.provider_staffing_utilization_metric', year, month, v_refresh_started
+    FROM stage_changed_months;
+
+    -- The recorded months of the covered batches are refreshed
+    DELETE FROM silver.fact_changed_months
+    WHERE batch_id <= COALESCE(v_fact_batch, 0);
+
+    -- Watermark: updated_at is the refresh start, last_batch_id the fact batch it covers
+    CALL sp_set_etl_watermark(
+        'gold.provider_staffing_utilization_metric',
+        COALESCE(v_fact_batch, 0),
+        v_refresh_started
+    );
 END;
 $$;
 
 
+
+
+CREATE OR REPLACE PROCEDURE sp_refresh_gold_rollups()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    CALL sp_refresh_gold_rollups(FALSE);
+END;
+$$;
+
+
+CREATE OR REPLACE PROCEDURE sp_refresh_gold_rollups(p_full_refresh BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_last_refresh TIMESTAMP;
+    v_consumed_until TIMESTAMP;
+    v_gold_batch BIGINT;
+    v_changed_months INTEGER;
+BEGIN
+    -- Pre-aggregated copies of the base gold table for Power BI. Each keeps the
+    -- additive measures, so a rollup can itself be re-aggregated:
+    -- rate = SUM(utilizationsum) / SUM(utilizationcount) * 100.
+    -- Small rollups are copied to every node; the provider one follows the base DISTKEY.
+    CREATE TABLE IF NOT EXISTS gold.rollup_state_month (
+        state VARCHAR(2) ENCODE ZSTD,
+        year INTEGER ENCODE RAW,
+        quarter INTEGER ENCODE AZ64,
+        month INTEGER ENCODE RAW,
+        monthname VARCHAR(20) ENCODE ZSTD,
+        totalworkhour DECIMAL(18,2) ENCODE AZ64,
+        providercount INTEGER ENCODE AZ64,
+        utilizationsum DECIMAL(18,6) ENCODE AZ64,
+        utilizationcount BIGINT ENCODE AZ64,
+        bedutilizationrate DECIMAL(10,2) ENCODE AZ64,
+        recordcount BIGINT ENCODE AZ64,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ENCODE AZ64
+    )
+    DISTSTYLE ALL
+    COMPOUND SORTKEY (year, month);
+
+    CREATE TABLE IF NOT EXISTS gold.rollup_provider_quarter (
+        ccn VARCHAR(10) ENCODE ZSTD,
+        providername VARCHAR(255) ENCODE ZSTD,
+        city VARCHAR(100) ENCODE ZSTD,
+        state VARCHAR(2) ENCODE ZSTD,
+        year INTEGER ENCODE RAW,
+        quarter INTEGER ENCODE RAW,
+        totalworkhour DECIMAL(18,2) ENCODE AZ64,
+        utilizationsum DECIMAL(18,6) ENCODE AZ64,
+        utilizationcount BIGINT ENCODE AZ64,
+        bedutilizationrate DECIMAL(10,2) ENCODE AZ64,
+        recordcount BIGINT ENCODE AZ64,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ENCODE AZ64
+    )
+    DISTKEY (ccn)
+    COMPOUND SORTKEY (year, quarter);
+
+    CREATE TABLE IF NOT EXISTS gold.rollup_staffingtype_year (
+        title VARCHAR(100) ENCODE ZSTD,
+        staffingtype VARCHAR(100) ENCODE ZSTD,
+        year INTEGER ENCODE RAW,
+        totalworkhour DECIMAL(18,2) ENCODE AZ64,
+        providercount INTEGER ENCODE AZ64,
+        utilizationsum DECIMAL(18,6) ENCODE AZ64,
+        utilizationcount BIGINT ENCODE AZ64,
+        bedutilizationrate DECIMAL(10,2) ENCODE AZ64,
+        recordcount BIGINT ENCODE AZ64,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ENCODE AZ64
+    )
+    DISTSTYLE ALL
+    SORTKEY (year);
+
+    CREATE TABLE IF NOT EXISTS gold.rollup_national_daily (
+        workdateid INTEGER ENCODE AZ64,
+        workdate DATE ENCODE RAW,
+        year INTEGER ENCODE RAW,
+        quarter INTEGER ENCODE AZ64,
+        month INTEGER ENCODE RAW,
+        monthname VARCHAR(20) ENCODE ZSTD,
+        totalworkhour DECIMAL(18,2) ENCODE AZ64,
+        providercount INTEGER ENCODE AZ64,
+        utilizationsum DECIMAL(18,6) ENCODE AZ64,
+        utilizationcount BIGINT ENCODE AZ64,
+        bedutilizationrate DECIMAL(10,2) ENCODE AZ64,
+        recordcount BIGINT ENCODE AZ64,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ENCODE AZ64
+    )
+    DISTSTYLE ALL
+    COMPOUND SORTKEY (year, month, workdate);
+
+    -- Base gold refreshes already consumed; NULL (first run or full refresh) rebuilds everything
+    SELECT updated_at INTO v_last_refresh
+    FROM silver.etl_watermark
+    WHERE target_name = 'gold.rollups';
+
+    IF p_full_refresh THEN
+        v_last_refresh := NULL;
+    END IF;
+
+    DROP TABLE IF EXISTS stage_rollup_months;
+
+    IF v_last_refresh IS NULL THEN
+        CREATE TEMP TABLE stage_rollup_months DISTSTYLE ALL AS
+        SELECT DISTINCT year, month
+        FROM gold.provider_staffing_utilization_metric;
+
+        DELETE FROM gold.rollup_state_month;
+        DELETE FROM gold.rollup_provider_quarter;
+        DELETE FROM gold.rollup_staffingtype_year;
+        DELETE FROM gold.rollup_national_daily;
+    ELSE
+        -- Months the base gold refresh replaced since the last rollup run
+        CREATE TEMP TABLE stage_rollup_months DISTSTYLE ALL AS
+        SELECT DISTINCT year, month
+        FROM gold.metric_refresh_log
+        WHERE target_name = 'gold.provider_staffing_utilization_metric'
+          AND refreshed_at > v_last_refresh;
+    END IF;
+
+    SELECT COUNT(*) INTO v_changed_months FROM stage_rollup_months;
+    RAISE INFO 'Refreshing gold rollups for % month(s)', v_changed_months;
+
+    -- State x month: the changed months
+    DELETE FROM gold.rollup_state_month
+    USING stage_rollup_months c
+    WHERE gold.rollup_state_month.year = c.year
+      AND gold.rollup_state_month.month = c.month;
+
+    INSERT INTO gold.rollup_state_month (
+        state, year, quarter, month, monthname, totalworkhour, providercount,
+        utilizationsum, utilizationcount, bedutilizationrate, recordcount, updated_at
+    )
+    SELECT
+        g.state, g.year, (g.month + 2) / 3, g.month, MAX(g.monthname),
+        SUM(g.totalworkhour),
+        COUNT(DISTINCT g.ccn),
+        SUM(g.utilizationsum),
+        SUM(g.utilizationcount),
+        CAST(SUM(g.utilizationsum) / NULLIF(SUM(g.utilizationcount), 0) * 100 AS DECIMAL(10,2)),
+        SUM(g.recordcount),
+        CURRENT_TIMESTAMP
+    FROM gold.provider_staffing_utilization_metric g
+    INNER JOIN stage_rollup_months c ON c.year = g.year AND c.month = g.month
+    GROUP BY g.state, g.year, g.month;
+
+    -- Provider x quarter: every quarter holding a changed month
+    DROP TABLE IF EXISTS stage_rollup_quarters;
+
+    CREATE TEMP TABLE stage_rollup_quarters DISTSTYLE ALL AS
+    SELECT DISTINCT year, (month + 2) / 3 AS quarter
+    FROM stage_rollup_months;
+
+    DELETE FROM gold.rollup_provider_quarter
+    USING stage_rollup_quarters c
+    WHERE gold.rollup_provider_quarter.year = c.year
+      AND gold.rollup_provider_quarter.quarter = c.quarter;
+
+    INSERT INTO gold.rollup_provider_quarter (
+        ccn, providername, city, state, year, quarter, totalworkhour,
+        utilizationsum, utilizationcount, bedutilizationrate, recordcount, updated_at
+    )
+    SELECT
+        g.ccn, MAX(g.providername), MAX(g.city), MAX(g.state), g.year, c.quarter,
+        SUM(g.totalworkhour),
+        SUM(g.utilizationsum),
+        SUM(g.utilizationcount),
+        CAST(SUM(g.utilizationsum) / NULLIF(SUM(g.utilizationcount), 0) * 100 AS DECIMAL(10,2)),
+        SUM(g.recordcount),
+        CURRENT_TIMESTAMP
+    FROM gold.provider_staffing_utilization_metric g
+    INNER JOIN stage_rollup_quarters c ON c.year = g.year AND c.quarter = (g.month + 2) / 3
+    GROUP BY g.ccn, g.year, c.quarter;
+
+    -- Staffing type x year: every year holding a changed month
+    DELETE FROM gold.rollup_staffingtype_year
+    WHERE year IN (SELECT year FROM stage_rollup_months);
+
+    INSERT INTO gold.rollup_staffingtype_year (
+        title, staffingtype, year, totalworkhour, providercount,
+        utilizationsum, utilizationcount, bedutilizationrate, recordcount, updated_at
+    )
+    SELECT
+        g.title, g.staffingtype, g.year,
+        SUM(g.totalworkhour),
+        COUNT(DISTINCT g.ccn),
+        SUM(g.utilizationsum),
+        SUM(g.utilizationcount),
+        CAST(SUM(g.utilizationsum) / NULLIF(SUM(g.utilizationcount), 0) * 100 AS DECIMAL(10,2)),
+        SUM(g.recordcount),
+        CURRENT_TIMESTAMP
+    FROM gold.provider_staffing_utilization_metric g
+    WHERE g.year IN (SELECT year FROM stage_rollup_months)
+    GROUP BY g.title, g.staffingtype, g.year;
+
+    -- National x day: the base gold grain is monthly, so aggregate the silver
+    -- fact, joined the same way as the base gold refresh, for the changed months only
+    DELETE FROM gold.rollup_national_daily
+    USING stage_rollup_months c
+    WHERE gold.rollup_national_daily.year = c.year
+      AND gold.rollup_national_daily.month = c.month;
+
+    INSERT INTO gold.rollup_national_daily (
+        workdateid, workdate, year, quarter, month, monthname, totalworkhour, providercount,
+        utilizationsum, utilizationcount, bedutilizationrate, recordcount, updated_at
+    )
+    SELECT
+        d.workdateid, d.workdate, d.year, d.quarter, d.month, d.monthname,
+        SUM(f.workhours),
+        COUNT(DISTINCT f.ccn),
+        SUM(f.numofpatient::DECIMAL(10,2) / NULLIF(p.numberofbed, 0)),
+        COUNT(f.numofpatient::DECIMAL(10,2) / NULLIF(p.numberofbed, 0)),
+        CAST(AVG(f.numofpatient::DECIMAL(10,2) / NULLIF(p.numberofbed, 0)) * 100 AS DECIMAL(10,2)),
+        COUNT(*),
+        CURRENT_TIMESTAMP
+    FROM silver.dailyfacilitylogfact f
+    INNER JOIN silver.providerdim p ON f.ccn = p.ccn AND p.is_current
+    INNER JOIN silver.staffingtypedim s ON f.staffingtypeid = s.staffingtypeid
+    INNER JOIN silver.workdatedim d ON d.workdateid = f.workdateid
+    INNER JOIN stage_rollup_months c ON c.year = d.year AND c.month = d.month
+    GROUP BY d.workdateid, d.workdate, d.year, d.quarter, d.month, d.monthname;
+
+    -- Watermark: the latest base refresh consumed, so a refresh that commits
+    -- while this one runs is picked up next time
+    SELECT MAX(refreshed_at) INTO v_consumed_until
+    FROM gold.metric_refresh_log
+    WHERE target_name = 'gold.provider_staffing_utilization_metric';
+
+    SELECT last_batch_id INTO v_gold_batch
+    FROM silver.etl_watermark
+    WHERE target_name = 'gold.provider_staffing_utilization_metric';
+
+    CALL sp_set_etl_watermark(
+        'gold.rollups',
+        COALESCE(v_gold_batch, 0),
+        COALESCE(v_consumed_until, v_last_refresh, GETDATE())
+    );
+END;
+$$;
@@ -0,0 +1,148 @@
+"""
+===============================================================================
+    Benchmark: fact unpivot (4-way UNION vs single-scan cross join)
+
+    Summary:
+    --------
+    Compares the fact-row construction used before sp_stage_silver_fact_table
+    (four UNION branches over BRONZE.DailyNurseStaffing + ORDER BY) with the
+    single-pass unpivot (cross join against the staffing-type list + CASE).
+
+    For each shape it reports:
+      - bronze scans and temp B-tree sorts from the SQLite query plan
+      - wall time to materialize the rows
+      - how many times the relation is built per DAG run (validation and the
+        silver upsert used to build it separately; now both read the stage)
+
+    Usage:
+    ------
+        python airflow/benchmarks/bench_fact_unpivot.py --rows 200000
+===============================================================================
+"""
+
+import argparse
+import random
+import sqlite3
+import time
+
+# Mirrors the pre-staging query in sp_generate_silver_fact_table / validate_fact_table
+UNION_SQL = """
+    SELECT * FROM (
+        SELECT PROVNUM AS CCN, WorkDate AS WorkDateID, MDScensus AS NumOfPatient,
+               '1' AS StaffingTypeID, Hrs_RNDON_emp AS WorkHours, CURRENT_TIMESTAMP AS Updated_At
+        FROM DailyNurseStaffing
+        UNION
+        SELECT PROVNUM, WorkDate, MDScensus, '2', Hrs_RNDON_ctr, CURRENT_TIMESTAMP
+        FROM DailyNurseStaffing
+        UNION
+        SELECT PROVNUM, WorkDate, MDScensus, '3', Hrs_CNA_emp, CURRENT_TIMESTAMP
+        FROM DailyNurseStaffing
+        UNION
+        SELECT PROVNUM, WorkDate, MDScensus, '4', Hrs_CNA_ctr, CURRENT_TIMESTAMP
+        FROM DailyNurseStaffing
+    ) AS unioned_data
+    ORDER BY WorkDateID ASC
+"""
+
+# Mirrors sp_stage_silver_fact_table
+SINGLE_SCAN_SQL = """
+    SELECT
+        b.PROVNUM, b.WorkDate, b.MDScensus, t.StaffingTypeID,
+        CASE t.StaffingTypeID
+            WHEN '1' THEN b.Hrs_RNDON_emp
+            WHEN '2' THEN b.Hrs_RNDON_ctr
+            WHEN '3' THEN b.Hrs_CNA_emp
+            WHEN '4' THEN b.Hrs_CNA_ctr
+        END,
+        CURRENT_TIMESTAMP
+    FROM DailyNurseStaffing b
+    CROSS JOIN (
+        SELECT '1' AS StaffingTypeID
+        UNION ALL SELECT '2'
+        UNION ALL SELECT '3'
+        UNION ALL SELECT '4'
+    ) AS t
+"""
+
+
+def load_bronze(conn, rows, providers, seed=42):
+    rnd = random.Random(seed)
+    conn.execute("""CREATE TABLE DailyNurseStaffing (
+            PROVNUM TEXT, WorkDate TEXT, MDScensus TEXT,
+            Hrs_RNDON_emp REAL, Hrs_RNDON_ctr REAL, Hrs_CNA_emp REAL, Hrs_CNA_ctr REAL
+        )""")
+    days = max(1, rows // providers)
+    data = (
+        (
+            f"{100000 + i % providers:06d}",
+            f"2024{1 + (i // providers) % 12:02d}{1 + (i // providers) % 28:02d}",
+            str(rnd.randint(20, 200)),
+            round(rnd.uniform(0, 8), 2),
+            round(rnd.uniform(0, 8), 2),
+            round(rnd.uniform(0, 200), 2),
+            round(rnd.uniform(0, 50), 2),
+        )
+        for i in range(providers * days)
+    )
+    conn.executemany(
+        "INSERT INTO DailyNurseStaffing VALUES (?, ?, ?, ?, ?, ?, ?)", data
+    )
+    conn.commit()
+
+
+def plan_stats(conn, sql):
+    plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    scans = sum(1 for step in plan if step in ("SCAN DailyNurseStaffing", "SCAN b"))
+    sorts = sum(1 for step in plan if "TEMP B-TREE" in step)
+    return scans, sorts
+
+
+def materialize(conn, sql):
+    start = time.perf_counter()
+    conn.execute("DROP TABLE IF EXISTS stage")
+    conn.execute(f"CREATE TEMP TABLE stage AS {sql}")
+    elapsed = time.perf_counter() - start
+    (count,) = conn.execute("SELECT COUNT(*) FROM stage").fetchone()
+    return elapsed, count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--rows", type=int, default=200_000, help="bronze rows to generate"
+    )
+    parser.add_argument("--providers", type=int, default=2_000)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(":memory:")
+    load_bronze(conn, args.rows, args.providers)
+
+    results = []
+    # builds per DAG run: before staging, validation and the silver upsert each built it
+    for name, sql, builds in (
+        ("4x UNION + ORDER BY", UNION_SQL, 2),
+        ("single-scan unpivot", SINGLE_SCAN_SQL, 1),
+    ):
+        scans, sorts = plan_stats(conn, sql)
+        elapsed, count = materialize(conn, sql)
+        results.append((name, scans * builds, sorts * builds, elapsed * builds, count))
+
+    print(
+        f"{'shape':<22}{'scans/run':>10}{'sorts/run':>10}{'seconds/run':>13}{'rows':>10}"
+    )
+    for name, scans, sorts, elapsed, count in results:
+        print(f"{name:<22}{scans:>10}{sorts:>10}{elapsed:>13.3f}{count:>10}")
+
+    (_, old_scans, old_sorts, old_time, _), (_, new_scans, new_sorts, new_time, _) = (
+        results
+    )
+    print(
+        f"\nbronze scans: {old_scans} -> {new_scans}, sorts: {old_sorts} -> {new_sorts}, "
+        f"speedup: {old_time / new_time:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
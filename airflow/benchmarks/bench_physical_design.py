@@ -0,0 +1,146 @@
+"""
+===============================================================================
+    Benchmark: physical table design (before / after DISTKEY + SORTKEY)
+
+    Summary:
+    --------
+    Copies the silver fact, provider dimension and fact stage into a scratch
+    schema twice: once as they were created before (DISTSTYLE AUTO/EVEN, no
+    sort key, default encodings) and once with the design in
+    SQLScript/Redshift-DDL.sql (DISTKEY ccn, compound sort key on the upsert
+    key, AZ64/ZSTD encodings). Then, for each copy, it runs:
+
+      - the fact upsert join (UPDATE ... FROM stage, rolled back)
+      - the gold aggregation over the most recent month
+
+    and reports the median wall time of --runs executions, plus the data
+    movement steps from EXPLAIN (DS_DIST_NONE means slice-local; DS_BCAST_*
+    and DS_DIST_* mean rows were broadcast or redistributed).
+
+    Needs a Redshift cluster with the silver tables populated; nothing is
+    written outside the scratch schema, which is dropped at the end.
+
+    Usage:
+    ------
+        python airflow/benchmarks/bench_physical_design.py \\
+            --dsn "host=... port=5439 dbname=healthdatadb user=... password=..."
+===============================================================================
+"""
+
+import argparse
+import re
+import statistics
+import time
+
+import psycopg2
+
+SCHEMA = "bench_physical_design"
+
+BEFORE = {
+    "fact": "DISTSTYLE EVEN",
+    "stage": "DISTSTYLE EVEN",
+    "providerdim": "DISTSTYLE EVEN",
+}
+
+AFTER = {
+    "fact": "DISTKEY (ccn) COMPOUND SORTKEY (workdateid, ccn, staffingtypeid)",
+    "stage": "DISTKEY (ccn) COMPOUND SORTKEY (workdateid, ccn, staffingtypeid)",
+    "providerdim": "DISTKEY (ccn) SORTKEY (ccn)",
+}
+
+SOURCES = {
+    "fact": "silver.dailyfacilitylogfact",
+    "stage": "silver.dailyfacilitylogfact",
+    "providerdim": "silver.providerdim",
+}
+
+UPSERT_SQL = """
+    UPDATE {s}.fact_{v} AS d
+    SET numofpatient = s.numofpatient, workhours = s.workhours
+    FROM {s}.stage_{v} s
+    WHERE d.ccn = s.ccn AND d.workdateid = s.workdateid
+      AND d.staffingtypeid = s.staffingtypeid
+"""
+
+GOLD_SQL = """
+    SELECT p.ccn, d.year, d.month, f.staffingtypeid,
+           SUM(f.workhours),
+           AVG(f.numofpatient::DECIMAL(10,2) / NULLIF(p.numberofbed, 0))
+    FROM {s}.fact_{v} f
+    JOIN {s}.providerdim_{v} p ON f.ccn = p.ccn
+    JOIN silver.workdatedim d ON d.workdateid = f.workdateid
+    WHERE d.year = (SELECT MAX(year) FROM silver.workdatedim)
+      AND d.month = (SELECT MAX(month) FROM silver.workdatedim
+                     WHERE year = (SELECT MAX(year) FROM silver.workdatedim))
+    GROUP BY p.ccn, d.year, d.month, f.staffingtypeid
+"""
+
+DATA_MOVEMENT = re.compile(r"DS_[A-Z_]+")
+
+
+def build_copies(cur, variant, design):
+    for name, attrs in design.items():
+        cur.execute(f"DROP TABLE IF EXISTS {SCHEMA}.{name}_{variant}")
+        cur.execute(
+            f"CREATE TABLE {SCHEMA}.{name}_{variant} {attrs} "
+            f"AS SELECT * FROM {SOURCES[name]}"
+        )
+        cur.execute(f"ANALYZE {SCHEMA}.{name}_{variant}")
+
+
+def data_movement(cur, sql):
+    cur.execute("EXPLAIN " + sql)
+    plan = "\n".join(row[0] for row in cur.fetchall())
+    return sorted(set(DATA_MOVEMENT.findall(plan))) or ["none"]
+
+
+def time_query(conn, sql, runs):
+    timings = []
+    for _ in range(runs):
+        with conn.cursor() as cur:
+            start = time.perf_counter()
+            cur.execute(sql)
+            if cur.description:
+                cur.fetchall()
+            timings.append(time.perf_counter() - start)
+        conn.rollback()  # the upsert must not change the copies between runs
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--dsn", required=True, help="libpq connection string")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SET enable_result_cache_for_session TO off")
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+        build_copies(cur, "before", BEFORE)
+        build_copies(cur, "after", AFTER)
+    conn.autocommit = False
+
+    print(f"{'query':<10}{'design':<8}{'median s':>10}  data movement")
+    try:
+        for label, template in (("upsert", UPSERT_SQL), ("gold", GOLD_SQL)):
+            for variant in ("before", "after"):
+                sql = template.format(s=SCHEMA, v=variant)
+                with conn.cursor() as cur:
+                    movement = data_movement(cur, sql)
+                conn.rollback()
+                elapsed = time_query(conn, sql, args.runs)
+                print(f"{label:<10}{variant:<8}{elapsed:>10.3f}  {', '.join(movement)}")
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
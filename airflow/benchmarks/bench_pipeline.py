@@ -0,0 +1,387 @@
+"""
+===============================================================================
+    Benchmark: end-to-end pipeline stages on synthetic CMS data
+
+    Summary:
+    --------
+    Generates DailyNurseStaffing / ProviderInfo CSVs with
+    generate_cms_data.py and runs each pipeline stage over them with local
+    stand-ins for the AWS services:
+
+      - generate      the synthetic CSVs (the generator itself)
+      - prevalidate   validate_csv / validate_s3_csv on every file
+      - convert       CSV -> partitioned Parquet (convert_csv / convert_s3_csv)
+      - local_engine  bronze -> silver -> gold with health_data/local_engine.py,
+                      the parity-tested stand-in for the stored procedures
+      - pg_load       COPY of the bronze CSVs into PostgreSQL (--postgres-dsn)
+      - pg_validate   every rule set of health_data/dq_rules.py, run by
+                      run_rule_set against PostgreSQL (--postgres-dsn)
+
+    S3 is moto's in-process mock when moto is installed; otherwise the
+    prevalidate and convert stages read the local files directly. The
+    PostgreSQL stages need a scratch database (PostgreSQL 15+ for
+    REGEXP_COUNT): its bronze and silver schemas are dropped and recreated.
+
+    Each stage runs in a fresh process, so the peak RSS reported is the
+    stage's own. For every stage it reports wall time, rows/s and peak RSS;
+    with --baseline it compares them with a stored run and exits 1 when a
+    stage is more than --tolerance slower (rows/s) or larger (peak RSS).
+
+    Usage:
+    ------
+        python airflow/benchmarks/bench_pipeline.py --providers 2000 --days 90 \\
+            --save-baseline airflow/benchmarks/baseline.json
+        python airflow/benchmarks/bench_pipeline.py --providers 2000 --days 90 \\
+            --baseline airflow/benchmarks/baseline.json \\
+            --postgres-dsn "host=localhost dbname=bench user=postgres"
+===============================================================================
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "dags"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from generate_cms_data import generate, scale  # noqa: E402
+from health_data.bronze_schema import BRONZE_COLUMNS, source_columns  # noqa: E402
+from health_data.ingest import route_file  # noqa: E402
+
+BUCKET = "health-data-project-bucket"
+
+# Redshift types of the bronze DDL as PostgreSQL declares them
+PG_TYPES = {"VARCHAR": "VARCHAR(256)", "DECIMAL": "DECIMAL(18,0)"}
+
+
+def _csv_paths(data_dir):
+    # ProviderInfo first, then the staffing quarters in order, like the load
+    return sorted(
+        glob.glob(os.path.join(data_dir, "*.csv")),
+        key=lambda path: (route_file(path) != "ProviderInfo", path),
+    )
+
+
+def _staffing_rows(data_dir):
+    with open(os.path.join(data_dir, "rows.json")) as handle:
+        counts = json.load(handle)
+    return sum(rows for path, rows in counts.items() if "DailyNurseStaffing" in path)
+
+
+def _all_rows(data_dir):
+    with open(os.path.join(data_dir, "rows.json")) as handle:
+        return sum(json.load(handle).values())
+
+
+def stage_generate(data_dir, providers, days, **_):
+    written = generate(data_dir, providers, days)
+    with open(os.path.join(data_dir, "rows.json"), "w") as handle:
+        json.dump(written, handle)
+    return sum(written.values())
+
+
+def _mock_s3(data_dir):
+    """An S3Hook on moto's mock with the landed files uploaded, or None."""
+    try:
+        from moto import mock_aws
+    except ImportError:
+        return None, None
+    from airflow.providers.amazon.aws.hooks.s3 import S3Hook
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    mock = mock_aws()
+    mock.start()
+    hook = S3Hook(aws_conn_id=None)
+    hook.create_bucket(BUCKET)
+    for path in _csv_paths(data_dir):
+        hook.load_file(path, key=f"data/{os.path.basename(path)}", bucket_name=BUCKET)
+    return hook, mock
+
+
+def stage_prevalidate(data_dir, clock, **_):
+    from health_data.prevalidate import validate_csv, validate_s3_csv
+
+    hook, mock = _mock_s3(data_dir)
+    clock.start()
+    try:
+        for path in _csv_paths(data_dir):
+            table, key = route_file(path), f"data/{os.path.basename(path)}"
+            if hook is None:
+                with open(path, "rb") as source:
+                    report = validate_csv(source, table, key)
+            else:
+                report = validate_s3_csv(hook, BUCKET, key, table)
+            if not report.ok:
+                raise ValueError(f"{key} failed validation: {report.errors}")
+    finally:
+        if mock is not None:
+            mock.stop()
+    return _all_rows(data_dir)
+
+
+def stage_convert(data_dir, clock, **_):
+    from health_data.parquet import convert_csv, convert_s3_csv
+
+    hook, mock = _mock_s3(data_dir)
+    clock.start()
+    try:
+        with tempfile.TemporaryDirectory() as out_dir:
+            for path in _csv_paths(data_dir):
+                table, key = route_file(path), f"data/{os.path.basename(path)}"
+                if hook is None:
+                    with open(path, "rb") as source:
+                        convert_csv(source, table, key, out_dir)
+                else:
+                    convert_s3_csv(hook, BUCKET, key, table)
+    finally:
+        if mock is not None:
+            mock.stop()
+    return _all_rows(data_dir)
+
+
+def stage_local_engine(data_dir, **_):
+    from health_data.local_engine import run_pipeline, write_tables
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        write_tables(run_pipeline(_csv_paths(data_dir)), out_dir)
+    return _staffing_rows(data_dir)
+
+
+class PostgresHook:
+    """The RedshiftSQLHook calls run_rule_set makes, on a psycopg2 connection."""
+
+    def __init__(self, dsn):
+        import psycopg2
+
+        self.dsn = dsn
+        self.connect = psycopg2.connect
+
+    def get_conn(self):
+        return self.connect(self.dsn)
+
+    def _execute(self, sql, fetch):
+        conn = self.get_conn()
+        try:
+            with conn, conn.cursor() as cursor:
+                cursor.execute(sql)
+                return fetch(cursor) if fetch else None
+        finally:
+            conn.close()
+
+    def get_first(self, sql):
+        return self._execute(sql, lambda cursor: cursor.fetchone())
+
+    def get_records(self, sql):
+        return self._execute(sql, lambda cursor: cursor.fetchall())
+
+    def run(self, sql):
+        for statement in [sql] if isinstance(sql, str) else sql:
+            self._execute(statement, None)
+
+
+def stage_pg_load(data_dir, postgres_dsn, **_):
+    hook = PostgresHook(postgres_dsn)
+    hook.run(
+        [
+            "DROP SCHEMA IF EXISTS bronze CASCADE",
+            "DROP SCHEMA IF EXISTS silver CASCADE",
+            "CREATE SCHEMA bronze",
+            "CREATE SCHEMA silver",
+            "CREATE TABLE silver.dq_results (run_id VARCHAR(256), rule_set VARCHAR(128), "
+            "rule_name VARCHAR(256), severity VARCHAR(16), metric_value BIGINT, "
+            "passed BOOLEAN, checked_at TIMESTAMP)",
+        ]
+        + [
+            f"CREATE TABLE bronze.{table} ("
+            + ", ".join(f"{name} {PG_TYPES.get(kind, kind)}" for name, kind in columns)
+            + ")"
+            for table, columns in BRONZE_COLUMNS.items()
+        ]
+    )
+    conn = hook.get_conn()
+    try:
+        with conn, conn.cursor() as cursor:
+            for path in _csv_paths(data_dir):
+                table = route_file(path)
+                names = ", ".join(name for name, _ in source_columns(table))
+                with open(path) as source:
+                    cursor.copy_expert(
+                        f"COPY bronze.{table} ({names}) FROM STDIN WITH (FORMAT csv, HEADER)",
+                        source,
+                    )
+    finally:
+        conn.close()
+    return _all_rows(data_dir)
+
+
+def stage_pg_validate(postgres_dsn, **_):
+    import logging
+
+    from health_data.dq import run_rule_set
+    from health_data.dq_rules import RULE_SETS
+    from health_data.staffing_types import STAFFING_TYPE_CATALOG
+
+    hook = PostgresHook(postgres_dsn)
+    enabled = [t for t in STAFFING_TYPE_CATALOG if t.enabled]
+    # sp_stage_silver_fact_table's unpivot, which the fact rule set reads
+    hours_case = "".join(
+        f" WHEN {t.staffing_type_id} THEN b.{t.hours_column.lower()}" for t in enabled
+    )
+    hook.run(
+        [
+            "CREATE TABLE silver.staffingtypedim AS SELECT * FROM (VALUES "
+            + ", ".join(f"({t.staffing_type_id})" for t in enabled)
+            + ") AS t (staffingtypeid)",
+            "CREATE TABLE silver.Stage_DailyFacilityLogFact AS "
+            "SELECT b.provnum AS ccn, b.workdate AS workdateid, b.mdscensus AS numofpatient, "
+            "CAST(t.staffingtypeid AS VARCHAR) AS staffingtypeid, "
+            f"CASE t.staffingtypeid{hours_case} END AS workhours, "
+            "CURRENT_TIMESTAMP AS updated_at "
+            "FROM bronze.dailynursestaffing b CROSS JOIN silver.staffingtypedim t",
+        ]
+    )
+    log = logging.getLogger("bench_pipeline")
+    return sum(
+        run_rule_set(hook, rule_set, log, run_id="bench")["row_count"]
+        for rule_set in RULE_SETS.values()
+    )
+
+
+STAGES = {
+    "generate": stage_generate,
+    "prevalidate": stage_prevalidate,
+    "convert": stage_convert,
+    "local_engine": stage_local_engine,
+    "pg_load": stage_pg_load,
+    "pg_validate": stage_pg_validate,
+}
+
+
+class _Clock:
+    """Wall time from construction, or from start() after a stage's setup."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+
+    def start(self):
+        self.started = time.perf_counter()
+
+
+def _measure(name, options):
+    clock = _Clock()
+    rows = STAGES[name](clock=clock, **options)
+    seconds = time.perf_counter() - clock.started
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_s": round(rows / seconds, 1) if seconds else None,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def run_stage(name, options):
+    """Run one stage in a fresh process and return its measurements."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_measure, name, options).result()
+
+
+def regressions(results, baseline, tolerance):
+    """Stages that got slower or bigger than the baseline by more than ``tolerance``."""
+    found = []
+    for name, result in results.items():
+        before = baseline.get("stages", {}).get(name)
+        if not before:
+            continue
+        if result["rows_per_s"] < before["rows_per_s"] * (1 - tolerance):
+            found.append(
+                f"{name}: {result['rows_per_s']:,.0f} rows/s vs {before['rows_per_s']:,.0f}"
+            )
+        if result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + tolerance):
+            found.append(
+                f"{name}: peak RSS {result['peak_rss_mb']:,.0f} MB vs {before['peak_rss_mb']:,.0f}"
+            )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--rows", type=int, help="DailyNurseStaffing rows (overrides --days)"
+    )
+    parser.add_argument("--providers", type=int, default=2_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument(
+        "--stages", default=",".join(STAGES), help="comma-separated stage names"
+    )
+    parser.add_argument(
+        "--postgres-dsn", help="scratch PostgreSQL 15+ for the pg_* stages"
+    )
+    parser.add_argument("--baseline", help="JSON of a previous run to compare against")
+    parser.add_argument(
+        "--save-baseline", help="write this run's results to a JSON file"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    providers, days = scale(args.rows, args.providers, args.days)
+    stages = [name for name in args.stages.split(",") if name]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)}")
+    if not args.postgres_dsn:
+        stages = [name for name in stages if not name.startswith("pg_")]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        options = {
+            "data_dir": data_dir,
+            "providers": providers,
+            "days": days,
+            "postgres_dsn": args.postgres_dsn,
+        }
+        if "generate" not in stages:
+            stage_generate(**options)
+        for name in stages:
+            results[name] = run_stage(name, options)
+
+    print(f"scale: {providers:,} providers x {days:,} days")
+    print(f"{'stage':<14}{'rows':>14}{'seconds':>10}{'rows/s':>14}{'peak RSS MB':>13}")
+    for name, r in results.items():
+        print(
+            f"{name:<14}{r['rows']:>14,}{r['seconds']:>10.2f}"
+            f"{r['rows_per_s']:>14,.0f}{r['peak_rss_mb']:>13,.0f}"
+        )
+
+    run = {"providers": providers, "days": days, "stages": results}
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as handle:
+            json.dump(run, handle, indent=2)
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        if (baseline["providers"], baseline["days"]) != (providers, days):
+            print("\nwarning: the baseline was measured at a different scale")
+        found = regressions(results, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+===============================================================================
+    Synthetic CMS data generator
+
+    Summary:
+    --------
+    Writes DailyNurseStaffing and ProviderInfo CSVs laid out like the CMS
+    files the pipeline lands (the columns of health_data/bronze_schema.py,
+    minus the load columns), at any scale: N providers x M consecutive days,
+    from a few thousand rows up to 100M+.
+
+      - one DailyNurseStaffing_<year>Q<quarter>.csv per calendar quarter,
+        one row per provider and day (PROVNUM + WorkDate unique)
+      - one ProviderInfo_<yyyymm>.csv with a row per provider
+      - census follows each provider's beds and occupancy; the hours scale
+        with the census, with a contractor share per role, and every total
+        column is its _emp + _ctr
+
+    Rows are generated with numpy and written by Arrow in batches, so memory
+    stays flat however many rows are written. The same seed gives the same
+    files.
+
+    Usage:
+    ------
+        python airflow/benchmarks/generate_cms_data.py --out /tmp/cms \\
+            --providers 15000 --days 365
+        python airflow/benchmarks/generate_cms_data.py --out /tmp/cms --rows 100000000
+===============================================================================
+"""
+
+import argparse
+import itertools
+import math
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "dags"))
+
+from health_data.bronze_schema import source_columns  # noqa: E402
+
+DEFAULT_PROVIDERS = 15_000  # about the number of nursing homes CMS reports on
+BATCH_ROWS = 500_000
+
+# Mean hours per day per 100 residents, and the contractor share, per role
+ROLE_HOURS = {
+    "RNDON": (8.0, 0.03),
+    "RNadmin": (12.0, 0.05),
+    "RN": (45.0, 0.12),
+    "LPNadmin": (8.0, 0.04),
+    "LPN": (80.0, 0.10),
+    "CNA": (220.0, 0.08),
+    "NAtrn": (6.0, 0.02),
+    "MedAide": (10.0, 0.05),
+}
+
+STATES = (
+    "AL", "AZ", "CA", "CO", "FL", "GA", "IL", "IN", "MA", "MI", "MN", "MO",
+    "NC", "NJ", "NY", "OH", "PA", "TN", "TX", "WA",
+)  # fmt: skip
+
+
+def _provider_attributes(providers, seed):
+    rng = np.random.default_rng(seed)
+    ids = np.arange(providers)
+    return {
+        "ccn": np.char.zfill((100000 + ids).astype(str), 6),
+        "state": np.asarray(STATES)[ids % len(STATES)],
+        "beds": rng.integers(30, 300, providers),
+        "occupancy": rng.uniform(0.6, 0.95, providers),
+        "latitude": np.round(rng.uniform(25.0, 48.0, providers), 6),
+        "longitude": np.round(rng.uniform(-123.0, -70.0, providers), 6),
+    }
+
+
+def _strings(prefix, ids):
+    return pa.array(np.char.add(prefix, ids.astype(str)))
+
+
+def provider_table(providers, seed=42, processing_date="2024-10-01"):
+    """One ProviderInfo row per provider, every source column filled."""
+    attrs = _provider_attributes(providers, seed)
+    rng = np.random.default_rng(seed + 1)
+    ids = np.arange(providers)
+    specific = {
+        "CMS_Certification_Number_CCN": pa.array(attrs["ccn"]),
+        "Provider_Name": _strings("Facility ", ids),
+        "Provider_Address": _strings("Main Street ", ids),
+        "City_Town": _strings("City ", ids % 500),
+        "State": pa.array(attrs["state"]),
+        "ZIP_Code": pa.array(10000 + ids % 89999),
+        "Number_of_Certified_Beds": pa.array(attrs["beds"]),
+        "Average_Number_of_Residents_per_Day": pa.array(
+            np.round(attrs["beds"] * attrs["occupancy"], 1)
+        ),
+        "Latitude": pa.array(attrs["latitude"]),
+        "Longitude": pa.array(attrs["longitude"]),
+        "Processing_Date": pa.array([processing_date] * providers),
+    }
+    columns = {}
+    for name, redshift_type in source_columns("ProviderInfo"):
+        if name in specific:
+            columns[name] = specific[name]
+        elif redshift_type in ("INT", "SMALLINT", "BIGINT"):
+            columns[name] = pa.array(rng.integers(1, 6, providers))
+        elif redshift_type == "DECIMAL":
+            columns[name] = pa.array(np.round(rng.uniform(0, 5, providers), 2))
+        elif redshift_type == "DATE":
+            columns[name] = pa.array(["2000-01-01"] * providers)
+        else:
+            columns[name] = pa.array(["N"] * providers)
+    return pa.table(columns)
+
+
+def _quarter(day):
+    return f"{day.year}Q{(day.month - 1) // 3 + 1}"
+
+
+def _day_batches(days, start, days_per_batch):
+    """Consecutive days in batches that never span two quarters (one file each)."""
+    all_days = (start + timedelta(d) for d in range(days))
+    for quarter, group in itertools.groupby(all_days, key=_quarter):
+        group = list(group)
+        for first in range(0, len(group), days_per_batch):
+            yield quarter, group[first : first + days_per_batch]
+
+
+def staffing_batches(providers, days, start=date(2024, 1, 1), seed=42):
+    """
+    Yield ``(quarter, pyarrow.Table)`` batches of DailyNurseStaffing rows,
+    whole days at a time, in date order.
+    """
+    attrs = _provider_attributes(providers, seed)
+    rng = np.random.default_rng(seed + 2)
+    names = [name for name, _ in source_columns("DailyNurseStaffing")]
+    ids = np.arange(providers)
+    for quarter, dates in _day_batches(days, start, max(1, BATCH_ROWS // providers)):
+        rows = providers * len(dates)
+        census = np.maximum(
+            0,
+            np.round(
+                np.tile(attrs["beds"] * attrs["occupancy"], len(dates))
+                + rng.normal(0, 3, rows)
+            ),
+        ).astype(np.int64)
+        county = np.tile(ids % 50, len(dates))
+        columns = {
+            "PROVNUM": pa.array(np.tile(attrs["ccn"], len(dates))),
+            "PROVNAME": _strings("Facility ", np.tile(ids, len(dates))),
+            "CITY": _strings("City ", np.tile(ids % 500, len(dates))),
+            "STATE": pa.array(np.tile(attrs["state"], len(dates))),
+            "COUNTY_NAME": _strings("County ", county),
+            "COUNTY_FIPS": pa.array(np.char.zfill((county + 1).astype(str), 3)),
+            "CY_Qtr": pa.array([quarter] * rows),
+            "WorkDate": pa.array(
+                np.repeat([d.strftime("%Y%m%d") for d in dates], providers)
+            ),
+            "MDScensus": pa.array(census.astype(str)),
+        }
+        for role, (per_hundred, contractor_share) in ROLE_HOURS.items():
+            hours = np.maximum(
+                0, census / 100 * per_hundred * rng.uniform(0.7, 1.3, rows)
+            )
+            ctr = np.round(hours * contractor_share * rng.uniform(0, 2, rows), 2)
+            emp = np.round(np.maximum(0, hours - ctr), 2)
+            columns[f"Hrs_{role}"] = pa.array(np.round(emp + ctr, 2))
+            columns[f"Hrs_{role}_emp"] = pa.array(emp)
+            columns[f"Hrs_{role}_ctr"] = pa.array(ctr)
+        yield quarter, pa.table({name: columns[name] for name in names})
+
+
+def generate(
+    out_dir, providers=DEFAULT_PROVIDERS, days=365, start=date(2024, 1, 1), seed=42
+):
+    """Write the CSVs under ``out_dir``; returns ``{path: row count}`` in load order."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    provider_path = os.path.join(out_dir, f"ProviderInfo_{start:%Y%m}.csv")
+    pacsv.write_csv(provider_table(providers, seed), provider_path)
+    written[provider_path] = providers
+
+    writer = path = None
+    try:
+        for quarter, batch in staffing_batches(providers, days, start, seed):
+            quarter_path = os.path.join(out_dir, f"DailyNurseStaffing_{quarter}.csv")
+            if quarter_path != path:
+                if writer is not None:
+                    writer.close()
+                path = quarter_path
+                writer = pacsv.CSVWriter(path, batch.schema)
+                written[path] = 0
+            writer.write_table(batch)
+            written[path] += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def scale(rows=None, providers=DEFAULT_PROVIDERS, days=None):
+    """``(providers, days)`` for a row target, or the given grid."""
+    if rows is None:
+        return providers, days or 365
+    providers = min(providers, rows)
+    return providers, max(1, math.ceil(rows / providers))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--out", required=True, help="directory for the CSV files")
+    parser.add_argument(
+        "--rows", type=int, help="DailyNurseStaffing rows (overrides --days)"
+    )
+    parser.add_argument("--providers", type=int, default=DEFAULT_PROVIDERS)
+    parser.add_argument(
+        "--days", type=int, help="consecutive days per provider (default 365)"
+    )
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2024, 1, 1))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    providers, days = scale(args.rows, args.providers, args.days)
+    for path, rows in generate(
+        args.out, providers, days, args.start, args.seed
+    ).items():
+        print(f"{rows:>12,}  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,15 @@
 
     Summary:
     --------
-    This Airflow DAG orchestrates the ingestion, validation, and transformation 
-    of healthcare staffing data from S3 into Amazon Redshift. The workflow 
+    This Airflow DAG orchestrates the ingestion, validation, and transformation
+    of healthcare staffing data from S3 into Amazon Redshift. The workflow
     includes the following key steps:
 
-    1. Ingest new files from S3 into Redshift.
-    2. Run validation checks on provider info, work dates, and fact tables.
+    1. Validate new S3 files before loading (failures are quarantined),
+       convert them to partitioned Parquet, then ingest them into Redshift
+       (one manifest COPY per table).
+    2. Stage the unpivoted fact rows in a single scan of bronze, then run
+       validation checks on provider info, work dates, and fact tables.
     3. Gate downstream tasks to ensure all validations succeed before proceeding.
     4. Transform data into Silver layer dimensions:
          - Provider Dimension
@@ -21,285 +24,785 @@
          - Workdate Dimension
     5. Generate Gold layer metrics:
          - Provider Staffing Utilization Metric
-    6. End the pipeline after successful transformations.
+         - Power BI rollups (state x month, provider x quarter,
+           staffing type x year, national daily) for the changed months
+       - Partitioned Parquet snapshot of the changed gold months on S3
+         (exports/gold/, with manifest.json) for Power BI import
+    6. Maintain the touched tables: ANALYZE / VACUUM only where
+       SVV_TABLE_INFO passes the stats-off, unsorted or deleted thresholds.
+    7. End the pipeline after successful transformations.
 
     Notes:
     ------
     - DAG is manually triggered (no schedule interval).
-    - Uses both PythonOperator and PostgresOperator.
-    - Redshift connection ID: "redshift_default".
+    - Uses PythonOperator for the short S3 / check steps and deferrable
+      Redshift Data API operators (health_data/redshift_data.py) for the
+      COPY and stored-procedure steps, so no worker slot or DB session is
+      held while Redshift works.
+    - Redshift connection ID: "redshift_default" (the Data API target is
+      derived from it).
     - Validation gates ensure data quality before transformations.
+    - Silver steps are incremental: each consumes only the bronze load
+      batches above its watermark. The gold metric recomputes only the
+      (year, month) groups changed since its last refresh. Conf
+      {"full_refresh": true} reprocesses everything.
+    - A run with no new files succeeds without loading anything. Validation
+      and transform steps are skipped from cache (health_data/step_cache.py)
+      when the ingested file set, the deployed procedures and the code are
+      unchanged since their last success; conf {"force": true} reruns them.
+    - The gold rollups are rebuilt only for the months the gold metric
+      refreshed; health_data/rollups.py (and gold.rollup_catalog) tells
+      which table answers a grouping.
+    - New CSVs are converted to typed, zstd Parquet partitioned by CY_Qtr /
+      Processing_Date (LOAD_FORMAT = "parquet"); bronze.file_lineage maps
+      each raw file to the Parquet it produced.
+    - Files are identified by S3 key + ETag. Runs started by the trigger_mwaa
+      Lambda carry the S3 keys that arrived (conf {"s3_keys": [...]}); those
+      are queued in bronze.pending_files unless already ingested, and the
+      run loads the queue. Without the conf the data/ prefix is reconciled.
+    - New files are checked on S3 before any COPY (header vs DDL, required
+      keys, number/date parsing, in-file key uniqueness); failing files are
+      moved under quarantine/ with a .errors.json report.
+    - Data-quality rules are declared in health_data/dq_rules.py; one task
+      per rule set runs all of its rules as a single aggregate query in
+      Redshift and records the outcome in silver.dq_results.
+    - Conf {"engine": "local"} (or ENGINE = "local") skips Redshift and
+      builds the silver and gold tables with the embedded Arrow engine
+      (health_data/local_engine.py) from the landed files, writing Parquet
+      under local/<run_id>/ ({"input_dir": ..., "output_dir": ...} for files
+      on the worker).
+    - summarize_run records each task's wall time, rows / bytes and, for the
+      Redshift steps, the queue / execution time of its queries from the
+      SYS_* views in silver.pipeline_run_metrics, and logs every stage
+      against its historical p50 / p95. Local runs are only logged and
+      pushed to XCom.
+    - health_data_backfill_dag (below) reloads the landed history one
+      CY_Qtr partition at a time, each a mapped task group with bounded
+      concurrency and a checkpoint in bronze.backfill_partitions; see
+      health_data/backfill.py. Do not run it alongside this DAG.
 ===============================================================================
 """
 
 from airflow import DAG
-from airflow.operators.python import PythonOperator
+from airflow.decorators import task_group
+from airflow.exceptions import AirflowSkipException
+from airflow.operators.python import BranchPythonOperator, PythonOperator
 from airflow.operators.empty import EmptyOperator
+from airflow.providers.amazon.aws.hooks.redshift_data import RedshiftDataHook
 from airflow.providers.amazon.aws.hooks.s3 import S3Hook
-from airflow.providers.postgres.operators.postgres import PostgresOperator
 from airflow.utils.log.logging_mixin import LoggingMixin
 from airflow.providers.amazon.aws.hooks.redshift_sql import RedshiftSQLHook
 from airflow.utils.trigger_rule import TriggerRule
+from dataclasses import asdict
 from datetime import datetime
-import boto3
-import os
-import time
-import pandas as pd
-
+from pathlib import Path
+import json
+import tempfile
+
+from health_data.backfill import (
+    DONE,
+    LOADED,
+    PROVIDER_PARTITION,
+    checkpoint_statements,
+    file_quarter,
+    finished_partitions,
+    partition_checkpoint,
+    plan_partitions,
+    unloaded_files,
+    without_row_count_deltas,
+)
+from health_data.dq import RuleSet, run_rule_set
+from health_data.dq_rules import RULE_SETS
+from health_data.file_queue import (
+    DuplicateFile,
+    PendingFile,
+    dequeue_statement,
+    describe_keys,
+    enqueue,
+    list_prefix,
+    loaded_content,
+    pending_files,
+    reject_duplicates_statements,
+)
+from health_data.gold_export import (
+    EXPORT_TABLES,
+    MANIFEST_KEY,
+    UNLOAD_MANIFEST,
+    changed_months,
+    export_local,
+    merge_manifest,
+    now,
+    partition_path,
+    read_json,
+    unload_batches,
+    unload_entry,
+    unload_plan,
+    watermark_statement,
+)
+from health_data.ingest import (
+    batch_load_statements,
+    build_manifest,
+    conf_file_keys,
+    group_files_by_table,
+    manifest_key,
+)
+from health_data.local_engine import run_pipeline, write_tables
+from health_data.maintenance import run_maintenance
+from health_data.parquet import ParquetOutput, convert_s3_csv
+from health_data.prevalidate import quarantine_file, validate_s3_csv
+from health_data.redshift_data import RedshiftStatementOperator
+from health_data.run_metrics import (
+    METRICS_KEY,
+    format_summary,
+    history,
+    hot_spots,
+    parent_statement_id,
+    push_metrics,
+    record_statements,
+    statement_metrics,
+    summary,
+    task_metrics,
+)
+from health_data.step_cache import input_fingerprint, run_cached
 
 # DAG default args
 default_args = {
-    'owner': 'airflow',
-    'start_date': datetime(2024, 1, 1),
+    "owner": "airflow",
+    "start_date": datetime(2024, 1, 1),
+    "retries": 2,
 }
 
-def ingest_new_s3_files():
+# "parquet" converts new CSVs to typed, partitioned Parquet before the bronze
+# COPY (FORMAT AS PARQUET); "csv" COPYs the raw files as before.
+LOAD_FORMAT = "parquet"
+
+# "redshift" runs the stored procedures; "local" builds the same silver and
+# gold tables with the embedded engine, e.g. for backfills and development.
+# Conf {"engine": ...} overrides it per run.
+ENGINE = "redshift"
+LOCAL_OUTPUT_PREFIX = "local/"
+
+# Silver steps only process bronze batches above their watermark and gold only
+# the months changed since its last refresh. Trigger the DAG with
+# {"full_refresh": true} to reprocess everything (backfills).
+FULL_REFRESH = "{{ 'TRUE' if (dag_run.conf or {}).get('full_refresh') else 'FALSE' }}"
+
+# silver.providerdim only writes new or changed providers (row hash). True keeps
+# type-2 history (effective_from/effective_to/is_current) instead of updating
+# changed providers in place. Pick one mode per environment and keep it.
+PROVIDER_DIM_HISTORY = False
+
+# Validation and transform steps are skipped (succeed from cache) when their
+# inputs are unchanged since their last success: the ingested file set, the
+# deployed procedures and this code. Trigger with {"force": true} to rerun them.
+INPUT_FINGERPRINT = "{{ ti.xcom_pull(task_ids='fingerprint_inputs') }}"
+
+# Quarters of health_data_backfill_dag validated and converted at once; each
+# quarter is then loaded and transformed in one task, one quarter at a time
+# (shared batch ids and watermarks)
+BACKFILL_CONCURRENCY = 4
+
+# What each backfill partition runs once loaded: rule sets (without their
+# row-count deltas) and incremental procedure calls, in order
+PROVIDER_BACKFILL_STEPS = [
+    RULE_SETS["validate_providerinfo"],
+    "CALL sp_generate_silver_provider_dim(FALSE, "
+    + ("TRUE" if PROVIDER_DIM_HISTORY else "FALSE")
+    + ");",
+]
+QUARTER_BACKFILL_STEPS = [
+    "CALL sp_stage_silver_fact_table(FALSE);",
+    RULE_SETS["validate_dailynursestaffing"],
+    RULE_SETS["validate_fact_table"],
+    "CALL sp_generate_silver_fact_table();",
+    "CALL sp_generate_silver_staffingtype_dim();",
+    "CALL sp_generate_silver_workdate_dim(FALSE);",
+    "CALL sp_generate_gold_provider_staffing_utilization_metric(FALSE);",
+    "CALL sp_refresh_gold_rollups(FALSE);",
+]
+
+
+def prevalidate_new_s3_files(**context):
+    log = LoggingMixin().log
     s3_hook = S3Hook(aws_conn_id="aws_default")
     redshift_hook = RedshiftSQLHook(redshift_conn_id="redshift_default")
 
     bucket = "health-data-project-bucket"
     prefix = "data/"
-    all_files = s3_hook.list_keys(bucket_name=bucket, prefix=prefix)
-
-    # Filter only CSV files
-    all_csv_files = [f for f in all_files if f.endswith(".csv")]
 
-    # Get already ingested files
-    ingested_df = redshift_hook.get_pandas_df("SELECT filename FROM bronze.ingested_files")
-    ingested_files = set(ingested_df["filename"].tolist())
-
-    # Filter new files
-    new_files = [f for f in all_csv_files if f.split("/")[-1] not in ingested_files]
+    # Runs triggered by the trigger_mwaa Lambda carry the keys that arrived;
+    # only those are looked up (HEAD for the ETag) and queued. Manual runs
+    # reconcile the whole prefix
+    s3_client = s3_hook.get_conn()
+    conf_keys = conf_file_keys(context["dag_run"].conf, prefix)
+    if conf_keys is None:
+        candidates = list_prefix(s3_client, bucket, prefix)
+    else:
+        log.info(f"{len(conf_keys)} file(s) passed in the run conf")
+        candidates = describe_keys(s3_client, bucket, conf_keys, log)
+
+    # Queue (key, ETag) pairs not loaded yet, then work off the whole queue,
+    # including files left behind by an earlier failed run
+    enqueue(redshift_hook, candidates)
+    new_files = {f.s3_key: f for f in pending_files(redshift_hook)}
 
     if not new_files:
-        raise ValueError("No new files to ingest")
-
-    # Call stored procedure for each new file
-    for file_key in new_files:
-        file_path = f"s3://{bucket}/{file_key}"
-        redshift_hook.run(f"CALL sp_ingest_data_from_s3('{file_path}'::TEXT);")
+        # Nothing to load: skip the load tasks, the cached steps still run
+        raise AirflowSkipException("No new files to ingest")
+
+    # Check every file on S3 before it can reach bronze; failures are moved to
+    # the quarantine prefix with an error report and are not loaded
+    reports = []
+    quarantined = []
+    rows_read = 0
+    for table, file_keys in group_files_by_table(list(new_files)).items():
+        for key in file_keys:
+            report = validate_s3_csv(s3_hook, bucket, key, table)
+            rows_read += report.row_count
+            if report.ok:
+                log.info(f"{key}: {report.row_count} rows passed pre-load validation")
+                reports.append(report)
+                continue
+            target = quarantine_file(s3_hook, bucket, report)
+            quarantined.append(new_files[key])
+            log.error(f"{key} quarantined to {target}:\n" + "\n".join(report.errors))
+
+    if quarantined:
+        redshift_hook.run(dequeue_statement(quarantined))
+
+    # Same bytes as a file already loaded (or earlier in this run) under
+    # another key: rejected rather than loaded twice
+    seen = loaded_content(redshift_hook, [r.content_hash for r in reports])
+    passed = []
+    duplicates = []
+    for report in reports:
+        original = seen.setdefault(report.content_hash, report.key)
+        if original != report.key:
+            log.warning(f"{report.key} has the same content as {original}, not loaded")
+            duplicates.append(
+                DuplicateFile(
+                    new_files[report.key], report.table, report.content_hash, original
+                )
+            )
+            continue
+        passed.append(
+            dict(asdict(new_files[report.key]), content_hash=report.content_hash)
+        )
+
+    push_metrics(
+        context,
+        rows_read=rows_read,
+        bytes_read=sum(f.size for f in new_files.values()),
+    )
 
+    if duplicates:
+        redshift_hook.run(reject_duplicates_statements(duplicates), autocommit=False)
+    if not passed:
+        if duplicates and not quarantined:
+            raise AirflowSkipException("All new files duplicate files already loaded")
+        raise ValueError("No valid files to ingest, all new files were quarantined")
+    return passed
 
 
+def convert_new_s3_files(**context):
+    log = LoggingMixin().log
+    s3_hook = S3Hook(aws_conn_id="aws_default")
 
-def validate_providerinfo():
+    bucket = "health-data-project-bucket"
+    new_files = context["ti"].xcom_pull(task_ids="prevalidate_files")
+    etags = {f["s3_key"]: f["etag"] for f in new_files}
+    content_hashes = {f["s3_key"]: f["content_hash"] for f in new_files}
+
+    # Load plan per bronze table, handed to copy_to_redshift through XCom
+    plan = {}
+    for table, file_keys in group_files_by_table(list(etags)).items():
+        source_etags = [etags[key] for key in file_keys]
+        source_hashes = [content_hashes[key] for key in file_keys]
+        if LOAD_FORMAT != "parquet":
+            plan[table] = {
+                "source_keys": file_keys,
+                "etags": source_etags,
+                "content_hashes": source_hashes,
+                "objects": file_keys,
+                "outputs": [],
+            }
+            continue
+        outputs = []
+        for key in file_keys:
+            produced = convert_s3_csv(s3_hook, bucket, key, table)
+            log.info(
+                f"Converted {key} into {len(produced)} Parquet file(s): "
+                f"{sum(o.row_count for o in produced)} rows, {sum(o.size for o in produced)} bytes"
+            )
+            outputs.extend(produced)
+        plan[table] = {
+            "source_keys": file_keys,
+            "etags": source_etags,
+            "content_hashes": source_hashes,
+            "objects": [o.parquet_key for o in outputs],
+            "outputs": [asdict(o) for o in outputs],
+        }
+    converted = [o for group in plan.values() for o in group["outputs"]]
+    if converted:
+        rows = sum(o["row_count"] for o in converted)
+        push_metrics(
+            context,
+            rows_read=rows,
+            rows_written=rows,
+            bytes_written=sum(o["size"] for o in converted),
+        )
+    return plan
+
+
+def prepare_bronze_loads(**context):
     log = LoggingMixin().log
+    s3_hook = S3Hook(aws_conn_id="aws_default")
+
+    bucket = "health-data-project-bucket"
+    plan = context["ti"].xcom_pull(task_ids="convert_to_parquet")
+
+    # One manifest-driven COPY per target table; each group's statements are
+    # submitted by copy_to_redshift as one Data API batch (a single transaction
+    # that also records the files in bronze.ingested_files)
+    loads = []
+    for table, group in plan.items():
+        outputs = [ParquetOutput(**o) for o in group["outputs"]]
+        sizes = [o.size for o in outputs] if outputs else None
+        key = manifest_key(table, context["run_id"])
+        s3_hook.load_string(
+            build_manifest(bucket, group["objects"], sizes),
+            key=key,
+            bucket_name=bucket,
+            replace=True,
+        )
+        manifest_path = f"s3://{bucket}/{key}"
+        load_format = "PARQUET" if outputs else "CSV"
+        log.info(
+            f"Loading {len(group['source_keys'])} file(s) into bronze.{table} "
+            f"as {load_format} via {manifest_path}"
+        )
+        loads.append(
+            {
+                "statement_name": f"copy_{table}",
+                "sql": batch_load_statements(
+                    manifest_path,
+                    table,
+                    group["source_keys"],
+                    load_format,
+                    outputs,
+                    group["etags"],
+                    group["content_hashes"],
+                ),
+            }
+        )
+    return loads
+
+
+def fingerprint_inputs():
     hook = RedshiftSQLHook(redshift_conn_id="redshift_default")
+    return input_fingerprint(hook)
 
-    query = """
-    SELECT DISTINCT
-        CMS_Certification_Number_CCN,
-        Provider_Name,
-        Provider_Address,
-        City_Town,
-        State,
-        ZIP_Code,
-        Number_of_Certified_Beds,
-        Latitude,
-        Longitude,
-        CURRENT_TIMESTAMP AS ingestion_time
-    FROM bronze.providerinfo;
-    """
 
-    df = hook.get_pandas_df(query)
-
-    if df.empty:
-        raise ValueError("Validation failed: Query returned no data from bronze.providerinfo")
-
-    # Normalize column names
-    df.columns = df.columns.str.strip().str.lower()
-    log.info(f"Returned columns: {df.columns.tolist()}")
-
-    # Define expected columns
-    expected_cols = [
-        'cms_certification_number_ccn',
-        'provider_name',
-        'provider_address',
-        'city_town',
-        'state',
-        'zip_code',
-        'number_of_certified_beds',
-        'latitude',
-        'longitude'
-    ]
+def run_data_quality(rule_set, **context):
+    log = LoggingMixin().log
+    hook = RedshiftSQLHook(redshift_conn_id="redshift_default")
 
-    missing = [col for col in expected_cols if col not in df.columns]
-    if missing:
-        raise ValueError(f"Validation failed: Missing expected columns: {missing}")
+    def run():
+        stats = run_rule_set(hook, RULE_SETS[rule_set], log, run_id=context["run_id"])
+        push_metrics(context, rows_read=stats["row_count"])
+        return stats
+
+    return run_cached(
+        hook,
+        rule_set,
+        context["ti"].xcom_pull(task_ids="fingerprint_inputs"),
+        run,
+        context,
+        log,
+    )
 
-    # Initialize error list
-    errors = []
 
-    # Validate CMS_Certification_Number_CCN: NOT NULL + UNIQUE
-    cc_col = 'cms_certification_number_ccn'
-    cc_nulls = df[cc_col].isnull().sum()
-    cc_dupes = df[cc_col].duplicated().sum()
+def run_engine(context):
+    return (context["dag_run"].conf or {}).get("engine", ENGINE)
 
-    if cc_nulls > 0:
-        errors.append(f"{cc_nulls} NULL values in {cc_col}")
-    if cc_dupes > 0:
-        errors.append(f"{cc_dupes} duplicate values in {cc_col}")
 
-    # Validate all other columns: NOT NULL
-    for col in expected_cols:
-        if col == cc_col:
-            continue
-        nulls = df[col].isnull().sum()
-        if nulls > 0:
-            errors.append(f"{nulls} NULL values in {col}")
+def choose_engine(**context):
+    engine = run_engine(context)
+    if engine == "local":
+        return "run_local_engine"
+    if engine != "redshift":
+        raise ValueError(f"Unknown engine {engine!r}, expected 'redshift' or 'local'")
+    return ["prevalidate_files", "fingerprint_inputs"]
 
-    if errors:
-        raise ValueError("Validation failed:\n" + "\n".join(errors))
 
-    log.info("✅ Validation passed: All fields are NOT NULL, and CCNs are UNIQUE")
-    return df
+def run_local_engine(**context):
+    log = LoggingMixin().log
+    conf = context["dag_run"].conf or {}
+    s3_hook = S3Hook(aws_conn_id="aws_default")
+    bucket = "health-data-project-bucket"
 
-def validate_workdate():
+    with tempfile.TemporaryDirectory() as workdir:
+        if conf.get("input_dir"):
+            paths = sorted(
+                p
+                for p in Path(conf["input_dir"]).rglob("*")
+                if p.suffix in (".csv", ".parquet")
+            )
+        else:
+            # the landed files, in key order (oldest first for dated names)
+            s3_client = s3_hook.get_conn()
+            paths = []
+            for landed in list_prefix(s3_client, bucket, "data/"):
+                path = Path(workdir) / "input" / landed.s3_key
+                path.parent.mkdir(parents=True, exist_ok=True)
+                s3_client.download_file(bucket, landed.s3_key, str(path))
+                paths.append(path)
+
+        tables = run_pipeline(paths)
+        for name, table in tables.items():
+            log.info(f"{name}: {table.num_rows} rows")
+
+        out_dir = conf.get("output_dir") or Path(workdir) / "output"
+        written = write_tables(tables, out_dir)
+        push_metrics(
+            context,
+            rows_written=sum(table.num_rows for table in tables.values()),
+            bytes_written=sum(path.stat().st_size for path in written),
+        )
+
+        # Gold snapshot for Power BI: only the partitions whose rows changed
+        if conf.get("output_dir"):
+            manifest_path = Path(out_dir) / MANIFEST_KEY
+            previous = (
+                json.loads(manifest_path.read_text())
+                if manifest_path.exists()
+                else None
+            )
+            manifest, exported = export_local(
+                tables, out_dir, previous, context["run_id"]
+            )
+            manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            manifest_path.write_text(json.dumps(manifest, indent=2))
+            log.info(f"Exported {len(exported)} changed gold partition(s)")
+            return [str(path) for path in written]
+
+        export_dir = Path(workdir) / "export"
+        manifest, exported = export_local(
+            tables,
+            export_dir,
+            read_json(s3_hook, bucket, MANIFEST_KEY),
+            context["run_id"],
+        )
+        for path in exported:
+            key = path.relative_to(export_dir).as_posix()
+            s3_hook.load_file(str(path), key=key, bucket_name=bucket, replace=True)
+        s3_hook.load_string(
+            json.dumps(manifest, indent=2),
+            key=MANIFEST_KEY,
+            bucket_name=bucket,
+            replace=True,
+        )
+        log.info(f"Exported {len(exported)} changed gold partition(s)")
+
+        keys = []
+        for path in written:
+            key = f"{LOCAL_OUTPUT_PREFIX}{context['run_id']}/{path.name}"
+            s3_hook.load_file(str(path), key=key, bucket_name=bucket, replace=True)
+            keys.append(key)
+        return keys
+
+
+def prepare_gold_export(**context):
     log = LoggingMixin().log
     hook = RedshiftSQLHook(redshift_conn_id="redshift_default")
 
-    query = """
-    SELECT DISTINCT 
-        CAST(WorkDate AS INTEGER) AS WorkDateID,
-        CAST(WorkDate AS DATE) AS WorkDate,
-        EXTRACT(MONTH FROM WorkDate::DATE) AS Month,
-        TO_CHAR(WorkDate::DATE, 'Month') AS MonthName,
-        EXTRACT(YEAR FROM WorkDate::DATE) AS Year,
-        EXTRACT(QUARTER FROM WorkDate::DATE) AS Quarter,
-        CURRENT_TIMESTAMP AS updated_at
-    FROM BRONZE.DailyNurseStaffing;
-    """
+    bucket = "health-data-project-bucket"
+    months, as_of = changed_months(hook)
+    if not months:
+        raise AirflowSkipException("No gold month refreshed since the last export")
+    log.info(f"Exporting {len(months)} changed month(s): {months}")
+
+    # The partitions to read back, handed to publish_gold_export
+    plan = unload_plan(months)
+    context["ti"].xcom_push(
+        key="export",
+        value={
+            "as_of": as_of,
+            "partitions": {t: [list(v) for v in p] for t, p in plan.items()},
+        },
+    )
+    return unload_batches(bucket, plan)
 
-    df = hook.get_pandas_df(query)
 
-    if df.empty:
-        raise ValueError("Validation failed: Query returned no data from BRONZE.DailyNurseStaffing")
+def publish_gold_export(**context):
+    s3_hook = S3Hook(aws_conn_id="aws_default")
+    hook = RedshiftSQLHook(redshift_conn_id="redshift_default")
 
-    # Normalize column names
-    df.columns = df.columns.str.strip().str.lower()
-    log.info(f"Returned columns: {df.columns.tolist()}")
+    bucket = "health-data-project-bucket"
+    export = context["ti"].xcom_pull(task_ids="prepare_gold_export", key="export")
+
+    # Each partition's files and row counts from its UNLOAD manifest
+    replaced = {}
+    for table, partitions in export["partitions"].items():
+        columns = EXPORT_TABLES[table]
+        for values in partitions:
+            key = partition_path(table, columns, values) + UNLOAD_MANIFEST
+            unloaded = read_json(s3_hook, bucket, key) or {}
+            replaced.setdefault(table, []).append(
+                unload_entry(
+                    table, columns, values, unloaded, export["as_of"], context["run_id"]
+                )
+            )
+    manifest = merge_manifest(read_json(s3_hook, bucket, MANIFEST_KEY), replaced, now())
+    s3_hook.load_string(
+        json.dumps(manifest, indent=2),
+        key=MANIFEST_KEY,
+        bucket_name=bucket,
+        replace=True,
+    )
+    # only once the manifest points at the new files
+    hook.run(watermark_statement(export["as_of"]))
+
+    entries = [entry for group in replaced.values() for entry in group]
+    push_metrics(
+        context,
+        rows_written=sum(entry["rows"] for entry in entries),
+        bytes_written=sum(entry["bytes"] for entry in entries),
+    )
 
-    expected_cols = [
-        'workdateid',
-        'workdate',
-        'month',
-        'monthname',
-        'year',
-        'quarter',
-        'updated_at'
-    ]
 
-    missing = [col for col in expected_cols if col not in df.columns]
-    if missing:
-        raise ValueError(f"Validation failed: Missing expected columns: {missing}")
+def maintain_tables():
+    log = LoggingMixin().log
+    hook = RedshiftSQLHook(redshift_conn_id="redshift_default")
+    return run_maintenance(hook, log)
 
-    errors = []
 
-    # Validate WorkDateID: NOT NULL + UNIQUE
-    id_nulls = df['workdateid'].isnull().sum()
-    id_dupes = df['workdateid'].duplicated().sum()
+def summarize_run(**context):
+    log = LoggingMixin().log
+    # A local run does not touch Redshift, whose history and metrics table
+    # may not even be reachable: its stages are only logged and pushed
+    local = run_engine(context) == "local"
+    if not local:
+        hook = RedshiftSQLHook(redshift_conn_id="redshift_default")
+        data_api = RedshiftDataHook(aws_conn_id="aws_default").conn
+    ti = context["ti"]
+
+    stages = []
+    for task_instance in context["dag_run"].get_task_instances():
+        if task_instance.task_id in (ti.task_id, "end"):
+            continue
+        pull = dict(task_ids=task_instance.task_id, map_indexes=task_instance.map_index)
+        metrics = task_metrics(task_instance, ti.xcom_pull(key=METRICS_KEY, **pull))
+        statement_id = None
+        if (
+            not local
+            and task_instance.operator == RedshiftStatementOperator.__name__
+            and not metrics.cached
+        ):
+            statement_id = parent_statement_id(ti.xcom_pull(**pull))
+        if statement_id:
+            try:
+                statement_metrics(
+                    hook, data_api.describe_statement(Id=statement_id), metrics
+                )
+            except Exception as exc:
+                # e.g. no access to the SYS_* views: the Airflow side is still recorded
+                log.warning(f"No Redshift stats for {metrics.stage}: {exc}")
+        stages.append(metrics)
+
+    if local:
+        log.info("Stages of this run\n" + format_summary(stages, {}))
+        return summary(stages)
+
+    hook.run(record_statements(context["run_id"], stages))
+    past = history(hook, context["run_id"])
+    log.info(
+        "Stages of this run (p50 / p95 over previous successful runs)\n"
+        + format_summary(stages, past)
+    )
+    for stage in hot_spots(stages, past):
+        log.warning(
+            f"{stage.stage} took {stage.wall_seconds:.1f}s, "
+            f"above its p95 of {past[stage.task_id][2]:.1f}s"
+        )
+    return summary(stages)
 
-    if id_nulls > 0:
-        errors.append(f"{id_nulls} NULL values in workdateid")
-    if id_dupes > 0:
-        errors.append(f"{id_dupes} duplicate values in workdateid")
 
-    # Validate other fields: NOT NULL
-    for col in expected_cols:
-        if col == 'workdateid':
-            continue
-        nulls = df[col].isnull().sum()
-        if nulls > 0:
-            errors.append(f"{nulls} NULL values in {col}")
+def backfill_id(context):
+    return (context["dag_run"].conf or {}).get("backfill_id") or context["run_id"]
 
-    if errors:
-        raise ValueError("Validation failed:\n" + "\n".join(errors))
 
-    log.info("✅ Validation passed: All fields are NOT NULL, and WorkDateID is UNIQUE")
-    return df
+def plan_backfill(**context):
+    log = LoggingMixin().log
+    s3_hook = S3Hook(aws_conn_id="aws_default")
+    redshift_hook = RedshiftSQLHook(redshift_conn_id="redshift_default")
 
+    bucket = "health-data-project-bucket"
+    s3_client = s3_hook.get_conn()
+    finished = finished_partitions(redshift_hook, backfill_id(context))
+    if finished:
+        log.info(f"Already done in backfill {backfill_id(context)}: {sorted(finished)}")
+    plan = plan_partitions(
+        list_prefix(s3_client, bucket, "data/"),
+        lambda key: file_quarter(s3_client, bucket, key),
+        finished,
+    )
+    for partition in plan:
+        log.info(f"{partition['partition']}: {len(partition['files'])} file(s)")
+
+    # ProviderInfo goes first, on its own; the quarters are mapped
+    providers = [p for p in plan if p["partition"] == PROVIDER_PARTITION]
+    context["ti"].xcom_push(key="providers", value=providers[0] if providers else None)
+    return [p for p in plan if p["partition"] != PROVIDER_PARTITION]
 
 
-def validate_fact_table():
+def prepare_partition(partition, **context):
+    """Validate and convert the partition's files not ingested yet; returns the load statements."""
     log = LoggingMixin().log
-    hook = RedshiftSQLHook(redshift_conn_id="redshift_default")
+    s3_hook = S3Hook(aws_conn_id="aws_default")
+    redshift_hook = RedshiftSQLHook(redshift_conn_id="redshift_default")
 
-    query = """
-    SELECT * FROM (
-        SELECT 
-            PROVNUM AS CCN, 
-            WorkDate AS WorkDateID, 
-            MDScensus AS NumOfPatient, 
-            '1' AS StaffingTypeID, 
-            Hrs_RNDON_emp AS WorkHours,
-            CURRENT_TIMESTAMP AS Updated_At
-        FROM BRONZE.DailyNurseStaffing
-        UNION
-        SELECT 
-            PROVNUM, 
-            WorkDate, 
-            MDScensus, 
-            '2', 
-            Hrs_RNDON_ctr, 
-            CURRENT_TIMESTAMP
-        FROM BRONZE.DailyNurseStaffing
-        UNION
-        SELECT 
-            PROVNUM, 
-            WorkDate,
-            MDScensus, 
-            '3', 
-            Hrs_CNA_emp, 
-            CURRENT_TIMESTAMP
-        FROM BRONZE.DailyNurseStaffing
-        UNION
-        SELECT 
-            PROVNUM, 
-            WorkDate,
-            MDScensus, 
-            '4', 
-            Hrs_CNA_ctr, 
-            CURRENT_TIMESTAMP
-        FROM BRONZE.DailyNurseStaffing
-    ) AS unioned_data
-    ORDER BY WorkDateID ASC;
-    """
+    bucket = "health-data-project-bucket"
+    table = partition["table"]
+    files = unloaded_files(redshift_hook, partition["files"])
+    if len(files) < len(partition["files"]):
+        log.info(f"{len(partition['files']) - len(files)} file(s) already ingested")
+
+    passed = []
+    for landed in files:
+        report = validate_s3_csv(s3_hook, bucket, landed["s3_key"], table)
+        if report.ok:
+            passed.append((landed, report))
+            continue
+        target = quarantine_file(s3_hook, bucket, report)
+        log.error(f"{report.key} quarantined to {target}:\n" + "\n".join(report.errors))
+    push_metrics(
+        context,
+        rows_read=sum(report.row_count for _, report in passed),
+        bytes_read=sum(landed["size"] for landed in files),
+    )
+
+    # Same bytes as a file already loaded (or earlier in this partition)
+    seen = loaded_content(redshift_hook, [report.content_hash for _, report in passed])
+    duplicates = []
+    unique = []
+    for landed, report in passed:
+        original = seen.setdefault(report.content_hash, report.key)
+        if original != report.key:
+            log.warning(f"{report.key} has the same content as {original}, not loaded")
+            duplicates.append(
+                DuplicateFile(
+                    PendingFile(**landed), table, report.content_hash, original
+                )
+            )
+            continue
+        unique.append((landed, report))
+    if duplicates:
+        redshift_hook.run(reject_duplicates_statements(duplicates), autocommit=False)
+    if not unique:
+        log.info(f"Nothing to load for {partition['partition']}")
+        return []
+
+    keys = [landed["s3_key"] for landed, _ in unique]
+    outputs = []
+    if LOAD_FORMAT == "parquet":
+        for key in keys:
+            outputs.extend(convert_s3_csv(s3_hook, bucket, key, table))
+    key = manifest_key(table, f"{context['run_id']}_{partition['partition']}")
+    s3_hook.load_string(
+        build_manifest(
+            bucket,
+            [o.parquet_key for o in outputs] if outputs else keys,
+            [o.size for o in outputs] if outputs else None,
+        ),
+        key=key,
+        bucket_name=bucket,
+        replace=True,
+    )
+    return batch_load_statements(
+        f"s3://{bucket}/{key}",
+        table,
+        keys,
+        "PARQUET" if outputs else "CSV",
+        outputs,
+        [landed["etag"] for landed, _ in unique],
+        [report.content_hash for _, report in unique],
+    )
 
-    df = hook.get_pandas_df(query)
 
-    if df.empty:
-        raise ValueError("Validation failed: Query returned no data from unioned DailyNurseStaffing")
+def load_partition(partition, statements, context):
+    """Run the load statements in one transaction, then checkpoint the partition."""
+    log = LoggingMixin().log
+    hook = RedshiftSQLHook(redshift_conn_id="redshift_default")
+    checkpoint = partition_checkpoint(
+        hook, backfill_id(context), partition["partition"]
+    )
+    if checkpoint == (LOADED, context["run_id"]):
+        # a retry after the load committed: its statements were already run
+        log.info(f"{partition['partition']} already loaded by this run")
+        return
+    if statements:
+        log.info(f"Loading {partition['partition']} into bronze.{partition['table']}")
+        hook.run(statements, autocommit=False)
+    hook.run(
+        checkpoint_statements(
+            backfill_id(context),
+            partition["partition"],
+            LOADED,
+            context["run_id"],
+            len(partition["files"]),
+        ),
+        autocommit=False,
+    )
 
-    # Normalize column names
-    df.columns = df.columns.str.strip().str.lower()
-    log.info(f"Returned columns: {df.columns.tolist()}")
 
-    expected_cols = [
-        'ccn',
-        'workdateid',
-        'numofpatient',
-        'staffingtypeid',
-        'workhours',
-        'updated_at'
-    ]
+def transform_partition(partition, steps, context):
+    """
+    Run the partition's rule sets and procedures in order, then mark it done.
 
-    missing = [col for col in expected_cols if col not in df.columns]
-    if missing:
-        raise ValueError(f"Validation failed: Missing expected columns: {missing}")
+    Safe to rerun when nothing new is staged (files already ingested, a retry
+    after the fact upsert, a resume from a loaded checkpoint): the empty fact
+    stage passes its checks and the procedures pick up where they stopped.
+    """
+    log = LoggingMixin().log
+    hook = RedshiftSQLHook(redshift_conn_id="redshift_default")
+    for step in steps:
+        if isinstance(step, RuleSet):
+            run_rule_set(
+                hook, without_row_count_deltas(step), log, run_id=context["run_id"]
+            )
+        else:
+            log.info(f"{partition['partition']}: {step}")
+            # each CALL is its own transaction, as in the main DAG
+            hook.run(step, autocommit=True)
+    hook.run(
+        checkpoint_statements(
+            backfill_id(context),
+            partition["partition"],
+            DONE,
+            context["run_id"],
+            len(partition["files"]),
+        ),
+        autocommit=False,
+    )
 
-    # Check for NULLs
-    errors = []
-    for col in expected_cols:
-        nulls = df[col].isnull().sum()
-        if nulls > 0:
-            errors.append(f"{nulls} NULL values in {col}")
 
-    if errors:
-        raise ValueError("Validation failed:\n" + "\n".join(errors))
+def backfill_providers(**context):
+    partition = context["ti"].xcom_pull(task_ids="plan_backfill", key="providers")
+    if partition is None:
+        LoggingMixin().log.info("No ProviderInfo partition left to backfill")
+        return
+    load_partition(partition, prepare_partition(partition, **context), context)
+    transform_partition(partition, PROVIDER_BACKFILL_STEPS, context)
 
-    log.info("✅ Validation passed: All fields are NOT NULL")
-    return df
 
+def load_and_transform_quarter(partition, **context):
+    ti = context["ti"]
+    statements = ti.xcom_pull(
+        task_ids="backfill_quarter.prepare_partition", map_indexes=ti.map_index
+    )
+    load_partition(partition, statements, context)
+    transform_partition(partition, QUARTER_BACKFILL_STEPS, context)
 
 
 with DAG(
@@ -307,11 +810,22 @@ with DAG(
     default_args=default_args,
     schedule=None,  # only runs when triggered manually
     catchup=False,
+    max_active_runs=1,  # runs triggered while one is loading wait for it
     tags=["redshift", "s3", "bronze"],
 ) as dag:
 
     start = EmptyOperator(task_id="start")
 
+    choose_engine_task = BranchPythonOperator(
+        task_id="choose_engine",
+        python_callable=choose_engine,
+    )
+
+    run_local_engine_task = PythonOperator(
+        task_id="run_local_engine",
+        python_callable=run_local_engine,
+    )
+
     # gdrive_to_s3_task = PythonOperator(
     # task_id="gdrive_to_s3",
     # python_callable=gdrive_to_s3
@@ -323,89 +837,235 @@ with DAG(
     #     sql="CALL sp_ingest_data_from_s3();",
     # )
 
-    ingest_to_redshift_task = PythonOperator(
-        task_id="copy_to_redshift",
-        python_callable=ingest_new_s3_files,
+    prevalidate_files_task = PythonOperator(
+        task_id="prevalidate_files",
+        python_callable=prevalidate_new_s3_files,
     )
 
-    transform_dim_provider_silver = PostgresOperator(
-        task_id="transform_dim_provider_silver",
-        postgres_conn_id="redshift_default",  # Make sure this connection exists
-        sql="CALL sp_generate_silver_provider_dim();",
+    convert_to_parquet_task = PythonOperator(
+        task_id="convert_to_parquet",
+        python_callable=convert_new_s3_files,
+    )
+
+    prepare_bronze_loads_task = PythonOperator(
+        task_id="prepare_bronze_loads",
+        python_callable=prepare_bronze_loads,
     )
 
-    validate_providerinfo_task = PythonOperator(
-        task_id="validate_providerinfo",
-        python_callable=validate_providerinfo
+    # One deferred Data API batch per bronze table; the worker slot is free
+    # while the COPY runs. The batches may run at once: sp_ingest_batch_from_s3
+    # locks bronze.ingested_files while it numbers and records its batch
+    ingest_to_redshift_task = RedshiftStatementOperator.partial(
+        task_id="copy_to_redshift",
+    ).expand_kwargs(prepare_bronze_loads_task.output)
+
+    # Runs whether or not anything was loaded; the steps below compare it with
+    # the fingerprint of their last success
+    fingerprint_inputs_task = PythonOperator(
+        task_id="fingerprint_inputs",
+        python_callable=fingerprint_inputs,
+        trigger_rule=TriggerRule.NONE_FAILED,
     )
 
-    validate_workdate_task = PythonOperator(
-        task_id="validate_dailynursestaffing",
-        python_callable=validate_workdate
+    transform_dim_provider_silver = RedshiftStatementOperator(
+        task_id="transform_dim_provider_silver",
+        input_fingerprint=INPUT_FINGERPRINT,
+        sql="CALL sp_generate_silver_provider_dim("
+        + FULL_REFRESH
+        + ", "
+        + ("TRUE" if PROVIDER_DIM_HISTORY else "FALSE")
+        + ");",
     )
 
-    validate_fact_table_task = PythonOperator(
-        task_id="validate_fact_table",
-        python_callable= validate_fact_table
+    # One validation task per rule set in health_data/dq_rules.py
+    validation_tasks = {
+        name: PythonOperator(
+            task_id=name,
+            python_callable=run_data_quality,
+            op_kwargs={"rule_set": name},
+        )
+        for name in RULE_SETS
+    }
+
+    stage_fact_table_silver = RedshiftStatementOperator(
+        task_id="stage_fact_table_silver",
+        input_fingerprint=INPUT_FINGERPRINT,
+        sql="CALL sp_stage_silver_fact_table(" + FULL_REFRESH + ");",
     )
-   
-   
-    transform_fact_table_silver = PostgresOperator(
+
+    transform_fact_table_silver = RedshiftStatementOperator(
         task_id="transform_fact_table_silver",
-        postgres_conn_id="redshift_default",  # Make sure this connection exists
+        input_fingerprint=INPUT_FINGERPRINT,
         sql="CALL sp_generate_silver_fact_table();",
     )
 
-    transform_dim_staffingtype_silver = PostgresOperator(
+    transform_dim_staffingtype_silver = RedshiftStatementOperator(
         task_id="transform_dim_staffingtype_silver",
-        postgres_conn_id="redshift_default",  # Make sure this connection exists
+        input_fingerprint=INPUT_FINGERPRINT,
         sql="CALL sp_generate_silver_staffingtype_dim();",
     )
 
-
-   
-
-    transform_dim_workdate_silver = PostgresOperator(
+    transform_dim_workdate_silver = RedshiftStatementOperator(
         task_id="transform_dim_workdate_silver",
-        postgres_conn_id="redshift_default",  # Make sure this connection exists
-        sql="CALL sp_generate_silver_workdate_dim();",
+        input_fingerprint=INPUT_FINGERPRINT,
+        sql="CALL sp_generate_silver_workdate_dim(" + FULL_REFRESH + ");",
     )
 
-    transform_provider_staffing_utilization_metric_gold = PostgresOperator(
+    transform_provider_staffing_utilization_metric_gold = RedshiftStatementOperator(
         task_id="transform_provider_staffing_utilization_metric_gold",
-        postgres_conn_id="redshift_default",  # Make sure this connection exists
-        sql="CALL sp_generate_gold_provider_staffing_utilization_metric();",
+        input_fingerprint=INPUT_FINGERPRINT,
+        sql="CALL sp_generate_gold_provider_staffing_utilization_metric("
+        + FULL_REFRESH
+        + ");",
     )
 
-    end = EmptyOperator(task_id="end")
+    refresh_gold_rollups = RedshiftStatementOperator(
+        task_id="refresh_gold_rollups",
+        input_fingerprint=INPUT_FINGERPRINT,
+        sql="CALL sp_refresh_gold_rollups(" + FULL_REFRESH + ");",
+    )
+
+    prepare_gold_export_task = PythonOperator(
+        task_id="prepare_gold_export",
+        python_callable=prepare_gold_export,
+    )
+
+    # One deferred Data API batch of per-partition UNLOADs per gold table
+    unload_gold_task = RedshiftStatementOperator.partial(
+        task_id="unload_gold",
+    ).expand_kwargs(prepare_gold_export_task.output)
+
+    publish_gold_export_task = PythonOperator(
+        task_id="publish_gold_export",
+        python_callable=publish_gold_export,
+    )
+
+    maintain_tables_task = PythonOperator(
+        task_id="maintain_tables",
+        python_callable=maintain_tables,
+    )
+
+    # Runs once every other task is done, whatever its state, so failed and
+    # slow runs are reported too
+    summarize_run_task = PythonOperator(
+        task_id="summarize_run",
+        python_callable=summarize_run,
+        trigger_rule=TriggerRule.ALL_DONE,
+    )
+
+    # reached from either engine
+    end = EmptyOperator(
+        task_id="end", trigger_rule=TriggerRule.NONE_FAILED_MIN_ONE_SUCCESS
+    )
 
 
 # Create a dummy "validation_gate" that only proceeds if both validations succeed
 validation_gate_01 = EmptyOperator(
-    task_id="validation_gate_01",
-    trigger_rule=TriggerRule.ALL_SUCCESS
+    task_id="validation_gate_01", trigger_rule=TriggerRule.ALL_SUCCESS
 )
 validation_gate_02 = EmptyOperator(
-    task_id="validation_gate_02",
-    trigger_rule=TriggerRule.ALL_SUCCESS
+    task_id="validation_gate_02", trigger_rule=TriggerRule.ALL_SUCCESS
 )
 
 
 # DAG structure
-start >>  ingest_to_redshift_task 
+start >> choose_engine_task >> [prevalidate_files_task, run_local_engine_task]
+run_local_engine_task >> end
+
+# The Redshift path; choose_engine also follows fingerprint_inputs directly so
+# the local path skips it (it runs even when nothing was loaded)
+choose_engine_task >> fingerprint_inputs_task
+prevalidate_files_task >> convert_to_parquet_task
+convert_to_parquet_task >> prepare_bronze_loads_task >> ingest_to_redshift_task
+ingest_to_redshift_task >> fingerprint_inputs_task
+
+# # Run the validations in parallel; a rule set whose relation is built by a
+# # task (the staged fact unpivot) waits for it
+fingerprint_inputs_task >> stage_fact_table_silver
+for rule_set in RULE_SETS.values():
+    upstream = (
+        dag.get_task(rule_set.upstream)
+        if rule_set.upstream
+        else fingerprint_inputs_task
+    )
+    upstream >> validation_tasks[rule_set.name] >> validation_gate_01
+
+# # Downstream transformations only run if gate passes
+(
+    validation_gate_01
+    >> [
+        transform_dim_provider_silver,
+        transform_fact_table_silver,
+        transform_dim_staffingtype_silver,
+        transform_dim_workdate_silver,
+    ]
+    >> validation_gate_02
+    >> transform_provider_staffing_utilization_metric_gold
+)
 
-# # Run both validations in parallel
-ingest_to_redshift_task >> [validate_providerinfo_task, validate_workdate_task,validate_fact_table_task]
+# ANALYZE / VACUUM only the tables past their thresholds once the run's writes are done
+transform_provider_staffing_utilization_metric_gold >> refresh_gold_rollups
+refresh_gold_rollups >> maintain_tables_task >> end
 
+# Power BI snapshot of the changed gold partitions, next to maintenance
+refresh_gold_rollups >> prepare_gold_export_task >> unload_gold_task
+unload_gold_task >> publish_gold_export_task >> end
 
+# The summary waits for every task but end; end still fails the run when a
+# pipeline task failed
+(
+    [task for task in dag.tasks if task.task_id not in ("summarize_run", "end")]
+    >> summarize_run_task
+    >> end
+)
 
-# # Connect validations to the gate
-[validate_providerinfo_task, validate_workdate_task, validate_fact_table_task] >> validation_gate_01
 
-# # Downstream transformations only run if gate passes
-validation_gate_01 >> [
-    transform_dim_provider_silver,
-    transform_fact_table_silver,
-    transform_dim_staffingtype_silver,
-    transform_dim_workdate_silver
-] >> validation_gate_02 >> transform_provider_staffing_utilization_metric_gold >> end
+with DAG(
+    dag_id="health_data_backfill_dag",
+    default_args=default_args,
+    schedule=None,  # only runs when triggered manually
+    catchup=False,
+    max_active_runs=1,
+    tags=["redshift", "s3", "bronze"],
+) as backfill_dag:
+
+    backfill_start = EmptyOperator(task_id="start")
+
+    plan_backfill_task = PythonOperator(
+        task_id="plan_backfill",
+        python_callable=plan_backfill,
+    )
+
+    # Silver and gold join the quarters to the provider dimension: load it first
+    backfill_providers_task = PythonOperator(
+        task_id="backfill_providers",
+        python_callable=backfill_providers,
+    )
+
+    # One mapped group per quarter; a failed quarter retries (or is cleared)
+    # on its own and the finished ones keep their checkpoint
+    @task_group(group_id="backfill_quarter")
+    def backfill_quarter(partition):
+        prepare = PythonOperator(
+            task_id="prepare_partition",
+            python_callable=prepare_partition,
+            op_kwargs={"partition": partition},
+            max_active_tis_per_dagrun=BACKFILL_CONCURRENCY,
+        )
+        # Load and transform in one task: the procedures consume every batch
+        # above their watermarks, so no other quarter may load in between
+        load_and_transform = PythonOperator(
+            task_id="load_and_transform_partition",
+            python_callable=load_and_transform_quarter,
+            op_kwargs={"partition": partition},
+            max_active_tis_per_dagrun=1,
+        )
+        prepare >> load_and_transform
+
+    backfill_quarters = backfill_quarter.expand(partition=plan_backfill_task.output)
+
+    # nothing left to backfill skips the quarter group
+    backfill_end = EmptyOperator(task_id="end", trigger_rule=TriggerRule.NONE_FAILED)
+
+    backfill_start >> plan_backfill_task >> backfill_providers_task
+    backfill_providers_task >> backfill_quarters >> backfill_end
@@ -0,0 +1,7 @@
+"""
+Helper modules shared by the health_data_project_dag tasks.
+
+The package lives next to the DAG file so it is importable on MWAA (the DAGs
+folder is on ``sys.path``) and is excluded from DAG parsing via
+``.airflowignore``.
+"""
@@ -0,0 +1,154 @@
+"""
+Historical backfill partitioned by quarter.
+
+``health_data_backfill_dag`` reloads the landed history one calendar quarter
+(the ``CY_Qtr`` of DailyNurseStaffing) at a time, each quarter a mapped task
+group: pre-validation and Parquet conversion run for up to
+``BACKFILL_CONCURRENCY`` quarters at once; a quarter's bronze COPY and its
+silver / gold procedures run as one task, one quarter at a time, because the
+procedures consume every batch above the shared watermarks: another quarter's
+load between them would be transformed and checkpointed with this one.
+ProviderInfo files are loaded first, before any quarter is transformed.
+
+Progress is checkpointed per quarter in ``bronze.backfill_partitions``
+under a backfill id (the run id, or conf {"backfill_id": ...} to resume an
+earlier backfill in a new run): quarters marked done are not planned again,
+files already in ``bronze.ingested_files`` with the same ETag are not loaded
+again, and a failed quarter's task can be cleared without touching the
+others.
+"""
+
+import csv
+import io
+from collections import defaultdict
+from dataclasses import asdict, replace
+
+from health_data.ingest import route_file, sql_literal
+from health_data.prevalidate import normalize_name
+
+CHECKPOINT_TABLE = "bronze.backfill_partitions"
+PROVIDER_PARTITION = "providerinfo"
+
+LOADED = "loaded"
+DONE = "done"
+
+# Bytes read from the start of a file to find its quarter
+HEAD_BYTES = 64 * 1024
+
+INGESTED_SQL = "SELECT DISTINCT s3_key, etag, filename FROM bronze.ingested_files"
+
+
+def file_quarter(s3_client, bucket, key):
+    """``CY_Qtr`` of the first data row, from a ranged GET of the file's head."""
+    body = s3_client.get_object(
+        Bucket=bucket, Key=key, Range=f"bytes=0-{HEAD_BYTES - 1}"
+    )
+    head = body["Body"].read().decode("utf-8", errors="replace")
+    rows = csv.reader(io.StringIO(head))
+    header = [normalize_name(name) for name in next(rows, [])]
+    if "cy_qtr" not in header:
+        raise ValueError(f"{key} has no CY_Qtr column")
+    for row in rows:
+        if len(row) > header.index("cy_qtr") and row[header.index("cy_qtr")].strip():
+            return row[header.index("cy_qtr")].strip()
+    raise ValueError(
+        f"No data row with a CY_Qtr in the first {HEAD_BYTES} bytes of {key}"
+    )
+
+
+def plan_partitions(files, quarter_of, finished=()):
+    """
+    Group landed files (PendingFile) into ``[{"partition", "table", "files"}]``:
+    the ProviderInfo files first, then one partition per quarter in order.
+    Partitions in ``finished`` are left out.
+    """
+    providers = []
+    quarters = defaultdict(list)
+    for landed in files:
+        if route_file(landed.s3_key) == "ProviderInfo":
+            providers.append(landed)
+        else:
+            quarters[quarter_of(landed.s3_key)].append(landed)
+    plan = []
+    if providers:
+        plan.append(
+            {
+                "partition": PROVIDER_PARTITION,
+                "table": "ProviderInfo",
+                "files": providers,
+            }
+        )
+    for quarter in sorted(quarters):
+        plan.append(
+            {
+                "partition": quarter,
+                "table": "DailyNurseStaffing",
+                "files": quarters[quarter],
+            }
+        )
+    return [
+        dict(p, files=[asdict(f) for f in p["files"]])
+        for p in plan
+        if p["partition"] not in finished
+    ]
+
+
+def finished_partitions(hook, backfill_id):
+    rows = hook.get_records(
+        f"SELECT partition_key FROM {CHECKPOINT_TABLE} "
+        f"WHERE backfill_id = {sql_literal(backfill_id)} AND stage = {sql_literal(DONE)}"
+    )
+    return {row[0] for row in rows}
+
+
+def partition_checkpoint(hook, backfill_id, partition):
+    """``(stage, run_id)`` of the partition's checkpoint, or None."""
+    row = hook.get_first(
+        f"SELECT stage, run_id FROM {CHECKPOINT_TABLE} "
+        f"WHERE backfill_id = {sql_literal(backfill_id)} "
+        f"AND partition_key = {sql_literal(partition)}"
+    )
+    return None if row is None else tuple(row)
+
+
+def unloaded_files(hook, files):
+    """
+    The partition's files not yet ingested with their current ETag (loaded or
+    rejected as a duplicate); files recorded without an ETag count as ingested,
+    and those recorded without a key are matched by filename.
+    """
+    ingested, legacy = set(), set()
+    for s3_key, etag, filename in hook.get_records(INGESTED_SQL):
+        if s3_key is None:
+            legacy.add(filename)
+        else:
+            ingested.add((s3_key, etag))
+    return [
+        f
+        for f in files
+        if (f["s3_key"], f["etag"]) not in ingested
+        and (f["s3_key"], None) not in ingested
+        and f["s3_key"].split("/")[-1] not in legacy
+    ]
+
+
+def checkpoint_statements(backfill_id, partition, stage, run_id, files=0):
+    """Record that ``partition`` reached ``stage`` (replaces its earlier entry)."""
+    return [
+        f"DELETE FROM {CHECKPOINT_TABLE} WHERE backfill_id = {sql_literal(backfill_id)} "
+        f"AND partition_key = {sql_literal(partition)};",
+        f"INSERT INTO {CHECKPOINT_TABLE} "
+        "(backfill_id, partition_key, stage, file_count, run_id, updated_at) "
+        f"VALUES ({sql_literal(backfill_id)}, {sql_literal(partition)}, "
+        f"{sql_literal(stage)}, {int(files)}, {sql_literal(run_id)}, GETDATE());",
+    ]
+
+
+def without_row_count_deltas(rule_set):
+    """
+    The rule set without its row-count deltas: a backfill reloads the
+    history, so its counts are not compared with the regular runs'.
+    """
+    return replace(
+        rule_set, rules=[r for r in rule_set.rules if r.kind != "row_count_delta"]
+    )
@@ -0,0 +1,103 @@
+"""
+Streaming reader for landed CSVs, shared by the pre-load validator and the
+Parquet conversion.
+
+Files are read in fixed-size blocks as positional string columns named after
+the bronze table, so memory stays bounded whatever the file size. The reader
+applies the parsing side of the CSV COPY options: invalid UTF-8 is replaced
+(ACCEPTINVCHARS) and records missing trailing fields are padded (FILLRECORD).
+"""
+
+import codecs
+import csv
+import io
+
+import pyarrow as pa
+import pyarrow.csv as pv
+
+from health_data.bronze_schema import source_columns
+
+BLOCK_SIZE = 8 * 1024 * 1024
+
+
+class _Utf8ReplacingStream(io.RawIOBase):
+    """Byte stream that replaces invalid UTF-8 sequences, like ACCEPTINVCHARS."""
+
+    def __init__(self, raw, chunk_size=1024 * 1024):
+        self._raw = raw
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = b""
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer and not self._eof:
+            chunk = self._raw.read(self._chunk_size)
+            self._eof = not chunk
+            self._buffer = self._decoder.decode(chunk or b"", final=self._eof).encode()
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def _peek_header(stream):
+    """Fields of the header line, leaving the stream unread."""
+    line = stream.peek(64 * 1024).split(b"\n", 1)[0].rstrip(b"\r")
+    return next(csv.reader([line.decode("utf-8", errors="replace")]), [])
+
+
+def _with_padded_rows(reader, short_rows, names):
+    """Yield the reader's batches, then the short records padded to full width."""
+    yield from reader
+    if short_rows:
+        records = [
+            fields + [""] * (len(names) - len(fields))
+            for fields in csv.reader(short_rows)
+        ]
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(column, pa.string()) for column in zip(*records)], names=names
+        )
+
+
+def open_bronze_csv(source, table, source_key):
+    """
+    Open a CSV byte stream for bronze ``table``.
+
+    Returns ``(header, batches)``: the file's own header fields and an
+    iterator of record batches whose string columns carry the bronze column
+    names by position. Raises ValueError when the file has more columns than
+    the table, which COPY rejects as well.
+    """
+    stream = io.BufferedReader(_Utf8ReplacingStream(source), buffer_size=BLOCK_SIZE)
+    columns = source_columns(table)
+    header = _peek_header(stream)
+    if len(header) > len(columns):
+        raise ValueError(
+            f"{source_key} has {len(header)} columns, bronze.{table} takes {len(columns)}"
+        )
+    names = [name for name, _ in columns[: len(header)]]
+    short_rows = []
+
+    def pad_short_row(row):
+        # FILLRECORD: records missing trailing fields load them as NULL
+        if row.actual_columns < row.expected_columns:
+            short_rows.append(row.text)
+            return "skip"
+        return "error"
+
+    reader = pv.open_csv(
+        stream,
+        read_options=pv.ReadOptions(
+            column_names=names, skip_rows=1, block_size=BLOCK_SIZE
+        ),
+        convert_options=pv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            strings_can_be_null=False,
+        ),
+        parse_options=pv.ParseOptions(invalid_row_handler=pad_short_row),
+    )
+    return header, _with_padded_rows(reader, short_rows, names)
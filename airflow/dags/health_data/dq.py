@@ -0,0 +1,341 @@
+"""
+Declarative data-quality rules compiled to one aggregate query per table.
+
+A ``RuleSet`` names a relation and the rules it must satisfy. Every rule
+contributes one violation-count expression to a single ``SELECT`` over the
+relation, so a table is read once however many rules it has; referential
+rules add a LEFT JOIN to the distinct keys of the referenced dimension.
+Only one row of counts leaves the cluster.
+
+Each run is recorded in ``silver.dq_results`` (one row per rule plus the row
+count, whose ``passed`` is the outcome of the whole set); the row-count delta
+rule compares against the row count of the last run that passed.
+Messages for not-null and unique rules match the former pandas validators.
+"""
+
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+
+from health_data.ingest import sql_literal
+
+RESULTS_TABLE = "silver.dq_results"
+
+ERROR = "error"
+WARN = "warn"
+
+
+@dataclass(frozen=True)
+class Rule:
+    kind: str
+    column: Optional[str] = None
+    low: Optional[float] = None
+    high: Optional[float] = None
+    pattern: Optional[str] = None
+    ref_table: Optional[str] = None
+    ref_column: Optional[str] = None
+    max_drop_pct: Optional[float] = None
+    severity: str = ERROR
+
+    @property
+    def name(self):
+        return f"{self.kind}_{self.column}" if self.column else self.kind
+
+
+def not_null(column, severity=ERROR):
+    return Rule("not_null", column, severity=severity)
+
+
+def unique(column, severity=ERROR):
+    return Rule("unique", column, severity=severity)
+
+
+def accepted_range(column, low=None, high=None, severity=ERROR):
+    return Rule("range", column, low=low, high=high, severity=severity)
+
+
+def matches(column, pattern, severity=ERROR):
+    return Rule("regex", column, pattern=pattern, severity=severity)
+
+
+def references(column, ref_table, ref_column=None, severity=ERROR):
+    return Rule(
+        "references",
+        column,
+        ref_table=ref_table,
+        ref_column=ref_column or column,
+        severity=severity,
+    )
+
+
+def row_count_delta(max_drop_pct, severity=ERROR):
+    """
+    Row count may not drop more than ``max_drop_pct`` % below the last run
+    that passed; growth is never flagged.
+    """
+    return Rule("row_count_delta", max_drop_pct=max_drop_pct, severity=severity)
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    name: str  # also the Airflow task id
+    source: str  # used in "Query returned no data from <source>"
+    relation_sql: str  # SELECT producing the rows to validate (no trailing ';')
+    rules: Sequence[Rule]
+    upstream: Optional[str] = None  # task that builds the relation, if not the load
+    allow_empty: bool = False  # an empty relation passes (nothing new was staged)
+    success_message: str = "✅ Validation passed"
+
+    @property
+    def columns(self):
+        """Columns the rules need, in first-use order."""
+        seen = []
+        for rule in self.rules:
+            if rule.column and rule.column not in seen:
+                seen.append(rule.column)
+        return seen
+
+
+@dataclass
+class RuleResult:
+    rule: Rule
+    value: int
+    message: Optional[str] = None
+
+    @property
+    def passed(self):
+        return self.message is None
+
+
+@dataclass
+class RuleSetResult:
+    rule_set: RuleSet
+    row_count: int
+    results: list = field(default_factory=list)
+
+    @property
+    def errors(self):
+        return [
+            r.message for r in self.results if not r.passed and r.rule.severity == ERROR
+        ]
+
+    @property
+    def warnings(self):
+        return [
+            r.message for r in self.results if not r.passed and r.rule.severity == WARN
+        ]
+
+    def stats(self):
+        stats = {"row_count": self.row_count}
+        stats.update({r.rule.name: r.value for r in self.results})
+        return stats
+
+
+def _number(value):
+    return repr(value) if isinstance(value, float) else str(int(value))
+
+
+def _violation_sql(rule, index):
+    col = f"v.{rule.column}" if rule.column else None
+    if rule.kind == "not_null":
+        return f"COUNT(*) - COUNT({col})"
+    if rule.kind == "unique":
+        # like pandas duplicated().sum(): all NULLs count as one value
+        return (
+            f"COUNT(*) - COUNT(DISTINCT {col})"
+            f" - CASE WHEN COUNT(*) > COUNT({col}) THEN 1 ELSE 0 END"
+        )
+    if rule.kind == "range":
+        bounds = []
+        if rule.low is not None:
+            bounds.append(f"{col} < {_number(rule.low)}")
+        if rule.high is not None:
+            bounds.append(f"{col} > {_number(rule.high)}")
+        return f"SUM(CASE WHEN {' OR '.join(bounds)} THEN 1 ELSE 0 END)"
+    if rule.kind == "regex":
+        return (
+            f"SUM(CASE WHEN {col} IS NOT NULL AND REGEXP_COUNT(CAST({col} AS VARCHAR), "
+            f"{sql_literal(rule.pattern)}) = 0 THEN 1 ELSE 0 END)"
+        )
+    if rule.kind == "references":
+        return (
+            f"SUM(CASE WHEN {col} IS NOT NULL AND r{index}.ref_key IS NULL "
+            f"THEN 1 ELSE 0 END)"
+        )
+    raise ValueError(f"Unknown rule kind: {rule.kind}")
+
+
+def scan_rules(rule_set):
+    """Rules evaluated by the aggregate query (all but row-count deltas)."""
+    return [rule for rule in rule_set.rules if rule.kind != "row_count_delta"]
+
+
+def build_rule_sql(rule_set):
+    """
+    Compile every rule of a set into one aggregate query over the relation.
+
+    Output columns: row_count, then one violation count per scan rule, in
+    declaration order.
+    """
+    select_list = ["COUNT(*) AS row_count"]
+    joins = []
+    for index, rule in enumerate(scan_rules(rule_set)):
+        select_list.append(f"{_violation_sql(rule, index)} AS m{index}")
+        if rule.kind == "references":
+            joins.append(
+                f"LEFT JOIN (SELECT DISTINCT CAST({rule.ref_column} AS VARCHAR) AS ref_key "
+                f"FROM {rule.ref_table}) AS r{index} "
+                f"ON CAST(v.{rule.column} AS VARCHAR) = r{index}.ref_key"
+            )
+    return "SELECT\n    {}\nFROM ({}) AS v{}".format(
+        ",\n    ".join(select_list),
+        rule_set.relation_sql,
+        "".join(f"\n{join}" for join in joins),
+    )
+
+
+def _message(rule, value):
+    if rule.kind == "not_null":
+        return f"{value} NULL values in {rule.column}"
+    if rule.kind == "unique":
+        return f"{value} duplicate values in {rule.column}"
+    if rule.kind == "range":
+        low = "-inf" if rule.low is None else rule.low
+        high = "inf" if rule.high is None else rule.high
+        return f"{value} values in {rule.column} outside [{low}, {high}]"
+    if rule.kind == "regex":
+        return f"{value} values in {rule.column} do not match {rule.pattern}"
+    return f"{value} values in {rule.column} not found in {rule.ref_table}.{rule.ref_column}"
+
+
+def fetch_columns(hook, relation_sql):
+    """Return the normalized column names of a relation without reading rows."""
+    conn = hook.get_conn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT * FROM ({relation_sql}) AS v LIMIT 0")
+        return [d[0].strip().lower() for d in cursor.description]
+    finally:
+        conn.close()
+
+
+def unavailable_references(hook, rule_set):
+    """Referential rules whose dimension does not exist yet (first run)."""
+    rules = [rule for rule in rule_set.rules if rule.kind == "references"]
+    if not rules:
+        return []
+    names = ", ".join(sql_literal(rule.ref_table.lower()) for rule in rules)
+    existing = {
+        row[0]
+        for row in hook.get_records(
+            "SELECT LOWER(table_schema || '.' || table_name) FROM information_schema.tables "
+            f"WHERE LOWER(table_schema || '.' || table_name) IN ({names})"
+        )
+    }
+    return [rule for rule in rules if rule.ref_table.lower() not in existing]
+
+
+def previous_row_count(hook, rule_set, run_id):
+    """Row count of the last earlier run that passed; a failed load is no baseline."""
+    row = hook.get_first(
+        f"SELECT metric_value FROM {RESULTS_TABLE} "
+        f"WHERE rule_set = {sql_literal(rule_set.name)} AND rule_name = 'row_count' "
+        f"AND passed AND run_id <> {sql_literal(run_id)} "
+        "ORDER BY checked_at DESC LIMIT 1"
+    )
+    return None if row is None else int(row[0])
+
+
+def _delta_result(rule, row_count, previous):
+    if not previous:
+        return RuleResult(rule, 0)
+    change = 100.0 * (row_count - previous) / previous
+    message = None
+    if change < -rule.max_drop_pct:
+        message = (
+            f"row count {row_count} dropped {-change:.1f}% from {previous} "
+            f"(limit {rule.max_drop_pct}%)"
+        )
+    return RuleResult(rule, row_count - previous, message)
+
+
+def record_results(hook, result, run_id, checked_at):
+    rows = [("row_count", None, result.row_count, not result.errors)] + [
+        (r.rule.name, r.rule.severity, r.value, r.passed) for r in result.results
+    ]
+    values = ",\n    ".join(
+        f"({sql_literal(run_id)}, {sql_literal(result.rule_set.name)}, "
+        f"{sql_literal(name)}, {'NULL' if severity is None else sql_literal(severity)}, "
+        f"{int(value)}, {'TRUE' if passed else 'FALSE'}, {sql_literal(checked_at)})"
+        for name, severity, value, passed in rows
+    )
+    hook.run(
+        f"INSERT INTO {RESULTS_TABLE} "
+        "(run_id, rule_set, rule_name, severity, metric_value, passed, checked_at) "
+        f"VALUES\n    {values};"
+    )
+
+
+def run_rule_set(hook, rule_set, log, run_id="manual"):
+    """
+    Evaluate a rule set on the cluster, record the results, and raise
+    ``ValueError`` if an error-severity rule fails.
+
+    Returns a small dict of the computed counts (safe to push to XCom).
+    """
+    skipped = unavailable_references(hook, rule_set)
+    for rule in skipped:
+        log.warning(f"Skipping {rule.name}: {rule.ref_table} does not exist yet")
+    if skipped:
+        rule_set = replace(
+            rule_set, rules=[rule for rule in rule_set.rules if rule not in skipped]
+        )
+
+    columns = fetch_columns(hook, rule_set.relation_sql)
+    log.info(f"Returned columns: {columns}")
+
+    missing = [col for col in rule_set.columns if col not in columns]
+    if missing:
+        # "no data" is reported before missing columns, as the pandas validators did
+        (row_count,) = hook.get_first(
+            f"SELECT COUNT(*) FROM ({rule_set.relation_sql}) AS v"
+        )
+        if not row_count and not rule_set.allow_empty:
+            raise ValueError(
+                f"Validation failed: Query returned no data from {rule_set.source}"
+            )
+        raise ValueError(f"Validation failed: Missing expected columns: {missing}")
+
+    row = hook.get_first(build_rule_sql(rule_set))
+    values = [int(v or 0) for v in row]
+    result = RuleSetResult(rule_set, values.pop(0))
+    if result.row_count == 0:
+        if not rule_set.allow_empty:
+            raise ValueError(
+                f"Validation failed: Query returned no data from {rule_set.source}"
+            )
+        # nothing to check and nothing to record: an empty run is not a baseline
+        log.info(f"Nothing to validate: {rule_set.source} is empty")
+        return result.stats()
+
+    scanned = dict(zip(scan_rules(rule_set), values))
+    for rule in rule_set.rules:
+        if rule.kind == "row_count_delta":
+            previous = previous_row_count(hook, rule_set, run_id)
+            result.results.append(_delta_result(rule, result.row_count, previous))
+        else:
+            value = scanned[rule]
+            result.results.append(
+                RuleResult(rule, value, _message(rule, value) if value else None)
+            )
+
+    checked_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+    record_results(hook, result, run_id, checked_at)
+
+    for warning in result.warnings:
+        log.warning(f"Data-quality warning: {warning}")
+    if result.errors:
+        raise ValueError("Validation failed:\n" + "\n".join(result.errors))
+
+    log.info(rule_set.success_message)
+    return result.stats()
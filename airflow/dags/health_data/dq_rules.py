@@ -0,0 +1,134 @@
+"""
+Data-quality rules of the pipeline, declared per table and column.
+
+The DAG creates one validation task per rule set (task id = rule set name);
+each task runs the whole set as one aggregate query. Add a rule here, not in
+the DAG.
+"""
+
+from health_data.dq import (
+    RuleSet,
+    accepted_range,
+    matches,
+    not_null,
+    references,
+    row_count_delta,
+    unique,
+)
+
+# Bronze holds each natural key once (merged at load), so the provider rows
+# are read as they are. Work dates repeat once per provider; the DISTINCT
+# below is the date grain, not a dedupe.
+PROVIDERINFO_VALIDATION_SQL = """
+    SELECT
+        CMS_Certification_Number_CCN,
+        Provider_Name,
+        Provider_Address,
+        City_Town,
+        State,
+        ZIP_Code,
+        Number_of_Certified_Beds,
+        Latitude,
+        Longitude,
+        CURRENT_TIMESTAMP AS ingestion_time
+    FROM bronze.providerinfo
+"""
+
+WORKDATE_VALIDATION_SQL = """
+    SELECT DISTINCT
+        CAST(WorkDate AS INTEGER) AS WorkDateID,
+        CAST(WorkDate AS DATE) AS WorkDate,
+        EXTRACT(MONTH FROM WorkDate::DATE) AS Month,
+        TO_CHAR(WorkDate::DATE, 'Month') AS MonthName,
+        EXTRACT(YEAR FROM WorkDate::DATE) AS Year,
+        EXTRACT(QUARTER FROM WorkDate::DATE) AS Quarter,
+        CURRENT_TIMESTAMP AS updated_at
+    FROM BRONZE.DailyNurseStaffing
+"""
+
+# Staged unpivot built once per run by sp_stage_silver_fact_table(); the same
+# rows feed this check and sp_generate_silver_fact_table.
+FACT_VALIDATION_SQL = """
+    SELECT
+        CCN,
+        WorkDateID,
+        NumOfPatient,
+        StaffingTypeID,
+        WorkHours,
+        Updated_At
+    FROM silver.Stage_DailyFacilityLogFact
+"""
+
+PROVIDERINFO_RULES = RuleSet(
+    name="validate_providerinfo",
+    source="bronze.providerinfo",
+    relation_sql=PROVIDERINFO_VALIDATION_SQL,
+    rules=[
+        not_null("cms_certification_number_ccn"),
+        unique("cms_certification_number_ccn"),
+        not_null("provider_name"),
+        not_null("provider_address"),
+        not_null("city_town"),
+        not_null("state"),
+        not_null("zip_code"),
+        not_null("number_of_certified_beds"),
+        not_null("latitude"),
+        not_null("longitude"),
+        matches("state", "^[A-Z]{2}$"),
+        accepted_range("number_of_certified_beds", low=0),
+        accepted_range("latitude", low=-90, high=90),
+        accepted_range("longitude", low=-180, high=180),
+        # bronze only grows: a shrinking provider list means a bad load
+        row_count_delta(max_drop_pct=50),
+    ],
+    success_message="✅ Validation passed: All fields are NOT NULL, and CCNs are UNIQUE",
+)
+
+WORKDATE_RULES = RuleSet(
+    name="validate_dailynursestaffing",
+    source="BRONZE.DailyNurseStaffing",
+    relation_sql=WORKDATE_VALIDATION_SQL,
+    rules=[
+        not_null("workdateid"),
+        unique("workdateid"),
+        not_null("workdate"),
+        not_null("month"),
+        not_null("monthname"),
+        not_null("year"),
+        not_null("quarter"),
+        not_null("updated_at"),
+        accepted_range("month", low=1, high=12),
+        accepted_range("quarter", low=1, high=4),
+    ],
+    success_message="✅ Validation passed: All fields are NOT NULL, and WorkDateID is UNIQUE",
+)
+
+FACT_RULES = RuleSet(
+    name="validate_fact_table",
+    source="silver.Stage_DailyFacilityLogFact",
+    relation_sql=FACT_VALIDATION_SQL,
+    upstream="stage_fact_table_silver",
+    # the stage only holds the staffing batches loaded since the last upsert, so
+    # a ProviderInfo-only run (or a cache hit on the staffing load) stages nothing
+    allow_empty=True,
+    rules=[
+        not_null("ccn"),
+        not_null("workdateid"),
+        not_null("numofpatient"),
+        not_null("staffingtypeid"),
+        not_null("workhours"),
+        not_null("updated_at"),
+        matches("numofpatient", "^[0-9]+$"),
+        matches("workdateid", "^[0-9]{8}$"),
+        accepted_range("workhours", low=0),
+        # the catalog the unpivot reads, not staffingtypedim: the dimension is
+        # refreshed after this check, so a newly enabled type is not in it yet
+        references("staffingtypeid", "silver.staffingtypecatalog"),
+    ],
+    success_message="✅ Validation passed: All fields are NOT NULL",
+)
+
+RULE_SETS = {
+    rule_set.name: rule_set
+    for rule_set in (PROVIDERINFO_RULES, WORKDATE_RULES, FACT_RULES)
+}
@@ -0,0 +1,179 @@
+"""
+Pending-files queue: finding new work in O(new files).
+
+Landed files are identified by full S3 key plus ETag. A run enqueues the
+objects it is told about (the keys in the run conf, sent by the trigger_mwaa
+Lambda for the S3 events it coalesced) into ``bronze.pending_files``, unless
+that exact (key, ETag) is already queued or recorded in
+``bronze.ingested_files``, and then works off the queue. Files left behind
+by a failed run stay queued for the next one. Loaded files leave the queue
+in the COPY transaction (``sp_ingest_batch_from_s3``); quarantined files
+are removed here.
+
+Runs without a key list (manual runs) reconcile the whole prefix instead,
+which is the only path whose cost still grows with the bucket.
+
+A queued file whose bytes (content hash) were already loaded under another
+key is rejected: it is recorded in ``bronze.ingested_files`` with
+``duplicate_of`` set and no batch, so it is neither loaded nor queued again.
+"""
+
+from dataclasses import dataclass
+
+from health_data.ingest import sql_literal
+
+PENDING_FILES_SQL = """
+    SELECT s3_key, etag, size_bytes
+    FROM bronze.pending_files
+    ORDER BY queued_at, s3_key
+"""
+
+
+@dataclass(frozen=True)
+class PendingFile:
+    s3_key: str
+    etag: str
+    size: int = 0
+
+
+@dataclass(frozen=True)
+class DuplicateFile:
+    file: PendingFile
+    table: str
+    content_hash: str
+    duplicate_of: str  # S3 key the same content was loaded from
+
+
+def normalize_etag(etag):
+    """S3 returns ETags quoted; events and listings differ, so compare them bare."""
+    return (etag or "").strip('"')
+
+
+def describe_keys(s3_client, bucket, keys, log=None):
+    """Current ETag and size of each key (HEAD per key); vanished keys are skipped."""
+    files = []
+    for key in keys:
+        try:
+            head = s3_client.head_object(Bucket=bucket, Key=key)
+        except s3_client.exceptions.ClientError as error:
+            if error.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+                raise
+            if log:
+                log.warning(f"{key} no longer exists, not queued")
+            continue
+        files.append(
+            PendingFile(key, normalize_etag(head["ETag"]), int(head["ContentLength"]))
+        )
+    return files
+
+
+def list_prefix(s3_client, bucket, prefix):
+    """Every CSV under ``prefix`` with its ETag (full reconcile, O(bucket))."""
+    files = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(".csv"):
+                files.append(
+                    PendingFile(
+                        obj["Key"], normalize_etag(obj["ETag"]), int(obj["Size"])
+                    )
+                )
+    return files
+
+
+def enqueue_statements(files):
+    """
+    Statements adding ``files`` to the queue; run them in one transaction.
+
+    Queued entries of the same key with another ETag are superseded (the
+    object was overwritten before it was loaded).
+    """
+    if not files:
+        return []
+    values = ",\n    ".join(
+        f"({sql_literal(f.s3_key)}, {sql_literal(f.etag)}, {int(f.size)}, "
+        f"{sql_literal(f.s3_key.split('/')[-1])})"
+        for f in files
+    )
+    return [
+        "DROP TABLE IF EXISTS stage_candidate_files;",
+        "CREATE TEMP TABLE stage_candidate_files "
+        "(s3_key VARCHAR(1024), etag VARCHAR(64), size_bytes BIGINT, "
+        "filename VARCHAR(512));",
+        "INSERT INTO stage_candidate_files (s3_key, etag, size_bytes, filename) "
+        f"VALUES\n    {values};",
+        """DELETE FROM bronze.pending_files
+    USING stage_candidate_files c
+    WHERE bronze.pending_files.s3_key = c.s3_key
+      AND bronze.pending_files.etag <> c.etag;""",
+        """INSERT INTO bronze.pending_files (s3_key, etag, size_bytes)
+    SELECT DISTINCT c.s3_key, c.etag, c.size_bytes
+    FROM stage_candidate_files c
+    WHERE NOT EXISTS (
+        SELECT 1 FROM bronze.pending_files p
+        WHERE p.s3_key = c.s3_key AND p.etag = c.etag
+    )
+    AND NOT EXISTS (
+        -- files recorded before keys and ETags were tracked have NULLs and
+        -- are matched by filename, as the list-and-diff did
+        SELECT 1 FROM bronze.ingested_files i
+        WHERE (i.s3_key = c.s3_key AND (i.etag = c.etag OR i.etag IS NULL))
+           OR (i.s3_key IS NULL AND i.filename = c.filename)
+    );""",
+    ]
+
+
+def dequeue_statement(files):
+    """DELETE removing ``files`` (e.g. quarantined ones) from the queue."""
+    conditions = " OR ".join(
+        f"(s3_key = {sql_literal(f.s3_key)} AND etag = {sql_literal(f.etag)})"
+        for f in files
+    )
+    return f"DELETE FROM bronze.pending_files WHERE {conditions};"
+
+
+def loaded_content(hook, content_hashes):
+    """S3 key each of ``content_hashes`` was loaded from, for those already loaded."""
+    if not content_hashes:
+        return {}
+    hashes = ", ".join(sql_literal(h) for h in sorted(set(content_hashes)))
+    return dict(
+        hook.get_records(
+            "SELECT content_hash, MIN(s3_key) FROM bronze.ingested_files "
+            f"WHERE duplicate_of IS NULL AND content_hash IN ({hashes}) "
+            "GROUP BY content_hash"
+        )
+    )
+
+
+def reject_duplicates_statements(duplicates):
+    """Record ``duplicates`` as ingested (no batch) and take them off the queue."""
+    keys = ", ".join(sql_literal(d.file.s3_key) for d in duplicates)
+    values = ",\n    ".join(
+        f"({sql_literal(d.file.s3_key.split('/')[-1])}, {sql_literal(d.file.s3_key)}, "
+        f"{sql_literal(d.file.etag)}, {sql_literal(d.table)}, "
+        f"{sql_literal(d.content_hash)}, {sql_literal(d.duplicate_of)}, GETDATE())"
+        for d in duplicates
+    )
+    return [
+        f"DELETE FROM bronze.ingested_files WHERE s3_key IN ({keys});",
+        "INSERT INTO bronze.ingested_files "
+        "(filename, s3_key, etag, table_name, content_hash, duplicate_of, load_time) "
+        f"VALUES\n    {values};",
+        dequeue_statement([d.file for d in duplicates]),
+    ]
+
+
+def pending_files(hook):
+    """The queue, oldest first, one entry per key (its most recently queued ETag)."""
+    files = {}
+    for s3_key, etag, size in hook.get_records(PENDING_FILES_SQL):
+        files[s3_key] = PendingFile(s3_key, etag, int(size or 0))
+    return list(files.values())
+
+
+def enqueue(hook, files):
+    statements = enqueue_statements(files)
+    if statements:
+        hook.run(statements, autocommit=False)
@@ -0,0 +1,294 @@
+"""
+Partitioned Parquet snapshot of the gold tables for Power BI import.
+
+Each gold table is exported under ``EXPORT_PREFIX`` in Hive-style partitions
+(``<table>/year=2024/month=3/``; the rollups by their own calendar grain) and
+``manifest.json`` next to them lists every partition with its files, row
+count and when it was last rewritten, so Power BI can refresh incrementally
+from the manifest without querying the warehouse.
+
+Only partitions that changed are rewritten:
+
+- Redshift: the months ``sp_generate_gold_provider_staffing_utilization_metric``
+  refreshed since the last export (``gold.metric_refresh_log`` after the
+  ``gold.export`` watermark) are UNLOADed, one Snappy Parquet UNLOAD with
+  CLEANPATH per partition; the manifest takes each partition's files and
+  row counts from its UNLOAD manifest.
+- Local engine: the engine rebuilds every month, so each partition is hashed
+  and only written (zstd) when its hash differs from the manifest's.
+"""
+
+import hashlib
+import io
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from health_data.ingest import sql_literal
+
+EXPORT_PREFIX = "exports/gold/"
+MANIFEST_KEY = f"{EXPORT_PREFIX}manifest.json"
+MANIFEST_VERSION = 1
+WATERMARK_TARGET = "gold.export"
+
+# Role the cluster assumes for S3, as in the ingest procedures
+IAM_ROLE = "arn:aws:iam::891662393358:role/health-data-project-role"
+
+# Exported tables and their partition columns; every one is derived from a
+# (year, month) of the base table
+EXPORT_TABLES = {
+    "gold.provider_staffing_utilization_metric": ("year", "month"),
+    "gold.rollup_state_month": ("year", "month"),
+    "gold.rollup_national_daily": ("year", "month"),
+    "gold.rollup_provider_quarter": ("year", "quarter"),
+    "gold.rollup_staffingtype_year": ("year",),
+}
+
+# Months refreshed after the export watermark (every logged month when there
+# is none); full refreshes log every month, so they export everything
+CHANGED_MONTHS_SQL = """
+    SELECT l.year, l.month, MAX(l.refreshed_at)
+    FROM gold.metric_refresh_log l
+    LEFT JOIN silver.etl_watermark w ON w.target_name = {target}
+    WHERE l.target_name = 'gold.provider_staffing_utilization_metric'
+      AND (w.updated_at IS NULL OR l.refreshed_at > w.updated_at)
+    GROUP BY l.year, l.month
+"""
+
+UNLOAD_MANIFEST = "part_manifest"
+# Statements per Data API batch (its limit)
+UNLOAD_BATCH = 40
+
+
+def now():
+    return _timestamp(datetime.now(timezone.utc))
+
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return str(value)
+
+
+def changed_months(hook):
+    """
+    ``([(year, month)], as_of)``: the months to export and the latest refresh
+    among them (the next export watermark).
+    """
+    rows = hook.get_records(
+        CHANGED_MONTHS_SQL.format(target=sql_literal(WATERMARK_TARGET))
+    )
+    months = sorted({(int(year), int(month)) for year, month, _ in rows})
+    as_of = max((_timestamp(refreshed) for _, _, refreshed in rows), default=None)
+    return months, as_of
+
+
+def partition_values(columns, year, month):
+    """The partition of a table holding (year, month)."""
+    calendar = {"year": year, "month": month, "quarter": (month + 2) // 3}
+    return tuple(calendar[column] for column in columns)
+
+
+def partitions_for(columns, months):
+    return sorted({partition_values(columns, year, month) for year, month in months})
+
+
+def table_name(table):
+    return table.split(".")[-1]
+
+
+def partition_path(table, columns, values):
+    """``exports/gold/<table>/year=2024/month=3/``"""
+    parts = "".join(f"{c}={v}/" for c, v in zip(columns, values))
+    return f"{EXPORT_PREFIX}{table_name(table)}/{parts}"
+
+
+def unload_statement(bucket, table, columns, values, iam_role=IAM_ROLE):
+    """UNLOAD one partition, replacing the files it had."""
+    where = " AND ".join(f"{c} = {int(v)}" for c, v in zip(columns, values))
+    query = f"SELECT * FROM {table} WHERE {where}"
+    return (
+        f"UNLOAD ({sql_literal(query)}) "
+        f"TO 's3://{bucket}/{partition_path(table, columns, values)}part_' "
+        f"IAM_ROLE {sql_literal(iam_role)} "
+        "FORMAT AS PARQUET MANIFEST VERBOSE CLEANPATH;"
+    )
+
+
+def unload_plan(months):
+    """``{table: [partition values]}`` to UNLOAD for the changed months."""
+    return {
+        table: partitions_for(columns, months)
+        for table, columns in EXPORT_TABLES.items()
+    }
+
+
+def unload_batches(bucket, plan):
+    """RedshiftStatementOperator kwargs: the plan's UNLOADs, per table and batch."""
+    batches = []
+    for table, partitions in plan.items():
+        statements = [
+            unload_statement(bucket, table, EXPORT_TABLES[table], values)
+            for values in partitions
+        ]
+        for start in range(0, len(statements), UNLOAD_BATCH):
+            batches.append(
+                {
+                    "statement_name": f"unload_{table_name(table)}_{start // UNLOAD_BATCH}",
+                    "sql": statements[start : start + UNLOAD_BATCH],
+                }
+            )
+    return batches
+
+
+def unload_entry(table, columns, values, unload_manifest, refreshed_at, run_id):
+    """Manifest entry of a partition from its UNLOAD ... MANIFEST VERBOSE file."""
+    files = []
+    for entry in unload_manifest.get("entries", []):
+        key = entry["url"].split("://", 1)[-1].split("/", 1)[1]
+        meta = entry.get("meta", {})
+        files.append(
+            {
+                "key": key,
+                "size": int(meta.get("content_length", 0)),
+                "rows": int(meta.get("record_count", 0)),
+            }
+        )
+    return _entry(table, columns, values, files, refreshed_at, run_id)
+
+
+def _entry(table, columns, values, files, refreshed_at, run_id, content_hash=None):
+    entry = {
+        "values": dict(zip(columns, values)),
+        "path": partition_path(table, columns, values),
+        "files": files,
+        "rows": sum(f["rows"] for f in files),
+        "bytes": sum(f["size"] for f in files),
+        "refreshed_at": refreshed_at,
+        "run_id": run_id,
+    }
+    if content_hash is not None:
+        entry["content_hash"] = content_hash
+    return entry
+
+
+def watermark_statement(as_of):
+    """Move the export watermark to the latest refresh exported."""
+    return (
+        f"CALL sp_set_etl_watermark({sql_literal(WATERMARK_TARGET)}, 0, "
+        f"{sql_literal(as_of)}::TIMESTAMP);"
+    )
+
+
+def empty_manifest():
+    return {"version": MANIFEST_VERSION, "generated_at": None, "tables": {}}
+
+
+def read_json(s3_hook, bucket, key):
+    """A JSON object on S3, or None when there is none yet."""
+    if not s3_hook.check_for_key(key, bucket_name=bucket):
+        return None
+    return json.loads(s3_hook.read_key(key, bucket_name=bucket))
+
+
+def merge_manifest(previous, replaced, generated_at):
+    """
+    The manifest with the partitions in ``replaced`` (``{table: [entry]}``)
+    swapped in; partitions left without rows are dropped.
+    """
+    manifest = json.loads(json.dumps(previous or empty_manifest()))
+    manifest["version"] = MANIFEST_VERSION
+    manifest["generated_at"] = generated_at
+    for table, entries in replaced.items():
+        columns = list(EXPORT_TABLES[table])
+        current = manifest["tables"].setdefault(
+            table_name(table), {"partition_columns": columns, "partitions": []}
+        )
+        by_path = {p["path"]: p for p in current["partitions"]}
+        for entry in entries:
+            if entry["rows"]:
+                by_path[entry["path"]] = entry
+            else:
+                by_path.pop(entry["path"], None)
+        current["partitions"] = sorted(
+            by_path.values(), key=lambda p: [p["values"][c] for c in columns]
+        )
+    return manifest
+
+
+def content_hash(table):
+    """SHA-256 of a table's Arrow IPC stream: equal for equal data and schema."""
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table.combine_chunks())
+    return hashlib.sha256(sink.getvalue()).hexdigest()
+
+
+def split_partitions(table, columns):
+    """``{partition values: rows}`` of an Arrow table, in partition order."""
+    keys = table.group_by(list(columns)).aggregate([]).to_pylist()
+    parts = {}
+    for key in sorted(tuple(k[c] for c in columns) for k in keys):
+        mask = None
+        for column, value in zip(columns, key):
+            match = pc.equal(table.column(column), value)
+            mask = match if mask is None else pc.and_(mask, match)
+        parts[key] = table.filter(mask)
+    return parts
+
+
+def export_local(tables, out_dir, previous=None, run_id=None):
+    """
+    Write the changed partitions of the gold ``tables`` (``{name: Arrow table}``,
+    as run_pipeline returns) under ``out_dir``. Returns the new manifest and
+    the written file paths; file keys are relative to ``out_dir``.
+    """
+    out_dir = Path(out_dir)
+    exported_at = now()
+    known = {
+        (name, p["path"]): p
+        for name, t in (previous or empty_manifest())["tables"].items()
+        for p in t["partitions"]
+    }
+    replaced = {}
+    written = []
+    for table, columns in EXPORT_TABLES.items():
+        if table not in tables:
+            continue
+        current = split_partitions(tables[table], columns)
+        entries = []
+        for values, rows in current.items():
+            path = partition_path(table, columns, values)
+            digest = content_hash(rows)
+            kept = known.get((table_name(table), path))
+            if kept and kept.get("content_hash") == digest:
+                continue
+            key = f"{path}part-0.parquet"
+            (out_dir / path).mkdir(parents=True, exist_ok=True)
+            pq.write_table(rows, out_dir / key, compression="zstd")
+            written.append(out_dir / key)
+            files = [
+                {
+                    "key": key,
+                    "size": (out_dir / key).stat().st_size,
+                    "rows": rows.num_rows,
+                }
+            ]
+            entries.append(
+                _entry(table, columns, values, files, exported_at, run_id, digest)
+            )
+        # partitions no longer in the table leave the manifest
+        current_paths = {partition_path(table, columns, v) for v in current}
+        for (name, path), gone in known.items():
+            if name == table_name(table) and path not in current_paths:
+                values = tuple(gone["values"][c] for c in columns)
+                entries.append(_entry(table, columns, values, [], exported_at, run_id))
+        if entries:
+            replaced[table] = entries
+    return merge_manifest(previous, replaced, exported_at), written
@@ -0,0 +1,141 @@
+"""
+Batched bronze loads: one manifest-driven COPY per target table.
+
+New S3 files are grouped by the bronze table they load into (the same
+filename routing ``sp_ingest_data_from_s3`` uses). Each group is written to a
+COPY manifest and loaded by ``sp_ingest_batch_from_s3`` in a single
+transaction that also records every file (S3 key and ETag) in
+``bronze.ingested_files``.
+"""
+
+import json
+from collections import OrderedDict
+
+# Filename prefix (case-insensitive) -> bronze table, as in sp_ingest_data_from_s3
+TABLE_ROUTES = (
+    ("dailynursestaffing", "DailyNurseStaffing"),
+    ("providerinfo", "ProviderInfo"),
+)
+
+MANIFEST_PREFIX = "manifests/"
+
+
+def route_file(file_key):
+    """Return the bronze table for an S3 key, or raise like the procedure does."""
+    filename = file_key.split("/")[-1]
+    for prefix, table in TABLE_ROUTES:
+        if filename.lower().startswith(prefix):
+            return table
+    raise ValueError(f"No matching table for file: {filename}")
+
+
+def group_files_by_table(file_keys):
+    """Group S3 keys by target table, keeping the input order within a group."""
+    groups = OrderedDict()
+    for key in file_keys:
+        groups.setdefault(route_file(key), []).append(key)
+    return groups
+
+
+def build_manifest(bucket, file_keys, sizes=None):
+    """
+    COPY manifest listing every file of a group; all entries are mandatory.
+
+    Parquet manifests must carry each object's size, pass ``sizes`` (bytes,
+    aligned with ``file_keys``) for those.
+    """
+    entries = [{"url": f"s3://{bucket}/{key}", "mandatory": True} for key in file_keys]
+    if sizes is not None:
+        for entry, size in zip(entries, sizes):
+            entry["meta"] = {"content_length": size}
+    return json.dumps({"entries": entries}, indent=2)
+
+
+def conf_file_keys(conf, prefix):
+    """
+    S3 keys handed over in the run conf ({"s3_keys": [...]}, set by the
+    trigger_mwaa Lambda), deduplicated and limited to CSVs under ``prefix``.
+    Returns None when the run carries no key list.
+    """
+    keys = (conf or {}).get("s3_keys")
+    if keys is None:
+        return None
+    if isinstance(keys, str):
+        keys = [keys]
+    selected = []
+    for key in keys:
+        if key.startswith(prefix) and key.endswith(".csv") and key not in selected:
+            selected.append(key)
+    return selected
+
+
+def manifest_key(table, run_id):
+    safe_run_id = "".join(c if c.isalnum() or c in "-_." else "_" for c in run_id)
+    return f"{MANIFEST_PREFIX}{table}/{safe_run_id}.manifest"
+
+
+def sql_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def lineage_statement(outputs):
+    """One INSERT recording which Parquet object each raw CSV produced."""
+    values = ",\n    ".join(
+        f"({sql_literal(out.source_key.split('/')[-1])}, {sql_literal(out.source_key)}, "
+        f"{sql_literal(out.parquet_key)}, {sql_literal(out.partition_value)}, "
+        f"{int(out.row_count)}, {int(out.size)})"
+        for out in outputs
+    )
+    return (
+        "INSERT INTO bronze.file_lineage "
+        "(filename, source_key, parquet_key, partition_value, row_count, size_bytes) "
+        f"VALUES\n    {values};"
+    )
+
+
+def _nullable_literal(value):
+    return "NULL" if value is None else sql_literal(value)
+
+
+def batch_load_statements(
+    manifest_path,
+    table,
+    file_keys,
+    load_format="CSV",
+    outputs=(),
+    etags=None,
+    content_hashes=None,
+):
+    """
+    Statements loading one group; run them in a single transaction.
+
+    ``file_keys`` are the raw CSV keys, ``etags`` their ETags and
+    ``content_hashes`` the SHA-256 of their bytes (aligned). They are staged
+    set-based in a temp table that sp_ingest_batch_from_s3 merges into
+    bronze.ingested_files and removes from bronze.pending_files. For Parquet
+    loads the ``outputs`` of the conversion are recorded in
+    bronze.file_lineage in the same transaction.
+    """
+    etags = etags or [None] * len(file_keys)
+    content_hashes = content_hashes or [None] * len(file_keys)
+    values = ",\n    ".join(
+        f"({sql_literal(key.split('/')[-1])}, {sql_literal(key)}, "
+        f"{_nullable_literal(etag)}, {_nullable_literal(content_hash)})"
+        for key, etag, content_hash in zip(file_keys, etags, content_hashes)
+    )
+    statements = [
+        "DROP TABLE IF EXISTS stage_ingest_files;",
+        "CREATE TEMP TABLE stage_ingest_files "
+        "(filename VARCHAR(512), s3_key VARCHAR(1024), etag VARCHAR(64), "
+        "content_hash VARCHAR(64));",
+        "INSERT INTO stage_ingest_files (filename, s3_key, etag, content_hash) "
+        f"VALUES\n    {values};",
+    ]
+    if outputs:
+        statements.append(lineage_statement(outputs))
+    statements.append(
+        f"CALL sp_ingest_batch_from_s3("
+        f"{sql_literal(manifest_path)}::TEXT, {sql_literal(table)}::TEXT, "
+        f"{sql_literal(load_format.upper())}::TEXT);"
+    )
+    return statements
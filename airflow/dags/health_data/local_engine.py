@@ -0,0 +1,284 @@
+"""
+Embedded bronze -> silver -> gold engine, without Redshift.
+
+Runs the full-refresh result of the stored procedures over local CSV or
+Parquet files with vectorised Arrow compute (joins and group-bys run in
+Arrow's C++ engine, no row loops):
+
+- bronze: files are read with the CSV COPY semantics of the Parquet
+  conversion (health_data/parquet.py) and merged by natural key, the latest
+  file winning, like ``sp_merge_bronze_rows``;
+- silver: ``providerdim`` (current rows only, no type-2 history),
+  ``staffingtypedim`` (from STAFFING_TYPE_CATALOG), ``workdatedim`` and
+  ``dailyfacilitylogfact`` (one row per provider, day and enabled type);
+- gold: ``provider_staffing_utilization_metric``.
+
+Rates are float64 rounded half away from zero to two decimals, as the
+CAST to DECIMAL(10,2) does; utilizationsum keeps six decimals.
+
+Used for backfills and development runs (DAG conf {"engine": "local"}) and
+by the parity test against the procedures' SQL.
+"""
+
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from health_data.bronze_schema import BRONZE_COLUMNS
+from health_data.csv_stream import open_bronze_csv
+from health_data.ingest import route_file
+from health_data.parquet import arrow_schema, typed_batch
+from health_data.prevalidate import KEY_COLUMNS
+from health_data.staffing_types import STAFFING_TYPE_CATALOG
+
+# Tie-break between rows of one key loaded from the same file, as in
+# sp_merge_bronze_rows
+LATEST_FIRST = {
+    "DailyNurseStaffing": (),
+    "ProviderInfo": ("Processing_Date",),
+}
+
+LOAD_ORDER = "_load_order"
+
+TABLES = (
+    "silver.providerdim",
+    "silver.staffingtypedim",
+    "silver.workdatedim",
+    "silver.dailyfacilitylogfact",
+    "gold.provider_staffing_utilization_metric",
+)
+
+
+def _read_file(path, table):
+    path = Path(path)
+    if path.suffix == ".parquet":
+        return pq.read_table(path, schema=arrow_schema(table))
+    with open(path, "rb") as source:
+        _, batches = open_bronze_csv(source, table, str(path))
+        return pa.Table.from_batches(
+            [typed_batch(batch, table) for batch in batches], schema=arrow_schema(table)
+        )
+
+
+def _first_per_key(table, keys, order):
+    """Rows of ``table`` sorted by key then ``order``, keeping the first of each key."""
+    key = pc.binary_join_element_wise(
+        *[pc.utf8_trim_whitespace(table.column(k)) for k in keys], "|"
+    )
+    table = table.append_column("_key", key).sort_by(
+        [("_key", "ascending")] + [(name, "descending") for name in order]
+    )
+    sorted_keys = table.column("_key")
+    if len(sorted_keys) < 2:
+        return table.drop_columns(["_key"])
+    first = pc.not_equal(
+        sorted_keys.slice(1), sorted_keys.slice(0, len(sorted_keys) - 1)
+    )
+    mask = pa.concat_arrays([pa.array([True]), first.combine_chunks()])
+    return table.filter(mask).drop_columns(["_key"])
+
+
+def read_bronze(paths, table):
+    """
+    Bronze ``table`` as loaded from ``paths`` (in load order), one row per key.
+    """
+    parts = []
+    for order, path in enumerate(paths):
+        part = _read_file(path, table)
+        parts.append(
+            part.append_column(
+                LOAD_ORDER, pa.array([order] * part.num_rows, pa.int64())
+            )
+        )
+    if not parts:
+        empty = arrow_schema(table).empty_table()
+        return empty.append_column(LOAD_ORDER, pa.array([], pa.int64()))
+    merged = pa.concat_tables(parts)
+    return _first_per_key(
+        merged, KEY_COLUMNS[table], (LOAD_ORDER, *LATEST_FIRST[table])
+    )
+
+
+def provider_dim(providerinfo):
+    return pa.table(
+        {
+            "ccn": providerinfo.column("CMS_Certification_Number_CCN"),
+            "providername": providerinfo.column("Provider_Name"),
+            "provideraddress": providerinfo.column("Provider_Address"),
+            "city": providerinfo.column("City_Town"),
+            "state": providerinfo.column("State"),
+            "zipcode": providerinfo.column("ZIP_Code"),
+            "numberofbed": providerinfo.column("Number_of_Certified_Beds"),
+            "latitude": pc.cast(providerinfo.column("Latitude"), pa.decimal128(10, 6)),
+            "longitude": pc.cast(
+                providerinfo.column("Longitude"), pa.decimal128(10, 6)
+            ),
+            "is_current": pa.array([True] * providerinfo.num_rows),
+        }
+    )
+
+
+def staffingtype_dim(catalog=STAFFING_TYPE_CATALOG):
+    return pa.table(
+        {
+            "staffingtypeid": pa.array(
+                [t.staffing_type_id for t in catalog], pa.int32()
+            ),
+            "title": pa.array([t.title for t in catalog], pa.string()),
+            "staffingtype": pa.array([t.staffing_type for t in catalog], pa.string()),
+        }
+    )
+
+
+def workdate_dim(staffing):
+    dates = pc.unique(staffing.column("WorkDate").combine_chunks().drop_null())
+    parsed = pc.strptime(dates, format="%Y%m%d", unit="s")
+    return pa.table(
+        {
+            "workdateid": pc.cast(dates, pa.int32()),
+            "workdate": pc.cast(parsed, pa.date32()),
+            "month": pc.cast(pc.month(parsed), pa.int32()),
+            # TO_CHAR(..., 'Month') pads the name to nine characters
+            "monthname": pc.utf8_rpad(pc.strftime(parsed, format="%B"), width=9),
+            "year": pc.cast(pc.year(parsed), pa.int32()),
+            "quarter": pc.cast(pc.quarter(parsed), pa.int32()),
+        }
+    ).sort_by("workdateid")
+
+
+def fact_table(staffing, catalog=STAFFING_TYPE_CATALOG):
+    """The unpivot of sp_stage_silver_fact_table: one block per enabled type."""
+    ccn = staffing.column("PROVNUM")
+    workdateid = staffing.column("WorkDate")
+    patients = pc.cast(
+        pc.utf8_trim_whitespace(staffing.column("MDScensus")), pa.int32()
+    )
+    blocks = [
+        pa.table(
+            {
+                "ccn": ccn,
+                "workdateid": workdateid,
+                "numofpatient": patients,
+                "staffingtypeid": pa.array(
+                    [str(t.staffing_type_id)] * staffing.num_rows
+                ),
+                "workhours": staffing.column(t.hours_column),
+            }
+        )
+        for t in catalog
+        if t.enabled
+    ]
+    if not blocks:
+        raise ValueError("No enabled staffing types in the catalog")
+    return pa.concat_tables(blocks)
+
+
+def _round(array, digits):
+    return pc.round(array, digits, round_mode="half_towards_infinity")
+
+
+def gold_metric(fact, providers, staffing_types, workdates):
+    """sp_generate_gold_provider_staffing_utilization_metric over every month."""
+    joined = (
+        fact.append_column(
+            "_typeid", pc.cast(fact.column("staffingtypeid"), pa.int32())
+        )
+        .append_column("_dateid", pc.cast(fact.column("workdateid"), pa.int32()))
+        .join(providers.filter(pc.field("is_current")), "ccn", join_type="inner")
+        .join(staffing_types, "_typeid", "staffingtypeid", join_type="inner")
+        .join(workdates, "_dateid", "workdateid", join_type="inner")
+    )
+    beds = pc.cast(joined.column("numberofbed"), pa.float64())
+    ratio = pc.divide(
+        pc.cast(joined.column("numofpatient"), pa.float64()),
+        pc.if_else(pc.equal(beds, 0), None, beds),
+    )
+    joined = joined.append_column("_ratio", ratio)
+    keys = [
+        "ccn",
+        "providername",
+        "city",
+        "state",
+        "longitude",
+        "latitude",
+        "title",
+        "staffingtype",
+        "year",
+        "quarter",
+        "month",
+        "monthname",
+    ]
+    grouped = joined.group_by(keys).aggregate(
+        [
+            ("workhours", "sum"),
+            ("_ratio", "mean"),
+            ("_ratio", "sum"),
+            ("_ratio", "count"),
+            ([], "count_all"),
+        ]
+    )
+    return pa.table(
+        {
+            **{name: grouped.column(name) for name in keys},
+            "totalworkhour": pc.cast(
+                grouped.column("workhours_sum"), pa.decimal128(18, 2)
+            ),
+            "bedutilizationrate": _round(
+                pc.multiply(grouped.column("_ratio_mean"), 100.0), 2
+            ),
+            "utilizationsum": _round(grouped.column("_ratio_sum"), 6),
+            "utilizationcount": grouped.column("_ratio_count"),
+            "recordcount": grouped.column("count_all"),
+        }
+    ).sort_by(
+        [
+            ("year", "ascending"),
+            ("month", "ascending"),
+            ("ccn", "ascending"),
+            ("title", "ascending"),
+        ]
+    )
+
+
+def bronze_table_of(path):
+    """Bronze table of a landed CSV or converted Parquet file (by file or folder name)."""
+    for part in reversed(Path(path).parts):
+        try:
+            return route_file(part)
+        except ValueError:
+            continue
+    raise ValueError(f"No matching table for file: {path}")
+
+
+def run_pipeline(paths, catalog=STAFFING_TYPE_CATALOG):
+    """
+    Build every silver and gold table from the bronze files in ``paths``
+    (routed by file name, loaded in the given order). Returns
+    ``{table name: pyarrow.Table}``.
+    """
+    by_table = {table: [] for table in BRONZE_COLUMNS}
+    for path in paths:
+        by_table[bronze_table_of(path)].append(path)
+    providerinfo = read_bronze(by_table["ProviderInfo"], "ProviderInfo")
+    staffing = read_bronze(by_table["DailyNurseStaffing"], "DailyNurseStaffing")
+
+    providers = provider_dim(providerinfo)
+    staffing_types = staffingtype_dim(catalog)
+    workdates = workdate_dim(staffing)
+    fact = fact_table(staffing, catalog)
+    gold = gold_metric(fact, providers, staffing_types, workdates)
+    return dict(zip(TABLES, (providers, staffing_types, workdates, fact, gold)))
+
+
+def write_tables(tables, out_dir):
+    """One zstd Parquet file per table under ``out_dir``; returns the paths."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for name, table in tables.items():
+        path = out_dir / f"{name}.parquet"
+        pq.write_table(table, path, compression="zstd")
+        written.append(path)
+    return written
@@ -0,0 +1,109 @@
+"""
+Targeted table maintenance after each load.
+
+Table health is read from SVV_TABLE_INFO and each table only gets the work
+its numbers call for:
+
+- ``ANALYZE ... PREDICATE COLUMNS`` when stats_off passes STATS_OFF_PCT;
+- ``VACUUM SORT ONLY`` when the unsorted region passes UNSORTED_PCT;
+- ``VACUUM DELETE ONLY`` when deleted rows (upserts leave them behind) pass
+  DELETED_PCT, and ``VACUUM FULL`` when both vacuum thresholds are passed.
+
+VACUUM cannot run inside a transaction block, so every statement runs on
+its own with autocommit rather than from a stored procedure.
+"""
+
+from dataclasses import dataclass
+
+MAINTAINED_SCHEMAS = ("bronze", "silver", "gold")
+
+UNSORTED_PCT = 10.0
+STATS_OFF_PCT = 10.0
+DELETED_PCT = 5.0
+VACUUM_TARGET_PCT = 99
+
+TABLE_HEALTH_SQL = """
+    SELECT "schema", "table",
+           COALESCE(unsorted, 0), COALESCE(stats_off, 0),
+           COALESCE(tbl_rows, 0), COALESCE(estimated_visible_rows, 0)
+    FROM svv_table_info
+    WHERE "schema" IN ({schemas})
+    ORDER BY "schema", "table"
+"""
+
+
+@dataclass(frozen=True)
+class TableHealth:
+    schema: str
+    table: str
+    unsorted_pct: float
+    stats_off_pct: float
+    total_rows: int
+    visible_rows: int
+
+    @property
+    def name(self):
+        return f'"{self.schema}"."{self.table}"'
+
+    @property
+    def deleted_pct(self):
+        if not self.total_rows:
+            return 0.0
+        return 100.0 * max(self.total_rows - self.visible_rows, 0) / self.total_rows
+
+
+def fetch_table_health(hook, schemas=MAINTAINED_SCHEMAS):
+    sql = TABLE_HEALTH_SQL.format(schemas=", ".join(f"'{s}'" for s in schemas))
+    return [
+        TableHealth(
+            schema, table, float(unsorted), float(stats_off), int(rows), int(visible)
+        )
+        for schema, table, unsorted, stats_off, rows, visible in hook.get_records(sql)
+    ]
+
+
+def plan_maintenance(
+    tables,
+    unsorted_pct=UNSORTED_PCT,
+    stats_off_pct=STATS_OFF_PCT,
+    deleted_pct=DELETED_PCT,
+):
+    """Return ``(statement, reason)`` pairs for the tables past a threshold."""
+    plan = []
+    for t in tables:
+        needs_sort = t.unsorted_pct > unsorted_pct
+        needs_delete = t.deleted_pct > deleted_pct
+        if needs_sort and needs_delete:
+            vacuum = "FULL"
+        elif needs_sort:
+            vacuum = "SORT ONLY"
+        elif needs_delete:
+            vacuum = "DELETE ONLY"
+        else:
+            vacuum = None
+        if vacuum:
+            plan.append(
+                (
+                    f"VACUUM {vacuum} {t.name} TO {VACUUM_TARGET_PCT} PERCENT;",
+                    f"unsorted {t.unsorted_pct:.1f}%, deleted {t.deleted_pct:.1f}%",
+                )
+            )
+        # a vacuum rewrites blocks, analyze after it
+        if t.stats_off_pct > stats_off_pct:
+            plan.append(
+                (
+                    f"ANALYZE {t.name} PREDICATE COLUMNS;",
+                    f"stats off {t.stats_off_pct:.1f}%",
+                )
+            )
+    return plan
+
+
+def run_maintenance(hook, log, **thresholds):
+    plan = plan_maintenance(fetch_table_health(hook), **thresholds)
+    if not plan:
+        log.info("All tables within maintenance thresholds, nothing to do")
+    for statement, reason in plan:
+        log.info(f"{statement} ({reason})")
+        hook.run(statement, autocommit=True)
+    return [statement for statement, _ in plan]
@@ -0,0 +1,182 @@
+"""
+CSV -> partitioned Parquet conversion ahead of the bronze COPY.
+
+Each landed CSV is streamed in record batches (never held in memory whole),
+cast to the bronze column types and written as zstd-compressed Parquet, one
+file per partition value:
+
+    parquet/<table>/<partition_col>=<value>/<csv stem>.parquet
+
+The casts reproduce what the CSV COPY options did inside Redshift: columns
+map by position, missing trailing columns are NULL (FILLRECORD), VARCHAR is
+cut to 256 bytes (TRUNCATECOLUMNS), invalid UTF-8 is replaced
+(ACCEPTINVCHARS), and empty fields of non-character columns are NULL.
+Every output file records the CSV it came from in its Parquet metadata and
+in the returned lineage rows.
+"""
+
+import os
+import tempfile
+from dataclasses import dataclass
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from health_data.bronze_schema import (
+    BRONZE_COLUMNS,
+    DECIMAL_PRECISION,
+    DECIMAL_SCALE,
+    VARCHAR_MAX_BYTES,
+)
+from health_data.csv_stream import open_bronze_csv
+
+PARQUET_PREFIX = "parquet/"
+COMPRESSION = "zstd"
+
+# Hive-style partition column per bronze table
+PARTITION_COLUMNS = {
+    "DailyNurseStaffing": "CY_Qtr",
+    "ProviderInfo": "Processing_Date",
+}
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+@dataclass(frozen=True)
+class ParquetOutput:
+    """One Parquet object produced from a source CSV."""
+
+    source_key: str
+    parquet_key: str
+    partition_value: str
+    row_count: int
+    size: int
+
+
+def arrow_type(redshift_type):
+    return {
+        "VARCHAR": pa.string(),
+        "INT": pa.int32(),
+        "SMALLINT": pa.int16(),
+        "BIGINT": pa.int64(),
+        "DECIMAL": pa.decimal128(DECIMAL_PRECISION, DECIMAL_SCALE),
+        "DATE": pa.date32(),
+    }[redshift_type]
+
+
+def arrow_schema(table):
+    return pa.schema(
+        [pa.field(name, arrow_type(kind)) for name, kind in BRONZE_COLUMNS[table]]
+    )
+
+
+def _truncate_varchar(array):
+    array = pc.utf8_slice_codeunits(array, 0, VARCHAR_MAX_BYTES)
+    if pc.any(pc.greater(pc.binary_length(array), VARCHAR_MAX_BYTES)).as_py():
+        # multi-byte characters: cut on the byte limit without splitting one
+        array = pa.array(
+            [
+                (
+                    None
+                    if value is None
+                    else value.encode()[:VARCHAR_MAX_BYTES].decode(errors="ignore")
+                )
+                for value in array.to_pylist()
+            ],
+            pa.string(),
+        )
+    return array
+
+
+def cast_column(array, redshift_type):
+    """Cast a raw CSV string column to the bronze column type."""
+    if redshift_type == "VARCHAR":
+        return _truncate_varchar(array)
+    trimmed = pc.utf8_trim_whitespace(array)
+    trimmed = pc.if_else(pc.equal(trimmed, ""), None, trimmed)
+    if redshift_type == "DECIMAL":
+        # parse at full scale, then round to the column scale as COPY does
+        wide = pc.cast(trimmed, pa.decimal128(38, 10))
+        rounded = pc.round(wide, DECIMAL_SCALE, round_mode="half_towards_infinity")
+        return pc.cast(rounded, arrow_type(redshift_type))
+    return pc.cast(trimmed, arrow_type(redshift_type))
+
+
+def typed_batch(raw_batch, table):
+    """Bronze-typed record batch from a batch of positional string columns."""
+    schema = arrow_schema(table)
+    arrays = []
+    for name, kind in BRONZE_COLUMNS[table]:
+        if name in raw_batch.schema.names:
+            arrays.append(cast_column(raw_batch.column(name), kind))
+        else:
+            arrays.append(pa.nulls(raw_batch.num_rows, arrow_type(kind)))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def partition_path(table, value):
+    column = PARTITION_COLUMNS[table]
+    value = NULL_PARTITION if value is None else str(value)
+    safe_value = "".join(c if c.isalnum() or c in "-_." else "_" for c in value)
+    return f"{PARQUET_PREFIX}{table}/{column.lower()}={safe_value}"
+
+
+def convert_csv(source, table, source_key, out_dir):
+    """
+    Stream one CSV into per-partition Parquet files under ``out_dir``.
+
+    Returns ``{partition_value: (local_path, row_count)}``.
+    """
+    _, batches = open_bronze_csv(source, table, source_key)
+    schema = arrow_schema(table).with_metadata({"source_file": source_key})
+    partition_col = PARTITION_COLUMNS[table]
+    stem = os.path.splitext(source_key.split("/")[-1])[0]
+    writers, outputs = {}, {}
+    try:
+        for raw_batch in batches:
+            batch = pa.Table.from_batches([typed_batch(raw_batch, table)])
+            values = batch.column(partition_col)
+            for value in pc.unique(values).to_pylist():
+                mask = (
+                    pc.is_null(values)
+                    if value is None
+                    else pc.fill_null(pc.equal(values, value), False)
+                )
+                part = batch.filter(mask)
+                key = "" if value is None else str(value)
+                if key not in writers:
+                    path = os.path.join(
+                        out_dir, partition_path(table, value), f"{stem}.parquet"
+                    )
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    writers[key] = pq.ParquetWriter(
+                        path, schema, compression=COMPRESSION
+                    )
+                    outputs[key] = [path, 0]
+                writers[key].write_table(part.replace_schema_metadata(schema.metadata))
+                outputs[key][1] += part.num_rows
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {key: tuple(output) for key, output in outputs.items()}
+
+
+def convert_s3_csv(s3_hook, bucket, source_key, table):
+    """Convert one landed CSV and upload its Parquet files next to the raw data."""
+    body = s3_hook.get_key(source_key, bucket_name=bucket).get()["Body"]
+    with tempfile.TemporaryDirectory() as out_dir:
+        converted = convert_csv(body, table, source_key, out_dir)
+        produced = []
+        for value, (path, row_count) in sorted(converted.items()):
+            parquet_key = os.path.relpath(path, out_dir).replace(os.sep, "/")
+            s3_hook.load_file(path, key=parquet_key, bucket_name=bucket, replace=True)
+            produced.append(
+                ParquetOutput(
+                    source_key=source_key,
+                    parquet_key=parquet_key,
+                    partition_value=value,
+                    row_count=row_count,
+                    size=os.path.getsize(path),
+                )
+            )
+    return produced
@@ -0,0 +1,270 @@
+"""
+Pre-load validation of landed CSVs, run on the S3 object before any COPY.
+
+A file is streamed once in fixed-size chunks and every check is vectorised
+over the chunk:
+
+- header: the file's column names, normalised, match the bronze DDL by
+  position (COPY maps by position, a shifted file loads silently wrong);
+- required keys: PROVNUM / WorkDate and CMS_Certification_Number_CCN are
+  never blank;
+- parsing: INT, SMALLINT, DECIMAL and DATE columns (and WorkDate as
+  YYYYMMDD) parse the way the silver casts expect;
+- uniqueness: the table key is unique within the file.
+
+Memory is bounded by the chunk size except for the uniqueness check, which
+keeps an 8-byte digest of every key, so it grows with the file: 8 bytes per
+row while streaming and 16 for the moment the digests are joined to be
+sorted (a quarter of DailyNurseStaffing, about 1.3M rows, needs about
+21 MB). Files that fail are moved under QUARANTINE_PREFIX with a JSON
+report beside them and are not loaded.
+
+The same pass computes the SHA-256 of the file's bytes (``content_hash``),
+which the DAG compares with the files already loaded to reject a file
+re-delivered under another name.
+"""
+
+import hashlib
+import io
+import json
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from health_data.bronze_schema import source_columns
+from health_data.csv_stream import open_bronze_csv
+
+QUARANTINE_PREFIX = "quarantine/"
+
+# Natural key of each bronze table: required and unique within a file
+KEY_COLUMNS = {
+    "DailyNurseStaffing": ("PROVNUM", "WorkDate"),
+    "ProviderInfo": ("CMS_Certification_Number_CCN",),
+}
+
+# VARCHAR columns the silver layer casts, with the format they must follow
+FORMATTED_COLUMNS = {
+    "DailyNurseStaffing": {"WorkDate": "%Y%m%d"},
+    "ProviderInfo": {},
+}
+
+NUMBER_PATTERNS = {
+    "INT": r"^[+-]?\d+$",
+    "SMALLINT": r"^[+-]?\d+$",
+    "BIGINT": r"^[+-]?\d+$",
+    "DECIMAL": r"^[+-]?(\d+\.?\d*|\.\d+)$",
+}
+DATE_FORMAT = "%Y-%m-%d"
+MAX_SAMPLES = 3
+
+
+@dataclass
+class FileReport:
+    """Outcome of validating one file; ``errors`` is empty when it passed."""
+
+    key: str
+    table: str
+    row_count: int = 0
+    errors: list = field(default_factory=list)
+    content_hash: str = ""
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def to_json(self):
+        return json.dumps(
+            {
+                "key": self.key,
+                "table": self.table,
+                "row_count": self.row_count,
+                "errors": self.errors,
+            },
+            indent=2,
+        )
+
+
+def normalize_name(name):
+    """Compare header and DDL names ignoring case, spacing and punctuation."""
+    return re.sub(r"[^0-9a-z]+", "_", name.lstrip("\ufeff").lower()).strip("_")
+
+
+def header_errors(header, table):
+    errors = []
+    for position, (found, (expected, _)) in enumerate(
+        zip(header, source_columns(table)), start=1
+    ):
+        if normalize_name(found) != normalize_name(expected):
+            errors.append(
+                f"Header column {position} is '{found}', bronze.{table} expects '{expected}'"
+            )
+    return errors
+
+
+class _ColumnTally:
+    """Failing-value count and a few samples for one check on one column."""
+
+    def __init__(self):
+        self.count = 0
+        self.samples = []
+
+    def add(self, values, failed):
+        bad = pc.filter(values, failed)
+        self.count += len(bad)
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.extend(
+                bad.slice(0, MAX_SAMPLES - len(self.samples)).to_pylist()
+            )
+
+
+class FileValidator:
+    """Accumulates the per-chunk checks of one file."""
+
+    def __init__(self, table):
+        self.table = table
+        self.types = dict(source_columns(table))
+        self.keys = KEY_COLUMNS[table]
+        self.formats = FORMATTED_COLUMNS[table]
+        self.blank = {}
+        self.unparsable = {}
+        self.digests = []
+        self.row_count = 0
+
+    def _tally(self, tallies, column):
+        return tallies.setdefault(column, _ColumnTally())
+
+    def add_batch(self, batch):
+        self.row_count += batch.num_rows
+        present = {}
+        for name in batch.schema.names:
+            values = pc.utf8_trim_whitespace(batch.column(name))
+            present[name] = pc.not_equal(values, "")
+            kind = self.types[name]
+            if name in self.formats:
+                parsed = pc.strptime(
+                    values, format=self.formats[name], unit="s", error_is_null=True
+                )
+                failed = pc.and_(present[name], pc.is_null(parsed))
+            elif kind == "DATE":
+                parsed = pc.strptime(
+                    values, format=DATE_FORMAT, unit="s", error_is_null=True
+                )
+                failed = pc.and_(present[name], pc.is_null(parsed))
+            elif kind in NUMBER_PATTERNS:
+                matched = pc.match_substring_regex(values, NUMBER_PATTERNS[kind])
+                failed = pc.and_(present[name], pc.invert(matched))
+            else:
+                continue
+            if pc.any(failed).as_py():
+                self._tally(self.unparsable, name).add(values, failed)
+
+        keys = [name for name in self.keys if name in present]
+        for name in keys:
+            missing = pc.invert(present[name])
+            if pc.any(missing).as_py():
+                self._tally(self.blank, name).add(batch.column(name), missing)
+
+        if keys and len(keys) == len(self.keys):
+            complete = present[keys[0]]
+            for name in keys[1:]:
+                complete = pc.and_(complete, present[name])
+            key_values = pc.binary_join_element_wise(
+                *[pc.utf8_trim_whitespace(batch.column(name)) for name in keys], "\x1f"
+            )
+            key_values = pc.filter(key_values, complete).to_numpy(zero_copy_only=False)
+            self.digests.append(pd.util.hash_array(key_values))
+
+    def errors(self, header):
+        errors = header_errors(header, self.table)
+        if self.row_count == 0:
+            errors.append("File has no data rows")
+        file_columns = [name for name, _ in source_columns(self.table)][: len(header)]
+        for name in self.keys:
+            if name not in file_columns:
+                errors.append(f"Required column {name} is missing")
+        for name, tally in self.blank.items():
+            errors.append(f"{tally.count} blank values in required column {name}")
+        for name, tally in self.unparsable.items():
+            expected = self.formats.get(name) or self.types[name]
+            errors.append(
+                f"{tally.count} values in {name} do not parse as {expected}, e.g. {tally.samples}"
+            )
+        if self.digests:
+            # sorted in place, the per-chunk arrays released once joined
+            digests = np.concatenate(self.digests)
+            self.digests = [digests]
+            digests.sort()
+            dupes = int(np.count_nonzero(digests[1:] == digests[:-1]))
+            if dupes:
+                errors.append(
+                    f"{dupes} duplicate values of key ({', '.join(self.keys)})"
+                )
+        return errors
+
+
+class _HashingStream(io.RawIOBase):
+    """Byte stream that hashes what is read through it."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.sha = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        chunk = self._raw.read(size)
+        self.sha.update(chunk or b"")
+        return chunk
+
+    def readinto(self, target):
+        chunk = self.read(len(target))
+        target[: len(chunk)] = chunk
+        return len(chunk)
+
+
+def validate_csv(source, table, source_key):
+    """Validate a CSV byte stream for bronze ``table`` and return its FileReport."""
+    report = FileReport(key=source_key, table=table)
+    validator = FileValidator(table)
+    source = _HashingStream(source)
+    try:
+        header, batches = open_bronze_csv(source, table, source_key)
+        for batch in batches:
+            validator.add_batch(batch)
+    except (ValueError, pa.ArrowInvalid) as exc:
+        # malformed CSV (extra columns, unbalanced quotes): nothing else is reliable
+        report.errors.append(str(exc))
+        return report
+    # the reader stops at the last record; hash whatever trails it too
+    while source.read(1024 * 1024):
+        pass
+    report.content_hash = source.sha.hexdigest()
+    report.row_count = validator.row_count
+    report.errors.extend(validator.errors(header))
+    return report
+
+
+def validate_s3_csv(s3_hook, bucket, source_key, table):
+    body = s3_hook.get_key(source_key, bucket_name=bucket).get()["Body"]
+    return validate_csv(body, table, source_key)
+
+
+def quarantine_file(s3_hook, bucket, report):
+    """Move a failed file under QUARANTINE_PREFIX next to its JSON report."""
+    target = QUARANTINE_PREFIX + report.key
+    s3_hook.copy_object(
+        source_bucket_key=report.key,
+        dest_bucket_key=target,
+        source_bucket_name=bucket,
+        dest_bucket_name=bucket,
+    )
+    s3_hook.load_string(
+        report.to_json(), key=f"{target}.errors.json", bucket_name=bucket, replace=True
+    )
+    s3_hook.delete_objects(bucket=bucket, keys=[report.key])
+    return target
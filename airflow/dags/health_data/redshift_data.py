@@ -0,0 +1,147 @@
+"""
+Deferrable Redshift Data API statements for the long-running pipeline steps.
+
+``RedshiftStatementOperator`` submits its SQL through the Redshift Data API
+(a list of statements becomes one BatchExecuteStatement, which runs in a
+single transaction) and defers to ``RedshiftDataTrigger``: the worker slot
+is released while the statement runs and the triggerer polls it
+asynchronously. No database session is held by Airflow in between.
+
+The cluster (or Serverless workgroup), database and user are read from the
+same ``redshift_default`` connection the SQL hooks use, so there is still a
+single place to configure the target.
+
+Given the run's ``input_fingerprint`` the step is cached (health_data/step_cache.py):
+it is skipped when it last succeeded on the same inputs, otherwise the cache
+entry is written once the statement has succeeded.
+"""
+
+from airflow.hooks.base import BaseHook
+from airflow.providers.amazon.aws.hooks.redshift_sql import RedshiftSQLHook
+from airflow.providers.amazon.aws.operators.redshift_data import RedshiftDataOperator
+
+from health_data.run_metrics import push_metrics
+from health_data.step_cache import (
+    cache_enabled,
+    cached_outcome,
+    record_statements,
+    step_fingerprint,
+)
+
+SERVERLESS_DOMAIN = ".redshift-serverless.amazonaws.com"
+PROVISIONED_DOMAIN = ".redshift.amazonaws.com"
+
+POLL_INTERVAL = 15
+
+
+def data_api_target(conn):
+    """
+    Data API arguments for a Redshift SQL connection.
+
+    Explicit ``cluster_identifier`` / ``workgroup_name`` / ``secret_arn`` /
+    ``region`` extras win; otherwise they are taken from the endpoint host
+    (``<cluster>.<id>.<region>.redshift.amazonaws.com`` or
+    ``<workgroup>.<account>.<region>.redshift-serverless.amazonaws.com``).
+    """
+    extra = conn.extra_dejson
+    host = (conn.host or "").lower()
+    labels = host.split(".")
+    target = {"database": conn.schema}
+
+    if extra.get("workgroup_name"):
+        target["workgroup_name"] = extra["workgroup_name"]
+    elif extra.get("cluster_identifier"):
+        target["cluster_identifier"] = extra["cluster_identifier"]
+    elif host.endswith(SERVERLESS_DOMAIN):
+        target["workgroup_name"] = labels[0]
+    elif host.endswith(PROVISIONED_DOMAIN):
+        target["cluster_identifier"] = labels[0]
+    else:
+        raise ValueError(
+            f"Cannot derive a Redshift cluster or workgroup from host {conn.host!r}; "
+            "set cluster_identifier or workgroup_name in the connection extras"
+        )
+
+    if extra.get("secret_arn"):
+        target["secret_arn"] = extra["secret_arn"]
+    elif "cluster_identifier" in target:
+        # temporary credentials for the connection's user (GetClusterCredentials)
+        target["db_user"] = conn.login
+
+    region = extra.get("region") or (labels[2] if len(labels) > 4 else None)
+    if region:
+        target["region_name"] = region
+    return target
+
+
+class RedshiftStatementOperator(RedshiftDataOperator):
+    """
+    ``RedshiftDataOperator`` aimed at the cluster behind a Redshift SQL
+    connection, deferrable by default. ``input_fingerprint`` (templated)
+    turns on the skip-if-unchanged cache.
+    """
+
+    template_fields = (*RedshiftDataOperator.template_fields, "input_fingerprint")
+
+    def __init__(
+        self,
+        *,
+        redshift_conn_id="redshift_default",
+        deferrable=True,
+        poll_interval=POLL_INTERVAL,
+        input_fingerprint=None,
+        **kwargs,
+    ):
+        super().__init__(deferrable=deferrable, poll_interval=poll_interval, **kwargs)
+        self.redshift_conn_id = redshift_conn_id
+        self.input_fingerprint = input_fingerprint
+
+    def execute(self, context):
+        if self.input_fingerprint:
+            if not cache_enabled(context["dag_run"].conf):
+                self.log.info("Cache bypassed (force)")
+            else:
+                hit, outcome = cached_outcome(
+                    self._sql_hook(), self.task_id, self._fingerprint()
+                )
+                if hit:
+                    self.log.info(
+                        "Inputs unchanged since the last success, skipping the statement"
+                    )
+                    push_metrics(context, cached=True)
+                    return outcome
+        result = self._submit(context)
+        # only reached when not deferred; deferred runs record in execute_complete
+        self._record(context)
+        return result
+
+    def execute_complete(self, context, event=None):
+        result = super().execute_complete(context, event)
+        self._record(context)
+        return result
+
+    def _fingerprint(self):
+        return step_fingerprint(self.input_fingerprint, self.task_id, self.sql)
+
+    def _sql_hook(self):
+        return RedshiftSQLHook(redshift_conn_id=self.redshift_conn_id)
+
+    def _record(self, context):
+        # Recorded once the statement has finished, in its own transaction;
+        # a lost entry only means a rerun
+        if self.input_fingerprint:
+            self._sql_hook().run(
+                record_statements(self.task_id, self._fingerprint(), context["run_id"])
+            )
+
+    def _submit(self, context):
+        # resolved at run time so parsing the DAG never looks up connections;
+        # arguments given to the operator are kept
+        target = data_api_target(BaseHook.get_connection(self.redshift_conn_id))
+        if self.cluster_identifier or self.workgroup_name:
+            target.pop("cluster_identifier", None)
+            target.pop("workgroup_name", None)
+        for name, value in target.items():
+            if getattr(self, name, None) is None:
+                setattr(self, name, value)
+        return super().execute(context)
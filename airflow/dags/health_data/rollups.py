@@ -0,0 +1,109 @@
+"""
+Gold rollups and the lookup of which table answers a grouping.
+
+``sp_refresh_gold_rollups`` maintains the aggregate tables below from the
+base gold grain (provider x month x staffing title), only for the months
+``sp_generate_gold_provider_staffing_utilization_metric`` refreshed since the
+last rollup run (``gold.metric_refresh_log``). The national daily rollup
+needs the day, which the monthly base grain no longer has, so it is
+aggregated from the silver fact, still only for the refreshed months.
+
+Every table carries additive measures: totalworkhour, utilizationsum,
+utilizationcount and recordcount. When re-aggregating a rollup, sum those
+and recompute the rate as SUM(utilizationsum) / SUM(utilizationcount) * 100.
+Never average bedutilizationrate or add up providercount.
+
+``gold.rollup_catalog`` is seeded from ``ROLLUPS`` (the INSERT in
+SQLScript/Redshift-DDL.sql is ``catalog_seed_sql()``), so report authors can
+look the same thing up in SQL.
+"""
+
+from dataclasses import dataclass
+
+from health_data.ingest import sql_literal
+
+CATALOG_TABLE = "gold.rollup_catalog"
+
+
+@dataclass(frozen=True)
+class Rollup:
+    table: str
+    grain: tuple  # the GROUP BY of the table
+    dimensions: tuple  # grain plus attributes that depend on it
+    description: str
+
+
+# Searched in order, coarsest first; the base gold table answers the rest
+ROLLUPS = (
+    Rollup(
+        "gold.rollup_staffingtype_year",
+        ("title", "staffingtype", "year"),
+        ("title", "staffingtype", "year"),
+        "Hours and utilization per staffing title and year, all providers",
+    ),
+    Rollup(
+        "gold.rollup_national_daily",
+        ("workdateid",),
+        ("workdateid", "workdate", "year", "quarter", "month", "monthname"),
+        "National hours and utilization per day, all providers and titles",
+    ),
+    Rollup(
+        "gold.rollup_state_month",
+        ("state", "year", "month"),
+        ("state", "year", "quarter", "month", "monthname"),
+        "Hours and utilization per state and month, all staffing titles",
+    ),
+    Rollup(
+        "gold.rollup_provider_quarter",
+        ("ccn", "year", "quarter"),
+        ("ccn", "providername", "city", "state", "year", "quarter"),
+        "Hours and utilization per provider and quarter, all staffing titles",
+    ),
+    Rollup(
+        "gold.provider_staffing_utilization_metric",
+        ("ccn", "year", "month", "title", "staffingtype"),
+        (
+            "ccn",
+            "providername",
+            "city",
+            "state",
+            "longitude",
+            "latitude",
+            "year",
+            "quarter",
+            "month",
+            "monthname",
+            "title",
+            "staffingtype",
+        ),
+        "Base gold grain: provider, month and staffing title",
+    ),
+)
+
+
+def rollup_for(columns):
+    """
+    The coarsest table whose dimensions cover ``columns`` (the grouping and
+    filter columns of a visual). Raises ValueError when only silver can
+    answer, e.g. a daily grain per provider.
+    """
+    wanted = {c.lower() for c in columns}
+    for rollup in ROLLUPS:
+        if wanted <= set(rollup.dimensions):
+            return rollup
+    raise ValueError(f"No gold table answers a grouping by {sorted(wanted)}")
+
+
+def catalog_seed_sql(rollups=ROLLUPS):
+    """The rollup catalog seed statements as they appear in Redshift-DDL.sql."""
+    values = ",\n    ".join(
+        f"({order}, {sql_literal(r.table)}, {sql_literal(', '.join(r.grain))}, "
+        f"{sql_literal(', '.join(r.dimensions))}, {sql_literal(r.description)})"
+        for order, r in enumerate(rollups, start=1)
+    )
+    return (
+        f"DELETE FROM {CATALOG_TABLE};\n"
+        f"INSERT INTO {CATALOG_TABLE} "
+        "(search_order, table_name, grain, dimensions, description) VALUES\n"
+        f"    {values};"
+    )
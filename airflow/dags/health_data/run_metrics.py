@@ -0,0 +1,270 @@
+"""
+Per-stage metrics of each DAG run.
+
+Every task of the run gets one row in ``silver.pipeline_run_metrics``, keyed
+by run id and task (and map index for mapped tasks):
+
+- wall time and final state, from the task instance;
+- rows read / written and bytes read / written, pushed by the Python tasks
+  to XCom under ``METRICS_KEY`` (bytes_read of ``copy_to_redshift`` is the
+  bytes the COPY loaded);
+- for the Data API steps, Redshift's own accounting of the statement's
+  session (``RedshiftPid``) while it ran: query count, queue and execution
+  time and rows affected from SYS_QUERY_HISTORY, rows scanned from
+  SYS_QUERY_DETAIL and COPY rows / bytes from SYS_LOAD_HISTORY;
+- ``cached`` when the step succeeded from the step cache without running.
+
+The ``summarize_run`` task collects them once every other task is done
+(whatever its state), writes the rows, pushes them to XCom and logs each
+stage against its p50 / p95 over the previous runs, flagging the stages
+slower than their p95. Runs of the local engine are not recorded: their
+stages are only logged and pushed.
+"""
+
+from dataclasses import asdict, dataclass, fields
+from datetime import timezone
+from typing import Optional
+
+from health_data.ingest import sql_literal
+
+METRICS_TABLE = "silver.pipeline_run_metrics"
+METRICS_KEY = "metrics"
+
+# Runs the percentiles are computed over; cached and failed runs are left out
+HISTORY_DAYS = 90
+# Fewer previous runs than this and a stage is never flagged
+MIN_HISTORY = 5
+
+# Rows affected by the statement's queries; other query types return rows to
+# the client, which the Data API steps do not
+DML_QUERY_TYPES = ("INSERT", "UPDATE", "DELETE", "COPY", "CTAS", "UNLOAD")
+
+SESSION_WINDOW = """
+    session_id = {pid}
+    AND start_time >= {started}
+    AND start_time <= {ended}
+"""
+
+QUERY_STATS_SQL = """
+    SELECT
+        COUNT(*),
+        COALESCE(SUM(queue_time), 0) / 1000000.0,
+        COALESCE(SUM(execution_time), 0) / 1000000.0,
+        COALESCE(SUM(CASE WHEN query_type IN ({dml}) THEN returned_rows ELSE 0 END), 0)
+    FROM sys_query_history
+    WHERE {window}
+"""
+
+SCAN_ROWS_SQL = """
+    SELECT COALESCE(SUM(d.output_rows), 0)
+    FROM sys_query_detail d
+    WHERE d.step_name = 'scan'
+      AND d.query_id IN (SELECT query_id FROM sys_query_history WHERE {window})
+"""
+
+LOAD_STATS_SQL = """
+    SELECT COALESCE(SUM(loaded_rows), 0), COALESCE(SUM(loaded_bytes), 0)
+    FROM sys_load_history
+    WHERE {window}
+"""
+
+HISTORY_SQL = """
+    SELECT
+        task_id,
+        COUNT(*),
+        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY wall_seconds),
+        PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY wall_seconds)
+    FROM {table}
+    WHERE state = 'success'
+      AND NOT cached
+      AND run_id <> {run_id}
+      AND recorded_at > DATEADD(day, -{days}, GETDATE())
+    GROUP BY task_id
+"""
+
+
+@dataclass
+class StageMetrics:
+    task_id: str
+    map_index: int = -1
+    state: Optional[str] = None
+    started_at: Optional[str] = None
+    ended_at: Optional[str] = None
+    wall_seconds: Optional[float] = None
+    cached: bool = False
+    rows_read: Optional[int] = None
+    rows_written: Optional[int] = None
+    bytes_read: Optional[int] = None
+    bytes_written: Optional[int] = None
+    queries: Optional[int] = None
+    queue_seconds: Optional[float] = None
+    exec_seconds: Optional[float] = None
+
+    @property
+    def stage(self):
+        return (
+            self.task_id if self.map_index < 0 else f"{self.task_id}[{self.map_index}]"
+        )
+
+    @property
+    def rows_per_second(self):
+        rows = max(self.rows_read or 0, self.rows_written or 0)
+        if not rows or not self.wall_seconds:
+            return None
+        return rows / self.wall_seconds
+
+
+def push_metrics(context, **metrics):
+    """Report a task's rows / bytes (StageMetrics field names) to the summary."""
+    context["ti"].xcom_push(key=METRICS_KEY, value=metrics)
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def task_metrics(ti, pushed=None):
+    """A task instance's metrics, with what the task pushed under METRICS_KEY."""
+    known = {f.name for f in fields(StageMetrics)}
+    metrics = StageMetrics(
+        task_id=ti.task_id,
+        map_index=ti.map_index,
+        state=str(ti.state) if ti.state else None,
+        started_at=_timestamp(ti.start_date),
+        ended_at=_timestamp(ti.end_date),
+        wall_seconds=round(ti.duration, 3) if ti.duration is not None else None,
+    )
+    for name, value in (pushed or {}).items():
+        if name in known:
+            setattr(metrics, name, value)
+    return metrics
+
+
+def parent_statement_id(returned):
+    """
+    The Data API statement behind a RedshiftDataOperator return value: a list
+    of statement ids, or of sub-statement ids (``<id>:<n>``) for a batch.
+    """
+    if not returned:
+        return None
+    first = returned[0] if isinstance(returned, (list, tuple)) else returned
+    return str(first).split(":")[0]
+
+
+def statement_metrics(hook, description, metrics):
+    """
+    Fill the Redshift side of ``metrics`` from a Data API DescribeStatement
+    response: the queries its session ran between creation and completion.
+    """
+    pid = description.get("RedshiftPid")
+    if not pid:
+        return metrics
+    window = SESSION_WINDOW.format(
+        pid=int(pid),
+        started=sql_literal(_timestamp(description["CreatedAt"])),
+        ended=sql_literal(_timestamp(description["UpdatedAt"])),
+    )
+    dml = ", ".join(sql_literal(t) for t in DML_QUERY_TYPES)
+    queries, queue, execution, affected = hook.get_first(
+        QUERY_STATS_SQL.format(dml=dml, window=window)
+    )
+    (scanned,) = hook.get_first(SCAN_ROWS_SQL.format(window=window))
+    loaded_rows, loaded_bytes = hook.get_first(LOAD_STATS_SQL.format(window=window))
+
+    metrics.queries = int(queries)
+    metrics.queue_seconds = round(float(queue), 3)
+    metrics.exec_seconds = round(float(execution), 3)
+    metrics.rows_read = int(scanned)
+    metrics.rows_written = int(affected)
+    if loaded_bytes:
+        metrics.rows_written = int(loaded_rows)
+        metrics.bytes_read = int(loaded_bytes)
+    return metrics
+
+
+def _value(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return sql_literal(value)
+
+
+def record_statements(run_id, stages):
+    """Replace the run's rows in the metrics table."""
+    columns = [f.name for f in fields(StageMetrics)]
+    statements = [f"DELETE FROM {METRICS_TABLE} WHERE run_id = {sql_literal(run_id)};"]
+    if stages:
+        values = ",\n    ".join(
+            "("
+            + ", ".join(
+                [sql_literal(run_id)] + [_value(getattr(s, c)) for c in columns]
+            )
+            + ", GETDATE())"
+            for s in stages
+        )
+        statements.append(
+            f"INSERT INTO {METRICS_TABLE} (run_id, {', '.join(columns)}, recorded_at) "
+            f"VALUES\n    {values};"
+        )
+    return statements
+
+
+def history(hook, run_id, days=HISTORY_DAYS):
+    """``{task_id: (runs, p50 seconds, p95 seconds)}`` over the previous runs."""
+    rows = hook.get_records(
+        HISTORY_SQL.format(
+            table=METRICS_TABLE, run_id=sql_literal(run_id), days=int(days)
+        )
+    )
+    return {task: (int(n), float(p50), float(p95)) for task, n, p50, p95 in rows}
+
+
+def hot_spots(stages, past, min_history=MIN_HISTORY):
+    """Stages of this run slower than their historical p95."""
+    return [
+        s
+        for s in stages
+        if not s.cached
+        and s.wall_seconds is not None
+        and past.get(s.task_id, (0, 0, 0))[0] >= min_history
+        and s.wall_seconds > past[s.task_id][2]
+    ]
+
+
+def _cell(value, fmt):
+    return "-" if value is None else format(value, fmt)
+
+
+def format_summary(stages, past):
+    """One line per stage, slowest first, with its historical p50 / p95."""
+    total = sum(s.wall_seconds or 0 for s in stages)
+    hot = {id(s) for s in hot_spots(stages, past)}
+    lines = [
+        f"{'stage':<56}{'state':<16}{'seconds':>9}{'share':>7}"
+        f"{'rows':>13}{'rows/s':>11}{'p50':>9}{'p95':>9}"
+    ]
+    for s in sorted(stages, key=lambda s: s.wall_seconds or 0, reverse=True):
+        runs, p50, p95 = past.get(s.task_id, (0, None, None))
+        share = 100.0 * (s.wall_seconds or 0) / total if total else None
+        rows = max(s.rows_read or 0, s.rows_written or 0) or None
+        state = f"{s.state} (cached)" if s.cached else s.state
+        lines.append(
+            f"{s.stage:<56}{state or '-':<16}{_cell(s.wall_seconds, '.1f'):>9}"
+            f"{_cell(share, '.0f'):>6}%{_cell(rows, ','):>13}"
+            f"{_cell(s.rows_per_second, ',.0f'):>11}"
+            f"{_cell(p50, '.1f'):>9}{_cell(p95, '.1f'):>9}"
+            + ("  <- slower than p95" if id(s) in hot else "")
+        )
+    return "\n".join(lines)
+
+
+def summary(stages):
+    """The XCom payload: the stage metrics as plain dicts."""
+    return [dict(asdict(s), stage=s.stage) for s in stages]
@@ -0,0 +1,73 @@
+"""
+Staffing-type catalog: which bronze hours column feeds which StaffingTypeID.
+
+``silver.staffingtypecatalog`` is seeded from this constant (the INSERT in
+SQLScript/Redshift-DDL.sql is ``catalog_seed_sql()``, a test keeps the two
+in step). ``sp_generate_silver_staffingtype_dim`` builds the dimension from
+the catalog and ``sp_stage_silver_fact_table`` generates one CASE branch
+per enabled type, so the fact is still staged in one scan of bronze however
+many types are enabled.
+
+IDs 1-4 are the original hard-coded types and must keep their meaning; they
+are the only types enabled, so the fact and the gold metrics keep their
+original content. The others are catalogued but disabled: set ``enabled=True``
+here, re-run the seed and run the DAG with {"full_refresh": true} to backfill
+the type (enabling only affects batches loaded afterwards).
+"""
+
+from dataclasses import dataclass
+
+from health_data.ingest import sql_literal
+
+CATALOG_TABLE = "silver.staffingtypecatalog"
+
+FULL_TIME = "Full Time"
+CONTRACTOR = "Contractor"
+
+
+@dataclass(frozen=True)
+class StaffingType:
+    staffing_type_id: int
+    hours_column: str  # column of BRONZE.DailyNurseStaffing
+    title: str
+    staffing_type: str
+    enabled: bool = False
+
+
+STAFFING_TYPE_CATALOG = (
+    StaffingType(
+        1, "Hrs_RNDON_emp", "Full Time Registered Nurse", FULL_TIME, enabled=True
+    ),
+    StaffingType(
+        2, "Hrs_RNDON_ctr", "Contract Registered Nurse", CONTRACTOR, enabled=True
+    ),
+    StaffingType(3, "Hrs_CNA_emp", "Full Time CNA", FULL_TIME, enabled=True),
+    StaffingType(4, "Hrs_CNA_ctr", "Contract CNA", CONTRACTOR, enabled=True),
+    StaffingType(5, "Hrs_RNadmin_emp", "Full Time RN Admin", FULL_TIME),
+    StaffingType(6, "Hrs_RNadmin_ctr", "Contract RN Admin", CONTRACTOR),
+    StaffingType(7, "Hrs_RN_emp", "Full Time RN Direct Care", FULL_TIME),
+    StaffingType(8, "Hrs_RN_ctr", "Contract RN Direct Care", CONTRACTOR),
+    StaffingType(9, "Hrs_LPNadmin_emp", "Full Time LPN Admin", FULL_TIME),
+    StaffingType(10, "Hrs_LPNadmin_ctr", "Contract LPN Admin", CONTRACTOR),
+    StaffingType(11, "Hrs_LPN_emp", "Full Time LPN", FULL_TIME),
+    StaffingType(12, "Hrs_LPN_ctr", "Contract LPN", CONTRACTOR),
+    StaffingType(13, "Hrs_NAtrn_emp", "Full Time Nurse Aide in Training", FULL_TIME),
+    StaffingType(14, "Hrs_NAtrn_ctr", "Contract Nurse Aide in Training", CONTRACTOR),
+    StaffingType(15, "Hrs_MedAide_emp", "Full Time Medication Aide", FULL_TIME),
+    StaffingType(16, "Hrs_MedAide_ctr", "Contract Medication Aide", CONTRACTOR),
+)
+
+
+def catalog_seed_sql(catalog=STAFFING_TYPE_CATALOG):
+    """The catalog seed statements as they appear in Redshift-DDL.sql."""
+    values = ",\n    ".join(
+        f"({t.staffing_type_id}, {sql_literal(t.hours_column)}, {sql_literal(t.title)}, "
+        f"{sql_literal(t.staffing_type)}, {'TRUE' if t.enabled else 'FALSE'})"
+        for t in catalog
+    )
+    return (
+        f"DELETE FROM {CATALOG_TABLE};\n"
+        f"INSERT INTO {CATALOG_TABLE} "
+        "(StaffingTypeID, HoursColumn, Title, StaffingType, Enabled) VALUES\n"
+        f"    {values};"
+    )
@@ -0,0 +1,129 @@
+"""
+Skip-if-unchanged cache for the validation and transform steps.
+
+A run first fingerprints its inputs (``fingerprint_inputs`` task): the set
+of loaded files in ``bronze.ingested_files`` (key, ETag, batch), the source
+of the stored procedures deployed in Redshift and the Python code of this
+package and the DAG. Each cached step combines that with its own name and
+SQL (so a ``full_refresh`` run differs from an incremental one) and looks
+the result up in ``silver.step_cache``. On a hit the step succeeds with the
+stored outcome without running it again; otherwise it runs and records its
+fingerprint once it succeeded. Failed steps record nothing, so a retried run
+redoes only what did not finish.
+
+Trigger the DAG with {"force": true} to bypass the cache.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from health_data.ingest import sql_literal
+from health_data.run_metrics import push_metrics
+
+CACHE_TABLE = "silver.step_cache"
+
+# Bump to invalidate every cached step (e.g. after changing a catalog table
+# by hand, which is not part of the fingerprint)
+CACHE_VERSION = 1
+
+INGESTED_FILES_SQL = """
+    SELECT COALESCE(s3_key, filename), COALESCE(etag, ''), batch_id
+    FROM bronze.ingested_files
+    ORDER BY 1, 3
+"""
+
+PROCEDURE_SOURCE_SQL = """
+    SELECT proname, prosrc
+    FROM pg_proc_info
+    WHERE LEFT(proname, 3) = 'sp_' OR LEFT(proname, 2) = 'f_'
+    ORDER BY 1, 2
+"""
+
+DAGS_FOLDER = Path(__file__).resolve().parents[1]
+
+
+def _digest(*parts):
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(str(part).encode("utf-8"))
+        sha.update(b"\x1f")
+    return sha.hexdigest()
+
+
+def code_version(root=DAGS_FOLDER):
+    """Digest of the DAG files and this package, so a deploy invalidates the cache."""
+    sha = hashlib.sha256(f"cache-version:{CACHE_VERSION}".encode("utf-8"))
+    for path in sorted(root.glob("*.py")) + sorted((root / "health_data").glob("*.py")):
+        sha.update(str(path.relative_to(root)).encode("utf-8"))
+        sha.update(path.read_bytes())
+    return sha.hexdigest()
+
+
+def input_fingerprint(hook, code=None):
+    """Fingerprint of everything the cached steps read, shared by the whole run."""
+    files = hook.get_records(INGESTED_FILES_SQL)
+    procedures = hook.get_records(PROCEDURE_SOURCE_SQL)
+    return _digest(
+        code if code is not None else code_version(),
+        *("|".join(str(v) for v in row) for row in files),
+        *("|".join(str(v) for v in row) for row in procedures),
+    )
+
+
+def step_fingerprint(inputs, step, sql=""):
+    """One step's fingerprint: the run's inputs plus what the step executes."""
+    if isinstance(sql, (list, tuple)):
+        sql = "\n".join(sql)
+    return _digest(inputs, step, sql)
+
+
+def cache_enabled(conf):
+    return not (conf or {}).get("force")
+
+
+def cached_outcome(hook, step, fingerprint):
+    """``(True, outcome)`` when the step last succeeded with this fingerprint."""
+    row = hook.get_first(
+        f"SELECT outcome FROM {CACHE_TABLE} "
+        f"WHERE step_name = {sql_literal(step)} AND fingerprint = {sql_literal(fingerprint)}"
+    )
+    if not row:
+        return False, None
+    return True, json.loads(row[0]) if row[0] else None
+
+
+def record_statements(step, fingerprint, run_id, outcome=None):
+    """Replace the step's cache entry."""
+    stored = (
+        "NULL" if outcome is None else sql_literal(json.dumps(outcome, default=str))
+    )
+    return [
+        f"DELETE FROM {CACHE_TABLE} WHERE step_name = {sql_literal(step)};",
+        f"INSERT INTO {CACHE_TABLE} (step_name, fingerprint, run_id, outcome, cached_at) "
+        f"VALUES ({sql_literal(step)}, {sql_literal(fingerprint)}, {sql_literal(run_id)}, "
+        f"{stored}, GETDATE());",
+    ]
+
+
+def run_cached(hook, step, inputs, run, context, log, sql=""):
+    """
+    Return the cached outcome of ``step`` when its fingerprint is unchanged,
+    otherwise ``run()`` it and record the fingerprint and outcome.
+    """
+    if not inputs:
+        return run()
+    fingerprint = step_fingerprint(inputs, step, sql)
+    if cache_enabled(context["dag_run"].conf):
+        hit, outcome = cached_outcome(hook, step, fingerprint)
+        if hit:
+            log.info(
+                f"{step}: inputs unchanged since the last success, using the cached outcome"
+            )
+            push_metrics(context, cached=True)
+            return outcome
+    else:
+        log.info(f"{step}: cache bypassed (force)")
+    outcome = run()
+    hook.run(record_statements(step, fingerprint, context["run_id"], outcome))
+    return outcome
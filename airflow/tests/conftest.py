@@ -0,0 +1,17 @@
+"""
+Test configuration: point Airflow at the repo's DAGs folder and make its
+helper package (``health_data``) importable, so ``pytest`` runs the same
+from the repository root (CI) as from ``airflow/``.
+"""
+
+import os
+import sys
+
+DAGS_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "dags"))
+
+# Airflow reads its configuration on import, so this has to run first
+os.environ.setdefault("AIRFLOW__CORE__DAGS_FOLDER", DAGS_FOLDER)
+os.environ.setdefault("AIRFLOW__CORE__LOAD_EXAMPLES", "False")
+
+if DAGS_FOLDER not in sys.path:
+    sys.path.insert(0, DAGS_FOLDER)
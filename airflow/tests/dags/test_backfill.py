@@ -0,0 +1,220 @@
+"""Backfill tests: quarter detection, partition planning, checkpoints and the backfill DAG."""
+
+import io
+
+import pytest
+from airflow.models import DagBag
+
+from health_data.backfill import (
+    CHECKPOINT_TABLE,
+    DONE,
+    LOADED,
+    HEAD_BYTES,
+    PROVIDER_PARTITION,
+    checkpoint_statements,
+    file_quarter,
+    finished_partitions,
+    plan_partitions,
+    unloaded_files,
+    without_row_count_deltas,
+)
+from health_data.dq_rules import RULE_SETS
+from health_data.file_queue import PendingFile
+
+
+class FakeS3:
+    """Ranged GETs of in-memory objects."""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.ranges = []
+
+    def get_object(self, Bucket, Key, Range):
+        self.ranges.append(Range)
+        start, end = (int(n) for n in Range.split("=")[1].split("-"))
+        return {"Body": io.BytesIO(self.objects[Key][start : end + 1])}
+
+
+class FakeHook:
+    def __init__(self, records):
+        self.records = records
+        self.sql = []
+
+    def get_records(self, sql):
+        self.sql.append(sql)
+        return self.records
+
+
+def test_file_quarter_reads_the_first_data_row():
+    body = b"PROVNUM,CY_Qtr,WorkDate\n015009,2024Q2,20240401\n" + b"x" * HEAD_BYTES
+    s3 = FakeS3({"data/a.csv": body})
+    assert file_quarter(s3, "bucket", "data/a.csv") == "2024Q2"
+    assert s3.ranges == [f"bytes=0-{HEAD_BYTES - 1}"]
+
+
+def test_file_quarter_needs_the_column():
+    s3 = FakeS3({"data/a.csv": b"PROVNUM,WorkDate\n015009,20240401\n"})
+    with pytest.raises(ValueError, match="no CY_Qtr column"):
+        file_quarter(s3, "bucket", "data/a.csv")
+
+
+def test_plan_groups_by_quarter_providers_first():
+    files = [
+        PendingFile("data/DailyNurseStaffing_2024Q2.csv", "e2", 20),
+        PendingFile("data/ProviderInfo_202401.csv", "p1", 5),
+        PendingFile("data/DailyNurseStaffing_2024Q1.csv", "e1", 10),
+        PendingFile("data/DailyNurseStaffing_2024Q1_late.csv", "e3", 1),
+    ]
+    quarters = {f.s3_key: f.s3_key.split("_")[1][:6] for f in files}
+    plan = plan_partitions(files, quarters.get)
+    assert [p["partition"] for p in plan] == [PROVIDER_PARTITION, "2024Q1", "2024Q2"]
+    assert plan[0]["table"] == "ProviderInfo"
+    assert [f["s3_key"] for f in plan[1]["files"]] == [
+        "data/DailyNurseStaffing_2024Q1.csv",
+        "data/DailyNurseStaffing_2024Q1_late.csv",
+    ]
+    assert plan[2]["files"] == [
+        {"s3_key": "data/DailyNurseStaffing_2024Q2.csv", "etag": "e2", "size": 20}
+    ]
+
+    resumed = plan_partitions(files, quarters.get, {PROVIDER_PARTITION, "2024Q1"})
+    assert [p["partition"] for p in resumed] == ["2024Q2"]
+
+
+def test_finished_partitions_of_the_backfill():
+    hook = FakeHook([("2024Q1",), ("2024Q2",)])
+    assert finished_partitions(hook, "manual__1") == {"2024Q1", "2024Q2"}
+    assert "backfill_id = 'manual__1'" in hook.sql[0]
+    assert f"stage = '{DONE}'" in hook.sql[0]
+
+
+def test_unloaded_files_skip_ingested_etags():
+    files = [
+        {"s3_key": "data/a.csv", "etag": "e1", "size": 1},
+        {"s3_key": "data/b.csv", "etag": "e2", "size": 1},
+        {"s3_key": "data/c.csv", "etag": "e3", "size": 1},
+        {"s3_key": "data/d.csv", "etag": "e4", "size": 1},
+        {"s3_key": "data/2023/e.csv", "etag": "e5", "size": 1},
+    ]
+    # b was overwritten since it was loaded; c predates ETag tracking and e
+    # predates key tracking (recorded by filename only)
+    hook = FakeHook(
+        [
+            ["data/a.csv", "e1", "a.csv"],
+            ["data/b.csv", "old", "b.csv"],
+            ["data/c.csv", None, "c.csv"],
+            [None, None, "e.csv"],
+        ]
+    )
+    assert [f["s3_key"] for f in unloaded_files(hook, files)] == [
+        "data/b.csv",
+        "data/d.csv",
+    ]
+
+
+def test_checkpoint_replaces_the_partition_entry():
+    delete, insert = checkpoint_statements("manual__1", "2024Q1", DONE, "manual__2", 3)
+    assert delete == (
+        f"DELETE FROM {CHECKPOINT_TABLE} WHERE backfill_id = 'manual__1' "
+        "AND partition_key = '2024Q1';"
+    )
+    assert (
+        "VALUES ('manual__1', '2024Q1', 'done', 3, 'manual__2', GETDATE());" in insert
+    )
+
+
+def test_backfill_rules_drop_row_count_deltas():
+    for rule_set in RULE_SETS.values():
+        kinds = [rule.kind for rule in without_row_count_deltas(rule_set).rules]
+        assert "row_count_delta" not in kinds
+        assert len(kinds) == sum(r.kind != "row_count_delta" for r in rule_set.rules)
+
+
+def test_backfill_dag_bounds_concurrency():
+    dag = DagBag(include_examples=False).dags["health_data_backfill_dag"]
+    prepare = dag.get_task("backfill_quarter.prepare_partition")
+    # a quarter's load and transform are one task, so no other quarter's
+    # batches can land in between
+    load_and_transform = dag.get_task("backfill_quarter.load_and_transform_partition")
+    assert prepare.max_active_tis_per_dagrun > 1
+    assert load_and_transform.max_active_tis_per_dagrun == 1
+    assert "backfill_providers" in prepare.upstream_task_ids
+    assert load_and_transform.upstream_task_ids >= {prepare.task_id}
+    assert not {"load_partition", "transform_partition"} & {
+        task.task_id.split(".")[-1] for task in dag.tasks
+    }
+    assert all(task.retries >= 2 for task in dag.tasks)
+
+
+class EmptyStageHook:
+    """Redshift stand-in where bronze has rows but nothing new was staged."""
+
+    def __init__(self, **kwargs):
+        self.statements = []
+
+    def get_conn(self):
+        columns = {col for rule_set in RULE_SETS.values() for col in rule_set.columns}
+
+        class _Cursor:
+            description = [(col,) for col in columns]
+
+            def execute(self, sql):
+                pass
+
+        class _Conn:
+            def cursor(self):
+                return _Cursor()
+
+            def close(self):
+                pass
+
+        return _Conn()
+
+    def get_records(self, sql):
+        return [("silver.staffingtypecatalog",)]
+
+    def get_first(self, sql):
+        if CHECKPOINT_TABLE in sql:
+            # the quarter's load committed before the failed attempt
+            return (LOADED, "manual__2")
+        # row count, then one zero violation count per rule
+        rows = 0 if "Stage_DailyFacilityLogFact" in sql else 10
+        return (rows,) + (0,) * 20
+
+    def run(self, sql, autocommit=False):
+        self.statements.append(sql)
+
+
+def test_retry_with_nothing_staged_completes(monkeypatch):
+    # a retry after sp_generate_silver_fact_table advanced the watermark: the
+    # load is not run again and the transform finds an empty stage
+    dag = DagBag(include_examples=False).dags["health_data_backfill_dag"]
+    task = dag.get_task("backfill_quarter.load_and_transform_partition")
+    hooks = []
+    monkeypatch.setitem(
+        task.python_callable.__globals__,
+        "RedshiftSQLHook",
+        lambda **kwargs: hooks.append(EmptyStageHook()) or hooks[-1],
+    )
+
+    class Run:
+        conf = {}
+
+    class TaskInstance:
+        map_index = 0
+
+        def xcom_pull(self, task_ids, map_indexes):
+            return ["CALL sp_ingest_batch_from_s3('manifest', 'DailyNurseStaffing');"]
+
+    task.python_callable(
+        partition={"partition": "2024Q1", "table": "DailyNurseStaffing", "files": []},
+        dag_run=Run(),
+        run_id="manual__2",
+        ti=TaskInstance(),
+    )
+    statements = [sql for hook in hooks for sql in hook.statements]
+    calls = [sql for sql in statements if isinstance(sql, str)]
+    assert not any("sp_ingest_batch_from_s3" in sql for sql in calls)
+    assert "CALL sp_generate_silver_fact_table();" in calls
+    assert calls[-1] == "CALL sp_refresh_gold_rollups(FALSE);"
+    assert f"'{DONE}'" in statements[-1][1]
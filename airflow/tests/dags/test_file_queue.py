@@ -0,0 +1,164 @@
+"""Pending-files queue tests: (key, ETag) candidates from S3 and the queue statements."""
+
+import botocore.exceptions
+import pytest
+
+from health_data.file_queue import (
+    DuplicateFile,
+    PendingFile,
+    dequeue_statement,
+    describe_keys,
+    enqueue_statements,
+    list_prefix,
+    loaded_content,
+    pending_files,
+    reject_duplicates_statements,
+)
+
+
+class FakeS3:
+    """Just enough of the S3 client for HEAD and paginated listing."""
+
+    exceptions = botocore.exceptions
+
+    def __init__(self, objects, page_size=2):
+        self.objects = objects
+        self.page_size = page_size
+        self.heads = []
+
+    def head_object(self, Bucket, Key):
+        self.heads.append(Key)
+        if Key not in self.objects:
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject"
+            )
+        etag, size = self.objects[Key]
+        return {"ETag": f'"{etag}"', "ContentLength": size}
+
+    def get_paginator(self, name):
+        assert name == "list_objects_v2"
+        fake = self
+
+        class _Paginator:
+            def paginate(self, Bucket, Prefix):
+                keys = sorted(k for k in fake.objects if k.startswith(Prefix))
+                for i in range(0, len(keys), fake.page_size):
+                    yield {
+                        "Contents": [
+                            {
+                                "Key": k,
+                                "ETag": f'"{fake.objects[k][0]}"',
+                                "Size": fake.objects[k][1],
+                            }
+                            for k in keys[i : i + fake.page_size]
+                        ]
+                    }
+
+        return _Paginator()
+
+
+OBJECTS = {
+    "data/2024/ProviderInfo.csv": ("aaa", 10),
+    "data/2025/ProviderInfo.csv": ("bbb", 20),
+    "data/DailyNurseStaffing_2024Q1.csv": ("ccc", 30),
+    "data/readme.txt": ("ddd", 1),
+}
+
+
+def test_describe_keys_only_heads_the_given_keys():
+    s3 = FakeS3(OBJECTS)
+    files = describe_keys(s3, "bucket", ["data/2025/ProviderInfo.csv", "data/gone.csv"])
+    assert s3.heads == ["data/2025/ProviderInfo.csv", "data/gone.csv"]
+    assert files == [PendingFile("data/2025/ProviderInfo.csv", "bbb", 20)]
+
+
+def test_describe_keys_raises_other_errors():
+    class Denied(FakeS3):
+        def head_object(self, Bucket, Key):
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "403", "Message": "Forbidden"}}, "HeadObject"
+            )
+
+    with pytest.raises(botocore.exceptions.ClientError):
+        describe_keys(Denied(OBJECTS), "bucket", ["data/2024/ProviderInfo.csv"])
+
+
+def test_list_prefix_reconciles_every_csv_with_etag():
+    files = list_prefix(FakeS3(OBJECTS), "bucket", "data/")
+    assert [(f.s3_key, f.etag) for f in files] == [
+        ("data/2024/ProviderInfo.csv", "aaa"),
+        ("data/2025/ProviderInfo.csv", "bbb"),
+        ("data/DailyNurseStaffing_2024Q1.csv", "ccc"),
+    ]
+
+
+def test_enqueue_statements():
+    assert enqueue_statements([]) == []
+    statements = enqueue_statements(
+        [PendingFile("data/O'Brien.csv", "e1", 5), PendingFile("data/b.csv", "e2", 7)]
+    )
+    assert (
+        "('data/O''Brien.csv', 'e1', 5, 'O''Brien.csv'),\n"
+        "    ('data/b.csv', 'e2', 7, 'b.csv')"
+    ) in statements[2]
+    # superseded ETags of a key are dropped, then only unseen (key, etag) pairs queued
+    assert "etag <> c.etag" in statements[3]
+    assert "i.etag = c.etag OR i.etag IS NULL" in statements[4]
+    # legacy rows have no key and are matched by filename
+    assert "i.s3_key IS NULL AND i.filename = c.filename" in statements[4]
+
+
+def test_dequeue_statement():
+    assert dequeue_statement([PendingFile("data/a.csv", "e1")]) == (
+        "DELETE FROM bronze.pending_files "
+        "WHERE (s3_key = 'data/a.csv' AND etag = 'e1');"
+    )
+
+
+def test_pending_files_one_entry_per_key():
+    class Hook:
+        def get_records(self, sql):
+            return [
+                ("data/a.csv", "old", 1),
+                ("data/b.csv", "e2", None),
+                ("data/a.csv", "new", 3),
+            ]
+
+    assert pending_files(Hook()) == [
+        PendingFile("data/a.csv", "new", 3),
+        PendingFile("data/b.csv", "e2", 0),
+    ]
+
+
+def test_loaded_content_looks_up_hashes_once():
+    class Hook:
+        def __init__(self):
+            self.queries = []
+
+        def get_records(self, sql):
+            self.queries.append(sql)
+            return [("h1", "data/a.csv")]
+
+    hook = Hook()
+    assert loaded_content(hook, []) == {}
+    assert hook.queries == []
+    assert loaded_content(hook, ["h2", "h1", "h1"]) == {"h1": "data/a.csv"}
+    assert "content_hash IN ('h1', 'h2')" in hook.queries[0]
+
+
+def test_rejected_duplicates_are_recorded_and_dequeued():
+    duplicate = DuplicateFile(
+        PendingFile("data/copy/a.csv", "e9", 5), "ProviderInfo", "h1", "data/a.csv"
+    )
+    delete, insert, dequeue = reject_duplicates_statements([duplicate])
+    assert (
+        delete
+        == "DELETE FROM bronze.ingested_files WHERE s3_key IN ('data/copy/a.csv');"
+    )
+    # no batch_id: never picked up by the silver watermarks
+    assert "batch_id" not in insert
+    assert (
+        "('a.csv', 'data/copy/a.csv', 'e9', 'ProviderInfo', 'h1', 'data/a.csv', GETDATE())"
+        in insert
+    )
+    assert dequeue == dequeue_statement([duplicate.file])
@@ -0,0 +1,174 @@
+"""Gold export tests: changed partitions, UNLOAD statements, the manifest and the local export."""
+
+import json
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from airflow.models import DagBag
+
+from health_data.gold_export import (
+    EXPORT_TABLES,
+    MANIFEST_KEY,
+    UNLOAD_BATCH,
+    changed_months,
+    export_local,
+    merge_manifest,
+    partition_path,
+    unload_batches,
+    unload_entry,
+    unload_plan,
+    unload_statement,
+    watermark_statement,
+)
+
+GOLD = "gold.provider_staffing_utilization_metric"
+
+
+class FakeHook:
+    def __init__(self, records):
+        self.records = records
+        self.sql = []
+
+    def get_records(self, sql):
+        self.sql.append(sql)
+        return self.records
+
+
+def gold_table(rows):
+    return pa.table(
+        {
+            "ccn": [r[0] for r in rows],
+            "year": [r[1] for r in rows],
+            "month": [r[2] for r in rows],
+            "totalworkhour": [r[3] for r in rows],
+        }
+    )
+
+
+def test_changed_months_and_watermark():
+    hook = FakeHook(
+        [
+            (2024, 3, datetime(2024, 5, 1, 12, 0)),
+            (2024, 1, datetime(2024, 5, 2, 8, 30)),
+        ]
+    )
+    months, as_of = changed_months(hook)
+    assert months == [(2024, 1), (2024, 3)]
+    assert as_of == "2024-05-02 08:30:00.000000"
+    assert "target_name = 'gold.export'" in hook.sql[0]
+    assert changed_months(FakeHook([])) == ([], None)
+    assert watermark_statement(as_of) == (
+        "CALL sp_set_etl_watermark('gold.export', 0, '2024-05-02 08:30:00.000000'::TIMESTAMP);"
+    )
+
+
+def test_unload_plan_follows_each_table_grain():
+    plan = unload_plan([(2024, 2), (2024, 3), (2024, 4)])
+    assert plan[GOLD] == [(2024, 2), (2024, 3), (2024, 4)]
+    assert plan["gold.rollup_provider_quarter"] == [(2024, 1), (2024, 2)]
+    assert plan["gold.rollup_staffingtype_year"] == [(2024,)]
+
+
+def test_unload_statement_replaces_one_partition():
+    sql = unload_statement("bucket", GOLD, ("year", "month"), (2024, 3))
+    assert sql.startswith(
+        "UNLOAD ('SELECT * FROM gold.provider_staffing_utilization_metric "
+        "WHERE year = 2024 AND month = 3') "
+        "TO 's3://bucket/exports/gold/provider_staffing_utilization_metric/year=2024/month=3/part_'"
+    )
+    assert sql.endswith("FORMAT AS PARQUET MANIFEST VERBOSE CLEANPATH;")
+
+
+def test_unload_batches_respect_the_batch_limit():
+    months = [(year, month) for year in range(2020, 2025) for month in range(1, 13)]
+    batches = unload_batches("bucket", unload_plan(months))
+    gold = [
+        b for b in batches if b["statement_name"].startswith("unload_provider_staffing")
+    ]
+    assert [len(b["sql"]) for b in gold] == [UNLOAD_BATCH, 20]
+    assert len({b["statement_name"] for b in batches}) == len(batches)
+
+
+def test_manifest_replaces_changed_partitions_only():
+    columns = EXPORT_TABLES[GOLD]
+    unloaded = {
+        "entries": [
+            {
+                "url": "s3://bucket/exports/gold/provider_staffing_utilization_metric/"
+                "year=2024/month=3/part_0000_part_00.parquet",
+                "meta": {"content_length": 2048, "record_count": 10},
+            }
+        ]
+    }
+    first = merge_manifest(
+        None,
+        {
+            GOLD: [
+                unload_entry(GOLD, columns, (2024, 3), unloaded, "t1", "run1"),
+                unload_entry(GOLD, columns, (2024, 2), unloaded, "t1", "run1"),
+            ]
+        },
+        "t1",
+    )
+    partitions = first["tables"]["provider_staffing_utilization_metric"]["partitions"]
+    assert [p["values"] for p in partitions] == [
+        {"year": 2024, "month": 2},
+        {"year": 2024, "month": 3},
+    ]
+    assert partitions[1]["files"][0]["key"].endswith(
+        "month=3/part_0000_part_00.parquet"
+    )
+    assert (partitions[1]["rows"], partitions[1]["bytes"]) == (10, 2048)
+
+    # month 3 rewritten, month 2 emptied
+    second = merge_manifest(
+        first,
+        {
+            GOLD: [
+                unload_entry(GOLD, columns, (2024, 3), unloaded, "t2", "run2"),
+                unload_entry(GOLD, columns, (2024, 2), {}, "t2", "run2"),
+            ]
+        },
+        "t2",
+    )
+    partitions = second["tables"]["provider_staffing_utilization_metric"]["partitions"]
+    assert [(p["values"]["month"], p["run_id"]) for p in partitions] == [(3, "run2")]
+    assert second["generated_at"] == "t2"
+
+
+def test_local_export_rewrites_changed_partitions(tmp_path):
+    rows = [
+        ("015009", 2024, 1, 10.0),
+        ("015009", 2024, 2, 12.5),
+        ("015010", 2024, 2, 3.0),
+    ]
+    manifest, written = export_local({GOLD: gold_table(rows)}, tmp_path, run_id="run1")
+    assert len(written) == 2
+    path = partition_path(GOLD, ("year", "month"), (2024, 2))
+    assert pq.read_table(tmp_path / path / "part-0.parquet").num_rows == 2
+
+    # same rows: nothing rewritten
+    again, written = export_local({GOLD: gold_table(rows)}, tmp_path, manifest, "run2")
+    assert written == []
+    assert again["tables"] == manifest["tables"]
+
+    # February changed, January gone
+    rows = [("015009", 2024, 2, 99.0), ("015010", 2024, 2, 3.0)]
+    latest, written = export_local({GOLD: gold_table(rows)}, tmp_path, again, "run3")
+    assert [p.relative_to(tmp_path).as_posix() for p in written] == [
+        f"{path}part-0.parquet"
+    ]
+    partitions = latest["tables"]["provider_staffing_utilization_metric"]["partitions"]
+    assert [(p["values"]["month"], p["run_id"]) for p in partitions] == [(2, "run3")]
+    json.dumps(latest)
+
+
+def test_export_runs_after_the_rollups():
+    dag = DagBag(include_examples=False).dags["health_data_project_dag"]
+    assert dag.get_task("prepare_gold_export").upstream_task_ids == {
+        "refresh_gold_rollups"
+    }
+    assert "unload_gold" in dag.get_task("publish_gold_export").upstream_task_ids
+    assert "end" in dag.get_task("publish_gold_export").downstream_task_ids
+    assert MANIFEST_KEY == "exports/gold/manifest.json"
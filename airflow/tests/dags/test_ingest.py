@@ -0,0 +1,122 @@
+"""
+Batched ingest tests: routing of S3 keys to bronze tables, COPY manifests and
+the per-group load statements.
+"""
+
+import json
+
+import pytest
+
+from health_data.ingest import (
+    batch_load_statements,
+    build_manifest,
+    conf_file_keys,
+    group_files_by_table,
+    manifest_key,
+)
+from health_data.parquet import ParquetOutput
+
+
+def test_group_files_by_table():
+    keys = [
+        "data/DailyNurseStaffing_2024Q1.csv",
+        "data/ProviderInfo_Oct2024.csv",
+        "data/dailynursestaffing_2024Q2.csv",
+    ]
+    groups = group_files_by_table(keys)
+    assert list(groups) == ["DailyNurseStaffing", "ProviderInfo"]
+    assert groups["DailyNurseStaffing"] == [keys[0], keys[2]]
+    assert groups["ProviderInfo"] == [keys[1]]
+
+
+def test_unroutable_file_fails_before_loading():
+    with pytest.raises(ValueError, match="No matching table for file: Readme.csv"):
+        group_files_by_table(["data/ProviderInfo_Oct2024.csv", "data/Readme.csv"])
+
+
+def test_manifest_lists_every_file():
+    manifest = json.loads(build_manifest("bucket", ["data/a.csv", "data/b.csv"]))
+    assert manifest["entries"] == [
+        {"url": "s3://bucket/data/a.csv", "mandatory": True},
+        {"url": "s3://bucket/data/b.csv", "mandatory": True},
+    ]
+
+
+def test_manifest_key_is_outside_data_prefix():
+    key = manifest_key("ProviderInfo", "manual__2025-01-01T00:00:00+00:00")
+    assert key.startswith("manifests/ProviderInfo/")
+    assert ":" not in key and "+" not in key
+
+
+def test_batch_load_statements_single_set_based_insert():
+    statements = batch_load_statements(
+        "s3://bucket/manifests/x.manifest",
+        "ProviderInfo",
+        ["data/ProviderInfo_a.csv", "data/sub/O'Brien.csv"],
+    )
+    inserts = [s for s in statements if s.startswith("INSERT")]
+    assert len(inserts) == 1
+    assert "('ProviderInfo_a.csv', 'data/ProviderInfo_a.csv', NULL, NULL)" in inserts[0]
+    assert "('O''Brien.csv', 'data/sub/O''Brien.csv', NULL, NULL)" in inserts[0]
+    assert statements[-1] == (
+        "CALL sp_ingest_batch_from_s3("
+        "'s3://bucket/manifests/x.manifest'::TEXT, 'ProviderInfo'::TEXT, 'CSV'::TEXT);"
+    )
+
+
+def test_parquet_manifest_carries_content_length():
+    manifest = json.loads(build_manifest("bucket", ["parquet/a.parquet"], [1234]))
+    assert manifest["entries"][0]["meta"] == {"content_length": 1234}
+
+
+def test_parquet_load_records_lineage_in_same_batch():
+    output = ParquetOutput(
+        source_key="data/ProviderInfo_a.csv",
+        parquet_key="parquet/ProviderInfo/processing_date=2024-10-01/ProviderInfo_a.parquet",
+        partition_value="2024-10-01",
+        row_count=10,
+        size=2048,
+    )
+    statements = batch_load_statements(
+        "s3://bucket/m.manifest",
+        "ProviderInfo",
+        ["data/ProviderInfo_a.csv"],
+        "parquet",
+        [output],
+    )
+    assert statements[-2].startswith("INSERT INTO bronze.file_lineage")
+    assert "'ProviderInfo_a.csv', 'data/ProviderInfo_a.csv'" in statements[-2]
+    assert statements[-1].endswith("'PARQUET'::TEXT);")
+
+
+def test_conf_file_keys():
+    conf = {
+        "s3_keys": [
+            "data/ProviderInfo_a.csv",
+            "data/ProviderInfo_a.csv",
+            "data/notes.txt",
+            "manifests/x.csv",
+            "data/DailyNurseStaffing_2024Q1.csv",
+        ]
+    }
+    assert conf_file_keys(conf, "data/") == [
+        "data/ProviderInfo_a.csv",
+        "data/DailyNurseStaffing_2024Q1.csv",
+    ]
+    assert conf_file_keys({}, "data/") is None
+    assert conf_file_keys(None, "data/") is None
+
+
+def test_batch_load_statements_stage_key_etag_and_content_hash():
+    statements = batch_load_statements(
+        "s3://bucket/manifests/x.manifest",
+        "ProviderInfo",
+        ["data/2024/ProviderInfo.csv", "data/2025/ProviderInfo.csv"],
+        etags=["abc", "def"],
+        content_hashes=["h1", "h2"],
+    )
+    # same filename under two prefixes stays two files
+    assert (
+        "('ProviderInfo.csv', 'data/2024/ProviderInfo.csv', 'abc', 'h1'),\n"
+        "    ('ProviderInfo.csv', 'data/2025/ProviderInfo.csv', 'def', 'h2')"
+    ) in statements[2]
@@ -0,0 +1,310 @@
+"""
+Local engine tests: parity with a SQLite mirror of the procedures' full-refresh
+SQL, key dedupe and the DAG branch.
+"""
+
+import calendar
+import csv
+import sqlite3
+from decimal import Decimal
+
+import pytest
+from airflow.models import DagBag
+
+from health_data.bronze_schema import source_columns
+from health_data.local_engine import run_pipeline, write_tables
+from health_data.staffing_types import STAFFING_TYPE_CATALOG
+
+STAFFING_NAMES = [name for name, _ in source_columns("DailyNurseStaffing")]
+PROVIDER_NAMES = [name for name, _ in source_columns("ProviderInfo")]
+
+# Mirrors sp_merge_bronze_rows: the latest row per natural key
+MERGE_SQL = {
+    "DailyNurseStaffing": """
+        SELECT * FROM (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY TRIM(PROVNUM) || '|' || TRIM(WorkDate)
+                ORDER BY ingest_batch_id DESC
+            ) AS key_rank
+            FROM raw_DailyNurseStaffing
+        ) WHERE key_rank = 1
+    """,
+    "ProviderInfo": """
+        SELECT * FROM (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY TRIM(CMS_Certification_Number_CCN)
+                ORDER BY ingest_batch_id DESC, Processing_Date DESC
+            ) AS key_rank
+            FROM raw_ProviderInfo
+        ) WHERE key_rank = 1
+    """,
+}
+
+# Mirrors the full refresh of the silver procedures and the gold SELECT
+SILVER_SQL = """
+    CREATE TABLE providerdim AS
+    SELECT CMS_Certification_Number_CCN AS ccn, Provider_Name AS providername,
+           City_Town AS city, State AS state,
+           CAST(Number_of_Certified_Beds AS INTEGER) AS numberofbed,
+           CAST(Latitude AS REAL) AS latitude, CAST(Longitude AS REAL) AS longitude,
+           1 AS is_current
+    FROM bronze_ProviderInfo;
+
+    CREATE TABLE workdatedim AS
+    SELECT DISTINCT
+        CAST(WorkDate AS INTEGER) AS workdateid,
+        CAST(SUBSTR(WorkDate, 5, 2) AS INTEGER) AS month,
+        MONTHNAME(CAST(SUBSTR(WorkDate, 5, 2) AS INTEGER)) AS monthname,
+        CAST(SUBSTR(WorkDate, 1, 4) AS INTEGER) AS year,
+        (CAST(SUBSTR(WorkDate, 5, 2) AS INTEGER) + 2) / 3 AS quarter
+    FROM bronze_DailyNurseStaffing;
+"""
+
+GOLD_SQL = """
+    SELECT
+        p.ccn, d.month, d.monthname, d.year, p.providername, p.city, p.state,
+        p.longitude, p.latitude, s.title, s.staffingtype,
+        SUM(f.workhours),
+        ROUND(AVG(CAST(f.numofpatient AS REAL) / NULLIF(p.numberofbed, 0)) * 100, 2),
+        d.quarter,
+        ROUND(SUM(CAST(f.numofpatient AS REAL) / NULLIF(p.numberofbed, 0)), 6),
+        COUNT(CAST(f.numofpatient AS REAL) / NULLIF(p.numberofbed, 0)),
+        COUNT(*)
+    FROM dailyfacilitylogfact f
+    INNER JOIN providerdim p ON f.ccn = p.ccn AND p.is_current
+    INNER JOIN staffingtypedim s ON CAST(f.staffingtypeid AS INTEGER) = s.staffingtypeid
+    INNER JOIN workdatedim d ON d.workdateid = CAST(f.workdateid AS INTEGER)
+    GROUP BY p.ccn, p.providername, p.city, p.state, s.title, s.staffingtype,
+             d.month, d.monthname, d.year, d.quarter, p.longitude, p.latitude
+"""
+
+GOLD_COLUMNS = (
+    "ccn",
+    "month",
+    "monthname",
+    "year",
+    "providername",
+    "city",
+    "state",
+    "longitude",
+    "latitude",
+    "title",
+    "staffingtype",
+    "totalworkhour",
+    "bedutilizationrate",
+    "quarter",
+    "utilizationsum",
+    "utilizationcount",
+    "recordcount",
+)
+
+
+def staffing_row(provnum, workdate, census, hours):
+    values = [
+        provnum,
+        "Facility",
+        "City",
+        "AL",
+        "County",
+        "1",
+        "2024Q1",
+        workdate,
+        census,
+    ]
+    return values + [str(hours + i) for i in range(24)]
+
+
+def provider_row(ccn, name, beds, processing_date):
+    row = dict.fromkeys(PROVIDER_NAMES, "")
+    row.update(
+        CMS_Certification_Number_CCN=ccn,
+        Provider_Name=name,
+        City_Town="City",
+        State="AL",
+        Number_of_Certified_Beds=beds,
+        Latitude="33",
+        Longitude="-86",
+        Processing_Date=processing_date,
+    )
+    return [row[name] for name in PROVIDER_NAMES]
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return path
+
+
+@pytest.fixture
+def landed(tmp_path):
+    """Two staffing files (the second restates one day) and one provider file."""
+    return [
+        write_csv(
+            tmp_path / "ProviderInfo_2024.csv",
+            PROVIDER_NAMES,
+            [
+                provider_row("015001", "Old Name", "100", "2024-01-01"),
+                provider_row("015001", "New Name", "120", "2024-02-01"),
+                provider_row("015002", "Empty Beds", "0", "2024-02-01"),
+            ],
+        ),
+        write_csv(
+            tmp_path / "DailyNurseStaffing_2024Q1_a.csv",
+            STAFFING_NAMES,
+            [
+                staffing_row("015001", "20240101", "90", 1),
+                staffing_row("015001", "20240102", "95", 2),
+                staffing_row("015001", "20240215", "80", 3),
+                staffing_row("015002", "20240101", "10", 4),
+                staffing_row("015003", "20240101", "50", 5),
+            ],
+        ),
+        write_csv(
+            tmp_path / "DailyNurseStaffing_2024Q1_b.csv",
+            STAFFING_NAMES,
+            [staffing_row("015001", "20240102", "100", 7)],
+        ),
+    ]
+
+
+def sqlite_gold(paths):
+    conn = sqlite3.connect(":memory:")
+    conn.create_function("MONTHNAME", 1, lambda m: calendar.month_name[m].ljust(9))
+    for table, names in (
+        ("DailyNurseStaffing", STAFFING_NAMES),
+        ("ProviderInfo", PROVIDER_NAMES),
+    ):
+        conn.execute(
+            f"CREATE TABLE raw_{table} ({', '.join(names)}, ingest_batch_id INTEGER)"
+        )
+        for batch, path in enumerate(paths):
+            if not path.name.startswith(table):
+                continue
+            with open(path, newline="") as handle:
+                rows = list(csv.reader(handle))[1:]
+            conn.executemany(
+                f"INSERT INTO raw_{table} VALUES ({', '.join('?' * (len(names) + 1))})",
+                [row + [batch] for row in rows],
+            )
+        conn.execute(f"CREATE TABLE bronze_{table} AS {MERGE_SQL[table]}")
+    conn.executescript(SILVER_SQL)
+
+    enabled = [t for t in STAFFING_TYPE_CATALOG if t.enabled]
+    conn.execute("CREATE TABLE staffingtypedim (staffingtypeid, title, staffingtype)")
+    conn.executemany(
+        "INSERT INTO staffingtypedim VALUES (?, ?, ?)",
+        [(t.staffing_type_id, t.title, t.staffing_type) for t in STAFFING_TYPE_CATALOG],
+    )
+    # sp_stage_silver_fact_table: cross join with the enabled types, one CASE
+    # branch per type
+    hours_case = "".join(
+        f" WHEN {t.staffing_type_id} THEN CAST(b.{t.hours_column} AS INTEGER)"
+        for t in enabled
+    )
+    type_ids = " UNION ALL ".join(
+        f"SELECT {t.staffing_type_id} AS staffingtypeid" for t in enabled
+    )
+    conn.execute(f"""
+        CREATE TABLE dailyfacilitylogfact AS
+        SELECT b.PROVNUM AS ccn, b.WorkDate AS workdateid,
+               CAST(TRIM(b.MDScensus) AS INTEGER) AS numofpatient,
+               CAST(t.staffingtypeid AS TEXT) AS staffingtypeid,
+               CASE t.staffingtypeid{hours_case} END AS workhours
+        FROM bronze_DailyNurseStaffing b
+        CROSS JOIN ({type_ids}) AS t
+        """)
+    return conn.execute(GOLD_SQL).fetchall()
+
+
+def normalise(row):
+    return tuple(
+        float(value) if isinstance(value, (Decimal, float)) else value for value in row
+    )
+
+
+def test_gold_matches_procedure_sql(landed):
+    tables = run_pipeline(landed)
+    gold = tables["gold.provider_staffing_utilization_metric"]
+    engine_rows = sorted(
+        normalise(row[name] for name in GOLD_COLUMNS) for row in gold.to_pylist()
+    )
+    sql_rows = sorted(normalise(row) for row in sqlite_gold(landed))
+
+    assert engine_rows == sql_rows
+    # providers with no current dimension row drop out of gold, like the inner join
+    assert "015003" not in {row[0] for row in engine_rows}
+
+
+def test_latest_file_and_processing_date_win(landed):
+    tables = run_pipeline(landed)
+    providers = tables["silver.providerdim"].to_pylist()
+    assert {p["ccn"]: p["providername"] for p in providers} == {
+        "015001": "New Name",
+        "015002": "Empty Beds",
+    }
+
+    fact = tables["silver.dailyfacilitylogfact"]
+    enabled = sum(t.enabled for t in STAFFING_TYPE_CATALOG)
+    # five provider days, one restated by the later file
+    assert fact.num_rows == 5 * enabled
+    restated = [
+        row["numofpatient"]
+        for row in fact.to_pylist()
+        if row["ccn"] == "015001" and row["workdateid"] == "20240102"
+    ]
+    assert set(restated) == {100}
+
+
+def test_workdate_dim_and_zero_beds(landed):
+    tables = run_pipeline(landed)
+    dates = tables["silver.workdatedim"].to_pylist()
+    assert [(d["workdateid"], d["quarter"], d["monthname"]) for d in dates] == [
+        (20240101, 1, "January  "),
+        (20240102, 1, "January  "),
+        (20240215, 1, "February "),
+    ]
+    gold = tables["gold.provider_staffing_utilization_metric"].to_pylist()
+    empty = [row for row in gold if row["ccn"] == "015002"]
+    assert empty and all(row["bedutilizationrate"] is None for row in empty)
+    assert all(row["utilizationcount"] == 0 for row in empty)
+
+
+def test_write_tables(landed, tmp_path):
+    written = write_tables(run_pipeline(landed), tmp_path / "out")
+    assert sorted(path.name for path in written) == [
+        "gold.provider_staffing_utilization_metric.parquet",
+        "silver.dailyfacilitylogfact.parquet",
+        "silver.providerdim.parquet",
+        "silver.staffingtypedim.parquet",
+        "silver.workdatedim.parquet",
+    ]
+
+
+def test_dag_branches_on_engine():
+    dag = DagBag(include_examples=False).dags["health_data_project_dag"]
+    choose = dag.get_task("choose_engine")
+    assert choose.downstream_task_ids == {
+        "prevalidate_files",
+        "fingerprint_inputs",
+        "run_local_engine",
+        "summarize_run",
+    }
+    assert dag.get_task("run_local_engine").downstream_task_ids == {
+        "end",
+        "summarize_run",
+    }
+
+    class Run:
+        conf = {"engine": "local"}
+
+    assert choose.python_callable(dag_run=Run()) == "run_local_engine"
+    Run.conf = {}
+    assert choose.python_callable(dag_run=Run()) == [
+        "prevalidate_files",
+        "fingerprint_inputs",
+    ]
+    Run.conf = {"engine": "spark"}
+    with pytest.raises(ValueError, match="Unknown engine"):
+        choose.python_callable(dag_run=Run())
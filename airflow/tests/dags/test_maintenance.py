@@ -0,0 +1,82 @@
+"""
+Table maintenance tests: only tables past a threshold get VACUUM / ANALYZE, with
+autocommit; the DDL's physical design applies to a new cluster.
+"""
+
+import logging
+import re
+from pathlib import Path
+
+from health_data.maintenance import TableHealth, plan_maintenance, run_maintenance
+
+log = logging.getLogger(__name__)
+
+DDL = Path(__file__).resolve().parents[3] / "SQLScript" / "Redshift-DDL.sql"
+
+
+def health(table, unsorted=0.0, stats_off=0.0, rows=1000, visible=1000):
+    return TableHealth("silver", table, unsorted, stats_off, rows, visible)
+
+
+def test_healthy_tables_are_left_alone():
+    assert plan_maintenance([health("providerdim", unsorted=3, stats_off=2)]) == []
+
+
+def test_statement_per_threshold():
+    plan = plan_maintenance(
+        [
+            health("sorted_only", unsorted=40),
+            health("deleted_only", rows=1000, visible=800),
+            health("both", unsorted=40, rows=1000, visible=800, stats_off=50),
+        ]
+    )
+    assert [statement for statement, _ in plan] == [
+        'VACUUM SORT ONLY "silver"."sorted_only" TO 99 PERCENT;',
+        'VACUUM DELETE ONLY "silver"."deleted_only" TO 99 PERCENT;',
+        'VACUUM FULL "silver"."both" TO 99 PERCENT;',
+        'ANALYZE "silver"."both" PREDICATE COLUMNS;',
+    ]
+
+
+def test_empty_table_has_no_deleted_rows():
+    assert health("empty", rows=0, visible=0).deleted_pct == 0.0
+
+
+class FakeHook:
+    def __init__(self, records):
+        self.records = records
+        self.runs = []
+
+    def get_records(self, sql):
+        assert "svv_table_info" in sql
+        return self.records
+
+    def run(self, sql, autocommit=False):
+        self.runs.append((sql, autocommit))
+
+
+def test_run_maintenance_uses_autocommit():
+    hook = FakeHook([("silver", "dailyfacilitylogfact", 25.0, 0.0, 100, 100)])
+    assert run_maintenance(hook, log) == [
+        'VACUUM SORT ONLY "silver"."dailyfacilitylogfact" TO 99 PERCENT;'
+    ]
+    assert hook.runs == [
+        ('VACUUM SORT ONLY "silver"."dailyfacilitylogfact" TO 99 PERCENT;', True)
+    ]
+
+
+def test_ddl_creates_every_table_before_altering_it():
+    created = set()
+    sql = re.sub(r"--[^\n]*", "", DDL.read_text()).lower()
+    for statement in sql.split(";"):
+        statement = statement.strip()
+        create = re.match(r"create table (?:if not exists )?([\w.]+)", statement)
+        alter = re.match(r"alter table ([\w.]+)", statement)
+        if create:
+            created.add(create.group(1))
+        elif alter:
+            assert (
+                alter.group(1) in created
+            ), f"{alter.group(1)} is altered before it exists"
+        # procedures are created after the DDL; data migrations live elsewhere
+        assert not statement.startswith("call "), statement
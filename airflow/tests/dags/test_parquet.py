@@ -0,0 +1,101 @@
+"""
+CSV to Parquet conversion tests: bronze typing, COPY option parity,
+partitioning and lineage metadata.
+"""
+
+import io
+from decimal import Decimal
+
+import pyarrow.parquet as pq
+import pytest
+
+from health_data.bronze_schema import BRONZE_COLUMNS, source_columns
+from health_data.parquet import arrow_schema, convert_csv
+
+STAFFING_HEADER = ",".join(name for name, _ in source_columns("DailyNurseStaffing"))
+
+
+def staffing_row(provnum, quarter, hours="1.5", name="Facility"):
+    values = [provnum, name, "City", "AL", "County", "1", quarter, "20240101", "55"]
+    return ",".join(values + [hours] * 24)
+
+
+def convert(tmp_path, text, table="DailyNurseStaffing"):
+    data = text if isinstance(text, bytes) else text.encode()
+    return convert_csv(io.BytesIO(data), table, f"data/{table}_test.csv", str(tmp_path))
+
+
+def test_partitions_by_quarter_with_lineage(tmp_path):
+    csv_text = "\n".join(
+        [
+            STAFFING_HEADER,
+            staffing_row("015001", "2024Q1"),
+            staffing_row("015002", "2024Q2"),
+            staffing_row("015003", "2024Q1"),
+        ]
+    )
+    outputs = convert(tmp_path, csv_text)
+
+    assert {value: rows for value, (_, rows) in outputs.items()} == {
+        "2024Q1": 2,
+        "2024Q2": 1,
+    }
+    path, _ = outputs["2024Q1"]
+    assert "parquet/DailyNurseStaffing/cy_qtr=2024Q1/" in path
+    table = pq.read_table(path)
+    assert table.schema.metadata[b"source_file"] == b"data/DailyNurseStaffing_test.csv"
+    assert table.column("PROVNUM").to_pylist() == ["015001", "015003"]
+
+
+def test_schema_matches_bronze_table_order(tmp_path):
+    outputs = convert(tmp_path, STAFFING_HEADER + "\n" + staffing_row("1", "2024Q1"))
+    ((path, _),) = outputs.values()
+    schema = pq.read_schema(path)
+    assert schema.names == [name for name, _ in BRONZE_COLUMNS["DailyNurseStaffing"]]
+    assert schema.remove_metadata() == arrow_schema("DailyNurseStaffing")
+
+
+def test_casts_follow_copy_options(tmp_path):
+    long_name = "x" * 300
+    csv_text = "\n".join(
+        [
+            STAFFING_HEADER,
+            staffing_row("015001", "2024Q1", hours=" 2.5", name=long_name),
+            staffing_row("015002", "2024Q1", hours=""),
+            "015003,Short,City,AL,County,1,2024Q1,20240102,9",
+        ]
+    )
+    ((path, _),) = convert(tmp_path, csv_text).values()
+    table = pq.read_table(path).to_pydict()
+
+    assert table["Hrs_RNDON"] == [
+        Decimal("3"),
+        None,
+        None,
+    ]  # DECIMAL(18,0), blank -> NULL
+    assert len(table["PROVNAME"][0]) == 256  # TRUNCATECOLUMNS
+    assert table["MDScensus"][2] == "9"  # FILLRECORD pads the short record
+    assert table["Hrs_MedAide_ctr"][2] is None
+    assert table["ingest_batch_id"] == [None, None, None]
+
+
+def test_invalid_utf8_is_replaced(tmp_path):
+    data = (STAFFING_HEADER + "\n").encode() + staffing_row("015001", "2024Q1").replace(
+        "Facility", "Fac\x00"
+    ).encode().replace(b"\x00", b"\xff")
+    ((path, _),) = convert(tmp_path, data).values()
+    assert pq.read_table(path).column("PROVNAME").to_pylist() == ["Fac�"]
+
+
+def test_provider_info_partitions_by_processing_date(tmp_path):
+    names = [name for name, _ in source_columns("ProviderInfo")]
+    row = ["" for _ in names]
+    row[0], row[names.index("Processing_Date")] = "015001", "2024-10-01"
+    outputs = convert(tmp_path, ",".join(names) + "\n" + ",".join(row), "ProviderInfo")
+    assert list(outputs) == ["2024-10-01"]
+    assert "processing_date=2024-10-01" in outputs["2024-10-01"][0]
+
+
+def test_extra_columns_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="has 35 columns"):
+        convert(tmp_path, STAFFING_HEADER + ",extra1,extra2\n")
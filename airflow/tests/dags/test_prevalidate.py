@@ -0,0 +1,135 @@
+"""
+Pre-load validator tests: header, required key, parsing and uniqueness checks,
+and quarantine of failed files.
+"""
+
+import hashlib
+import io
+import json
+
+from health_data.bronze_schema import source_columns
+from health_data.prevalidate import quarantine_file, validate_csv
+
+# Landed files use readable headers; they match the DDL names once normalised
+STAFFING_HEADER = ",".join(
+    name.replace("_", " ") for name, _ in source_columns("DailyNurseStaffing")
+)
+
+
+def staffing_row(provnum="015001", workdate="20240101", hours="1.5"):
+    values = [
+        provnum,
+        "Facility",
+        "City",
+        "AL",
+        "County",
+        "1",
+        "2024Q1",
+        workdate,
+        "55",
+    ]
+    return ",".join(values + [hours] * 24)
+
+
+def validate(*lines, table="DailyNurseStaffing"):
+    data = "\n".join(lines).encode()
+    return validate_csv(io.BytesIO(data), table, f"data/{table}_test.csv")
+
+
+def test_clean_file_passes():
+    report = validate(STAFFING_HEADER, staffing_row("1"), staffing_row("2"))
+    assert report.ok
+    assert report.row_count == 2
+
+
+def test_header_must_match_ddl_positions():
+    shifted = STAFFING_HEADER.replace("PROVNUM,PROVNAME", "PROVNAME,PROVNUM")
+    report = validate(shifted, staffing_row())
+    assert report.errors[:2] == [
+        "Header column 1 is 'PROVNAME', bronze.DailyNurseStaffing expects 'PROVNUM'",
+        "Header column 2 is 'PROVNUM', bronze.DailyNurseStaffing expects 'PROVNAME'",
+    ]
+
+
+def test_blank_keys_and_unparsable_values():
+    report = validate(
+        STAFFING_HEADER,
+        staffing_row(provnum=" "),
+        staffing_row(provnum="2", workdate="2024-01-02"),
+        staffing_row(provnum="3", hours="n/a"),
+    )
+    assert "1 blank values in required column PROVNUM" in report.errors
+    assert (
+        "1 values in WorkDate do not parse as %Y%m%d, e.g. ['2024-01-02']"
+        in report.errors
+    )
+    assert "1 values in Hrs_CNA do not parse as DECIMAL, e.g. ['n/a']" in report.errors
+
+
+def test_duplicate_keys_within_file():
+    report = validate(
+        STAFFING_HEADER,
+        staffing_row("1", "20240101"),
+        staffing_row("1", "20240102"),
+        staffing_row("1", "20240101"),
+    )
+    assert report.errors == ["1 duplicate values of key (PROVNUM, WorkDate)"]
+
+
+def test_short_file_missing_key_column():
+    report = validate("PROVNUM,PROVNAME", "015001,Facility")
+    assert report.errors == ["Required column WorkDate is missing"]
+
+
+def test_provider_dates_must_parse():
+    names = [name for name, _ in source_columns("ProviderInfo")]
+    row = ["" for _ in names]
+    row[0] = "015001"
+    row[names.index("Processing_Date")] = "10/01/2024"
+    report = validate(",".join(names), ",".join(row), table="ProviderInfo")
+    assert report.errors == [
+        "1 values in Processing_Date do not parse as DATE, e.g. ['10/01/2024']"
+    ]
+
+
+def test_malformed_file_is_reported_not_raised():
+    report = validate(STAFFING_HEADER + ",extra", staffing_row())
+    assert not report.ok
+    assert "has 34 columns" in report.errors[0]
+
+
+class FakeS3Hook:
+    def __init__(self, objects):
+        self.objects = dict(objects)
+
+    def copy_object(self, source_bucket_key, dest_bucket_key, **kwargs):
+        self.objects[dest_bucket_key] = self.objects[source_bucket_key]
+
+    def load_string(self, string_data, key, **kwargs):
+        self.objects[key] = string_data
+
+    def delete_objects(self, bucket, keys):
+        for key in keys:
+            del self.objects[key]
+
+
+def test_quarantine_moves_file_with_report():
+    report = validate(STAFFING_HEADER, staffing_row(provnum=""))
+    hook = FakeS3Hook({report.key: b"raw"})
+
+    target = quarantine_file(hook, "bucket", report)
+
+    assert target == "quarantine/data/DailyNurseStaffing_test.csv"
+    assert report.key not in hook.objects
+    assert hook.objects[target] == b"raw"
+    assert json.loads(hook.objects[target + ".errors.json"])["errors"] == report.errors
+
+
+def test_content_hash_covers_the_whole_file():
+    data = "\n".join([STAFFING_HEADER, staffing_row(), ""]).encode()
+    report = validate_csv(io.BytesIO(data), "DailyNurseStaffing", "data/a.csv")
+    assert report.ok
+    assert report.content_hash == hashlib.sha256(data).hexdigest()
+    # the same bytes under another name hash the same
+    renamed = validate_csv(io.BytesIO(data), "DailyNurseStaffing", "data/b.csv")
+    assert renamed.content_hash == report.content_hash
@@ -0,0 +1,244 @@
+"""Deferrable Data API operator tests against a local stand-in for the Redshift Data API."""
+
+import asyncio
+import itertools
+import json
+
+import pytest
+from airflow.exceptions import AirflowException, TaskDeferred
+from airflow.models import Connection, DagBag
+from airflow.providers.amazon.aws.hooks.redshift_data import RedshiftDataHook
+from airflow.providers.amazon.aws.triggers.redshift_data import RedshiftDataTrigger
+
+from health_data.redshift_data import RedshiftStatementOperator, data_api_target
+
+CLUSTER_HOST = "health-cluster.abc123xyz.us-east-1.redshift.amazonaws.com"
+
+
+class FakeRedshiftData:
+    """
+    In-memory stand-in for the redshift-data client.
+
+    Statements report SUBMITTED / STARTED for ``polls`` describe calls, then
+    FINISHED, or FAILED when their SQL contains ``fail_on``.
+    """
+
+    def __init__(self, polls=2, fail_on=None):
+        self.polls = polls
+        self.fail_on = fail_on
+        self.submitted = []
+        self.statements = {}
+        self._ids = itertools.count(1)
+
+    def _submit(self, sqls, **kwargs):
+        statement_id = f"stmt-{next(self._ids)}"
+        self.submitted.append(dict(kwargs, Sqls=sqls))
+        self.statements[statement_id] = {"sqls": sqls, "describes": 0}
+        return {"Id": statement_id}
+
+    def execute_statement(self, Sql, **kwargs):
+        return self._submit([Sql], **kwargs)
+
+    def batch_execute_statement(self, Sqls, **kwargs):
+        return self._submit(list(Sqls), **kwargs)
+
+    def describe_statement(self, Id):
+        statement = self.statements[Id]
+        statement["describes"] += 1
+        desc = {"Id": Id}
+        if statement["describes"] <= self.polls:
+            desc["Status"] = "SUBMITTED" if statement["describes"] == 1 else "STARTED"
+        elif self.fail_on and any(self.fail_on in sql for sql in statement["sqls"]):
+            desc.update(Status="FAILED", Error=f"ERROR: {self.fail_on} failed")
+        else:
+            desc["Status"] = "FINISHED"
+        if len(statement["sqls"]) > 1:
+            desc["SubStatements"] = [
+                {"Id": f"{Id}:{n}"} for n in range(1, len(statement["sqls"]) + 1)
+            ]
+        return desc
+
+    def cancel_statement(self, Id):
+        self.statements[Id]["describes"] = -1
+        return {"Status": True}
+
+
+class _AsyncClient:
+    def __init__(self, fake):
+        self.fake = fake
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def describe_statement(self, Id):
+        return self.fake.describe_statement(Id)
+
+
+@pytest.fixture
+def data_api(monkeypatch):
+    fake = FakeRedshiftData()
+    monkeypatch.setattr(RedshiftDataHook, "conn", property(lambda self: fake))
+    monkeypatch.setattr(
+        RedshiftDataHook, "async_conn", property(lambda self: _AsyncClient(fake))
+    )
+    monkeypatch.setenv(
+        "AIRFLOW_CONN_REDSHIFT_DEFAULT",
+        json.dumps(
+            {
+                "conn_type": "redshift",
+                "host": CLUSTER_HOST,
+                "schema": "healthdatadb",
+                "login": "etl_user",
+                "port": 5439,
+            }
+        ),
+    )
+    return fake
+
+
+def run_trigger(trigger):
+    trigger.poll_interval = 0  # the stand-in advances on every describe
+
+    async def first_event():
+        async for event in trigger.run():
+            return event.payload
+
+    return asyncio.run(first_event())
+
+
+def test_target_from_provisioned_host():
+    conn = Connection(
+        conn_type="redshift", host=CLUSTER_HOST, schema="healthdatadb", login="etl"
+    )
+    assert data_api_target(conn) == {
+        "database": "healthdatadb",
+        "cluster_identifier": "health-cluster",
+        "db_user": "etl",
+        "region_name": "us-east-1",
+    }
+
+
+def test_target_from_serverless_host_and_extras():
+    host = "health-wg.123456789012.eu-west-1.redshift-serverless.amazonaws.com"
+    conn = Connection(
+        conn_type="redshift",
+        host=host,
+        schema="dev",
+        extra=json.dumps({"secret_arn": "arn:aws:secretsmanager:x"}),
+    )
+    assert data_api_target(conn) == {
+        "database": "dev",
+        "workgroup_name": "health-wg",
+        "secret_arn": "arn:aws:secretsmanager:x",
+        "region_name": "eu-west-1",
+    }
+
+
+def test_unknown_host_needs_extras():
+    with pytest.raises(ValueError, match="set cluster_identifier or workgroup_name"):
+        data_api_target(Connection(conn_type="redshift", host="localhost"))
+
+
+def test_operator_defers_instead_of_waiting(data_api):
+    op = RedshiftStatementOperator(
+        task_id="copy_to_redshift",
+        sql=["CREATE TEMP TABLE t (x INT);", "CALL sp_ingest_batch_from_s3();"],
+    )
+    with pytest.raises(TaskDeferred) as exc:
+        op.execute({})
+
+    # one batch (one transaction), aimed at the cluster behind redshift_default
+    (submitted,) = data_api.submitted
+    assert submitted["Sqls"] == op.sql
+    assert submitted["ClusterIdentifier"] == "health-cluster"
+    assert submitted["Database"] == "healthdatadb"
+    assert submitted["DbUser"] == "etl_user"
+    assert isinstance(exc.value.trigger, RedshiftDataTrigger)
+    assert exc.value.method_name == "execute_complete"
+
+    event = run_trigger(exc.value.trigger)
+    assert event["status"] == "success"
+    assert op.execute_complete({}, event) == [
+        f"{event['statement_id']}:1",
+        f"{event['statement_id']}:2",
+    ]
+
+
+def test_failed_statement_fails_the_task(data_api):
+    data_api.fail_on = "sp_generate_silver_fact_table"
+    op = RedshiftStatementOperator(
+        task_id="transform_fact_table_silver",
+        sql="CALL sp_generate_silver_fact_table();",
+    )
+    with pytest.raises(TaskDeferred) as exc:
+        op.execute({})
+
+    event = run_trigger(exc.value.trigger)
+    assert event["status"] == "error"
+    assert "FAILED" in event["message"]
+    with pytest.raises(AirflowException, match="FAILED"):
+        op.execute_complete({}, event)
+
+
+def test_long_running_steps_are_deferrable():
+    dag = DagBag(include_examples=False).dags["health_data_project_dag"]
+    redshift_tasks = [
+        task
+        for task in dag.tasks
+        if task.task_id.startswith(("copy_", "stage_", "transform_", "refresh_"))
+    ]
+    assert len(redshift_tasks) == 8
+    for task in redshift_tasks:
+        if task.task_id == "copy_to_redshift":
+            # mapped over the prepared per-table loads
+            assert task.operator_class is RedshiftStatementOperator
+        else:
+            assert isinstance(task, RedshiftStatementOperator)
+            assert task.deferrable
+
+
+class _CacheHook:
+    def __init__(self, hit):
+        self.hit = hit
+        self.runs = []
+
+    def get_first(self, sql):
+        return ("null",) if self.hit else None
+
+    def run(self, statements):
+        self.runs.append(statements)
+
+
+@pytest.mark.parametrize("hit", [True, False])
+def test_cached_step_skips_unchanged_inputs(data_api, monkeypatch, hit):
+    hook = _CacheHook(hit)
+    monkeypatch.setattr(RedshiftStatementOperator, "_sql_hook", lambda self: hook)
+    op = RedshiftStatementOperator(
+        task_id="transform_dim_workdate_silver",
+        sql="CALL sp_generate_silver_workdate_dim(FALSE);",
+        input_fingerprint="fp",
+    )
+    pushed = {}
+    context = {
+        "dag_run": type("DagRun", (), {"conf": {}})(),
+        "run_id": "manual__1",
+        "ti": type(
+            "TI",
+            (),
+            {"xcom_push": lambda self, key, value: pushed.update({key: value})},
+        )(),
+    }
+    if hit:
+        assert op.execute(context) is None
+        assert data_api.submitted == []
+        assert pushed == {"metrics": {"cached": True}}
+        return
+
+    with pytest.raises(TaskDeferred) as exc:
+        op.execute(context)
+    assert hook.runs == []  # recorded only once the statement succeeded
+    op.execute_complete(context, run_trigger(exc.value.trigger))
+    assert "transform_dim_workdate_silver" in hook.runs[0][1]
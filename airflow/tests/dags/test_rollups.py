@@ -0,0 +1,51 @@
+"""Gold rollup tests: the table lookup, the catalog seed and the rollup DDL in the procedure."""
+
+import re
+from pathlib import Path
+
+import pytest
+
+from health_data.rollups import ROLLUPS, catalog_seed_sql, rollup_for
+
+SQL_DIR = Path(__file__).resolve().parents[3] / "SQLScript"
+DDL = SQL_DIR / "Redshift-DDL.sql"
+PROCEDURES = SQL_DIR / "Redshift-StoreProcedure.sql"
+
+
+@pytest.mark.parametrize(
+    "columns, table",
+    [
+        ({"year"}, "gold.rollup_staffingtype_year"),
+        ({"title", "year"}, "gold.rollup_staffingtype_year"),
+        ({"year", "month"}, "gold.rollup_national_daily"),
+        ({"state", "quarter"}, "gold.rollup_state_month"),
+        ({"ccn", "Quarter"}, "gold.rollup_provider_quarter"),
+        ({"ccn", "title", "month"}, "gold.provider_staffing_utilization_metric"),
+    ],
+)
+def test_rollup_for_picks_coarsest_covering_table(columns, table):
+    assert rollup_for(columns).table == table
+
+
+def test_rollup_for_rejects_groupings_gold_cannot_answer():
+    with pytest.raises(ValueError, match="ccn"):
+        rollup_for({"ccn", "workdate"})
+
+
+def test_sql_seed_matches_catalog():
+    assert catalog_seed_sql() in DDL.read_text()
+
+
+def test_rollup_tables_have_their_dimensions():
+    procedures = PROCEDURES.read_text()
+    for rollup in ROLLUPS:
+        create = re.search(
+            rf"CREATE TABLE IF NOT EXISTS {re.escape(rollup.table)} \((.*?)\n    \)",
+            procedures,
+            re.S,
+        )
+        assert create, rollup.table
+        columns = {line.split()[0] for line in create.group(1).strip().splitlines()}
+        assert set(rollup.dimensions) <= columns, rollup.table
+        # every table keeps the additive measures rollups are re-aggregated from
+        assert {"totalworkhour", "utilizationsum", "utilizationcount"} <= columns
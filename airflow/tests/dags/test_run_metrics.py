@@ -0,0 +1,199 @@
+"""
+Run metrics tests: task and statement metrics, the metrics rows, p95 hot spots
+and the summary task wiring.
+"""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from airflow.models import DagBag
+from airflow.utils.trigger_rule import TriggerRule
+
+from health_data.run_metrics import (
+    METRICS_TABLE,
+    StageMetrics,
+    format_summary,
+    hot_spots,
+    parent_statement_id,
+    record_statements,
+    statement_metrics,
+    task_metrics,
+)
+
+
+def task_instance(task_id, duration, map_index=-1, state="success"):
+    return SimpleNamespace(
+        task_id=task_id,
+        map_index=map_index,
+        state=state,
+        start_date=datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc),
+        end_date=datetime(2024, 5, 1, 12, 1, tzinfo=timezone.utc),
+        duration=duration,
+    )
+
+
+class SystemViewsHook:
+    """Answers the SYS_* queries of one statement's session."""
+
+    def __init__(self, loaded=(0, 0)):
+        self.loaded = loaded
+        self.sql = []
+
+    def get_first(self, sql):
+        self.sql.append(sql)
+        if "sys_load_history" in sql:
+            return self.loaded
+        if "sys_query_detail" in sql:
+            return (1000,)
+        return (7, 1.5, 20.25, 400)
+
+
+def test_task_metrics_merge_pushed_values():
+    metrics = task_metrics(
+        task_instance("convert_to_parquet", 12.3456),
+        {"rows_read": 10, "bytes_written": 2048, "unknown": 1},
+    )
+    assert metrics.wall_seconds == 12.346
+    assert metrics.started_at == "2024-05-01 12:00:00.000000"
+    assert (metrics.rows_read, metrics.bytes_written) == (10, 2048)
+    assert metrics.rows_per_second == 10 / 12.346
+
+
+def test_parent_statement_id():
+    assert parent_statement_id(["abc-123"]) == "abc-123"
+    # batches return their sub-statement ids
+    assert parent_statement_id(["abc-123:1", "abc-123:2"]) == "abc-123"
+    assert parent_statement_id(None) is None
+
+
+def test_statement_metrics_from_the_session_window():
+    description = {
+        "RedshiftPid": 1073815778,
+        "CreatedAt": datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc),
+        "UpdatedAt": datetime(2024, 5, 1, 12, 5, tzinfo=timezone.utc),
+    }
+    hook = SystemViewsHook()
+    metrics = statement_metrics(hook, description, StageMetrics("transform"))
+    assert (metrics.queries, metrics.queue_seconds, metrics.exec_seconds) == (
+        7,
+        1.5,
+        20.25,
+    )
+    assert (metrics.rows_read, metrics.rows_written) == (1000, 400)
+    assert metrics.bytes_read is None
+    assert all("session_id = 1073815778" in sql for sql in hook.sql)
+    assert all("'2024-05-01 12:05:00.000000'" in sql for sql in hook.sql)
+
+    # a COPY reports the rows and bytes it loaded
+    copy = statement_metrics(
+        SystemViewsHook(loaded=(500, 65536)), description, StageMetrics("copy")
+    )
+    assert (copy.rows_written, copy.bytes_read) == (500, 65536)
+
+
+def test_statement_without_session_is_left_alone():
+    hook = SystemViewsHook()
+    metrics = statement_metrics(hook, {"Id": "x"}, StageMetrics("transform"))
+    assert metrics.queries is None
+    assert hook.sql == []
+
+
+def test_record_statements_replace_the_run():
+    stages = [
+        StageMetrics("copy_to_redshift", map_index=1, wall_seconds=3.5, rows_written=9),
+        StageMetrics("validate_fact_table", state="success", cached=True),
+    ]
+    delete, insert = record_statements("manual__1", stages)
+    assert delete == f"DELETE FROM {METRICS_TABLE} WHERE run_id = 'manual__1';"
+    assert insert.startswith(
+        f"INSERT INTO {METRICS_TABLE} (run_id, task_id, map_index,"
+    )
+    assert "('manual__1', 'copy_to_redshift', 1, NULL" in insert
+    assert "'validate_fact_table', -1, 'success'" in insert
+    assert "TRUE" in insert and insert.count("GETDATE()") == 2
+    assert record_statements("manual__1", []) == [delete]
+
+
+def test_hot_spots_need_history_and_skip_cached_steps():
+    past = {
+        "transform_fact_table_silver": (10, 60.0, 90.0),
+        "convert_to_parquet": (2, 5.0, 6.0),
+    }
+    stages = [
+        StageMetrics("transform_fact_table_silver", wall_seconds=120.0),
+        StageMetrics("convert_to_parquet", wall_seconds=30.0),
+        StageMetrics("transform_dim_workdate_silver", wall_seconds=500.0),
+    ]
+    assert [s.task_id for s in hot_spots(stages, past)] == [
+        "transform_fact_table_silver"
+    ]
+    stages[0].cached = True
+    assert hot_spots(stages, past) == []
+
+
+def test_summary_lists_slowest_first():
+    past = {"transform_fact_table_silver": (10, 60.0, 90.0)}
+    lines = format_summary(
+        [
+            StageMetrics("start", state="success", wall_seconds=0.1),
+            StageMetrics(
+                "transform_fact_table_silver",
+                state="success",
+                wall_seconds=120.0,
+                rows_written=2400,
+            ),
+        ],
+        past,
+    ).splitlines()
+    assert lines[1].startswith("transform_fact_table_silver")
+    assert "2,400" in lines[1] and "60.0" in lines[1] and "slower than p95" in lines[1]
+    assert lines[2].startswith("start") and "slower" not in lines[2]
+
+
+def test_summary_task_waits_for_every_task():
+    dag = DagBag(include_examples=False).dags["health_data_project_dag"]
+    summarize = dag.get_task("summarize_run")
+    assert summarize.trigger_rule == TriggerRule.ALL_DONE
+    assert summarize.downstream_task_ids == {"end"}
+    assert summarize.upstream_task_ids == {
+        task.task_id
+        for task in dag.tasks
+        if task.task_id not in ("summarize_run", "end")
+    }
+
+
+def test_local_run_is_summarized_without_redshift(monkeypatch):
+    dag = DagBag(include_examples=False).dags["health_data_project_dag"]
+    summarize = dag.get_task("summarize_run").python_callable
+
+    def no_redshift(*args, **kwargs):
+        pytest.fail("a local run must not connect to Redshift")
+
+    monkeypatch.setitem(summarize.__globals__, "RedshiftSQLHook", no_redshift)
+    monkeypatch.setitem(summarize.__globals__, "RedshiftDataHook", no_redshift)
+
+    class TaskInstance:
+        task_id = "summarize_run"
+
+        def xcom_pull(self, task_ids, map_indexes, key=None):
+            if task_ids == "run_local_engine" and key == "metrics":
+                return {"rows_written": 500}
+            return None
+
+    dag_run = SimpleNamespace(
+        conf={"engine": "local"},
+        get_task_instances=lambda: [
+            task_instance("start", 0.1),
+            task_instance("run_local_engine", 42.0),
+            task_instance("prevalidate_files", None, state="skipped"),
+            task_instance("summarize_run", None, state="running"),
+        ],
+    )
+    stages = summarize(dag_run=dag_run, ti=TaskInstance(), run_id="manual__1")
+    assert [s["stage"] for s in stages] == [
+        "start",
+        "run_local_engine",
+        "prevalidate_files",
+    ]
+    assert stages[1]["rows_written"] == 500
@@ -0,0 +1,40 @@
+"""Staffing-type catalog tests: the Python constant, the bronze layout and the SQL seed agree."""
+
+from pathlib import Path
+
+from health_data.bronze_schema import DAILY_NURSE_STAFFING_COLUMNS
+from health_data.staffing_types import STAFFING_TYPE_CATALOG, catalog_seed_sql
+
+DDL = Path(__file__).resolve().parents[3] / "SQLScript" / "Redshift-DDL.sql"
+
+
+def test_sql_seed_matches_catalog():
+    assert catalog_seed_sql() in DDL.read_text()
+
+
+def test_catalog_maps_bronze_hours_columns():
+    hours_columns = {
+        name for name, _ in DAILY_NURSE_STAFFING_COLUMNS if name.startswith("Hrs_")
+    }
+    mapped = [t.hours_column for t in STAFFING_TYPE_CATALOG]
+    assert set(mapped) <= hours_columns
+    assert len(set(mapped)) == len(mapped)
+    # every employee / contractor split column has a staffing type
+    assert {c for c in hours_columns if c.endswith(("_emp", "_ctr"))} == set(mapped)
+
+
+def test_catalog_ids_are_stable():
+    ids = [t.staffing_type_id for t in STAFFING_TYPE_CATALOG]
+    assert len(set(ids)) == len(ids)
+    # the original hard-coded types keep their ids
+    assert {t.staffing_type_id: t.hours_column for t in STAFFING_TYPE_CATALOG[:4]} == {
+        1: "Hrs_RNDON_emp",
+        2: "Hrs_RNDON_ctr",
+        3: "Hrs_CNA_emp",
+        4: "Hrs_CNA_ctr",
+    }
+
+
+def test_only_the_original_types_are_enabled():
+    enabled = [t.staffing_type_id for t in STAFFING_TYPE_CATALOG if t.enabled]
+    assert enabled == [1, 2, 3, 4]
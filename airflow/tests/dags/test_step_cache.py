@@ -0,0 +1,142 @@
+"""Step cache tests: fingerprints of the run inputs and the skip / record decisions."""
+
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from health_data.step_cache import (
+    INGESTED_FILES_SQL,
+    code_version,
+    input_fingerprint,
+    record_statements,
+    run_cached,
+    step_fingerprint,
+)
+
+
+class CacheHook:
+    """Serves the ingested files and procedure sources, keeps the cache in a dict."""
+
+    def __init__(self, files=(), procedures=()):
+        self.files = list(files)
+        self.procedures = list(procedures)
+        self.cache = {}
+        self.runs = []
+
+    def get_records(self, sql):
+        return self.files if sql == INGESTED_FILES_SQL else self.procedures
+
+    def get_first(self, sql):
+        for (step, fingerprint), outcome in self.cache.items():
+            if f"step_name = '{step}' AND fingerprint = '{fingerprint}'" in sql:
+                return (outcome,)
+        return None
+
+    def run(self, statements):
+        self.runs.append(statements)
+        step, fingerprint, outcome = re.search(
+            r"VALUES \('([^']*)', '([^']*)', '[^']*', (NULL|'.*'), GETDATE",
+            statements[1],
+        ).groups()
+        self.cache[(step, fingerprint)] = None if outcome == "NULL" else outcome[1:-1]
+
+
+class Log:
+    def info(self, message):
+        pass
+
+
+class TaskInstance:
+    def __init__(self):
+        self.pushed = {}
+
+    def xcom_push(self, key, value):
+        self.pushed[key] = value
+
+
+def context(conf=None):
+    return {
+        "dag_run": SimpleNamespace(conf=conf or {}),
+        "run_id": "manual__1",
+        "ti": TaskInstance(),
+    }
+
+
+FILES = [("data/a.csv", "e1", 1), ("data/b.csv", "e2", 2)]
+
+
+def test_input_fingerprint_tracks_files_and_procedures():
+    base = input_fingerprint(CacheHook(FILES, [("sp_x", "BEGIN END")]), code="v1")
+    assert base == input_fingerprint(
+        CacheHook(FILES, [("sp_x", "BEGIN END")]), code="v1"
+    )
+    changed_etag = [FILES[0], ("data/b.csv", "e3", 3)]
+    assert base != input_fingerprint(
+        CacheHook(changed_etag, [("sp_x", "BEGIN END")]), code="v1"
+    )
+    assert base != input_fingerprint(
+        CacheHook(FILES, [("sp_x", "BEGIN x; END")]), code="v1"
+    )
+    assert base != input_fingerprint(
+        CacheHook(FILES, [("sp_x", "BEGIN END")]), code="v2"
+    )
+
+
+def test_code_version_follows_the_sources(tmp_path):
+    (tmp_path / "health_data").mkdir()
+    (tmp_path / "dag.py").write_text("x = 1\n")
+    (tmp_path / "health_data" / "mod.py").write_text("y = 1\n")
+    before = code_version(tmp_path)
+    assert before == code_version(tmp_path)
+    (tmp_path / "health_data" / "mod.py").write_text("y = 2\n")
+    assert code_version(tmp_path) != before
+
+
+def test_step_fingerprint_includes_the_step_sql():
+    call = "CALL sp_generate_silver_fact_table();"
+    assert step_fingerprint("in", "a", call) == step_fingerprint("in", "a", [call])
+    assert step_fingerprint("in", "a", call) != step_fingerprint("in", "b", call)
+    # a full refresh run is not answered by an incremental run's entry
+    assert step_fingerprint("in", "a", "CALL p(TRUE);") != step_fingerprint(
+        "in", "a", "CALL p(FALSE);"
+    )
+
+
+def test_run_cached_skips_unchanged_steps():
+    hook = CacheHook()
+    calls = []
+
+    def run():
+        calls.append(1)
+        return {"row_count": 5}
+
+    assert run_cached(hook, "validate", "fp1", run, context(), Log()) == {
+        "row_count": 5
+    }
+    hit = context()
+    assert run_cached(hook, "validate", "fp1", run, hit, Log()) == {"row_count": 5}
+    assert len(calls) == 1
+    # reported to the run summary as a cached step
+    assert hit["ti"].pushed == {"metrics": {"cached": True}}
+    # new inputs or {"force": true} run the step again
+    run_cached(hook, "validate", "fp2", run, context(), Log())
+    run_cached(hook, "validate", "fp2", run, context({"force": True}), Log())
+    assert len(calls) == 3
+
+
+def test_failed_steps_are_not_recorded():
+    hook = CacheHook()
+
+    def run():
+        raise ValueError("Validation failed")
+
+    with pytest.raises(ValueError):
+        run_cached(hook, "validate", "fp1", run, context(), Log())
+    assert hook.runs == []
+
+
+def test_record_statements_replace_the_step_entry():
+    delete, insert = record_statements("o'step", "fp", "run", {"n": 1})
+    assert delete == "DELETE FROM silver.step_cache WHERE step_name = 'o''step';"
+    assert "('o''step', 'fp', 'run', '{\"n\": 1}', GETDATE())" in insert
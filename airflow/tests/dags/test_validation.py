@@ -0,0 +1,238 @@
+"""
+Data-quality rule engine tests. The compiled SQL is executed on SQLite and
+compared with the pandas checks it replaces.
+"""
+
+import logging
+import re
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from health_data.dq import (
+    RuleSet,
+    accepted_range,
+    build_rule_sql,
+    matches,
+    not_null,
+    references,
+    row_count_delta,
+    run_rule_set,
+    unique,
+)
+from health_data.dq_rules import FACT_RULES, RULE_SETS
+
+log = logging.getLogger(__name__)
+
+
+class SQLiteHook:
+    """Minimal stand-in for RedshiftSQLHook backed by an in-memory SQLite database."""
+
+    def __init__(self, rows):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.create_function(
+            "REGEXP_COUNT",
+            2,
+            lambda value, pattern: len(re.findall(pattern, value)),
+        )
+        self.conn.execute("ATTACH ':memory:' AS silver")
+        self.conn.execute(
+            "CREATE TABLE silver.dq_results (run_id TEXT, rule_set TEXT, rule_name TEXT,"
+            " severity TEXT, metric_value INTEGER, passed BOOLEAN, checked_at TEXT)"
+        )
+        self.conn.execute("CREATE TABLE silver.states (code TEXT)")
+        self.conn.executemany(
+            "INSERT INTO silver.states VALUES (?)", [("AL",), ("CA",)]
+        )
+        self.conn.execute(
+            "CREATE TABLE providers (ccn TEXT, name TEXT, beds INTEGER, state TEXT)"
+        )
+        self.load(rows)
+
+    def load(self, rows):
+        self.conn.execute("DELETE FROM providers")
+        self.conn.executemany(
+            "INSERT INTO providers VALUES (?, ?, ?, ?)",
+            [tuple(row) + ("AL",) * (4 - len(row)) for row in rows],
+        )
+
+    def get_conn(self):
+        hook = self
+
+        class _Conn:
+            def cursor(self):
+                return hook.conn.cursor()
+
+            def close(self):
+                pass
+
+        return _Conn()
+
+    def get_first(self, sql):
+        return self.conn.execute(sql).fetchone()
+
+    def get_records(self, sql):
+        if "information_schema.tables" in sql:
+            return [("silver.states",)]
+        return self.conn.execute(sql).fetchall()
+
+    def run(self, sql):
+        self.conn.execute(sql)
+
+    def get_pandas_df(self, sql):
+        return pd.read_sql_query(sql, self.conn)
+
+
+RELATION_SQL = "SELECT ccn, name, beds FROM providers"
+
+RULES = RuleSet(
+    name="validate_providers",
+    source="providers",
+    relation_sql=RELATION_SQL,
+    rules=[not_null("ccn"), unique("ccn"), not_null("name"), not_null("beds")],
+)
+
+
+def pandas_errors(df, key, expected_cols):
+    """Reference implementation mirroring the former pandas validators."""
+    errors = []
+    if df[key].isnull().sum() > 0:
+        errors.append(f"{df[key].isnull().sum()} NULL values in {key}")
+    if df[key].duplicated().sum() > 0:
+        errors.append(f"{df[key].duplicated().sum()} duplicate values in {key}")
+    for col in expected_cols:
+        if col != key and df[col].isnull().sum() > 0:
+            errors.append(f"{df[col].isnull().sum()} NULL values in {col}")
+    return errors
+
+
+@pytest.mark.parametrize(
+    "rows",
+    [
+        [("1", "a", 10), ("2", "b", 20)],
+        [("1", "a", 10), ("1", "b", None), (None, "c", 5), (None, None, 5)],
+        [(None, "a", 1), (None, "b", 2), (None, "c", 3), ("9", "d", 4)],
+    ],
+)
+def test_rules_match_pandas(rows):
+    """Engine and pandas checks agree on pass/fail and error messages"""
+    hook = SQLiteHook(rows)
+    expected = pandas_errors(
+        hook.get_pandas_df(RELATION_SQL), "ccn", ["ccn", "name", "beds"]
+    )
+
+    if expected:
+        with pytest.raises(ValueError) as exc:
+            run_rule_set(hook, RULES, log)
+        assert str(exc.value) == "Validation failed:\n" + "\n".join(expected)
+    else:
+        stats = run_rule_set(hook, RULES, log)
+        assert stats["row_count"] == len(rows)
+
+
+def test_empty_relation():
+    hook = SQLiteHook([])
+    with pytest.raises(ValueError, match="Query returned no data from providers"):
+        run_rule_set(hook, RULES, log)
+
+
+def test_empty_fact_stage_passes():
+    # a ProviderInfo-only run loads no staffing batch, so nothing is staged
+    hook = SQLiteHook([])
+    hook.conn.execute(
+        "CREATE TABLE silver.Stage_DailyFacilityLogFact (ccn TEXT, workdateid TEXT,"
+        " numofpatient TEXT, staffingtypeid INTEGER, workhours REAL, updated_at TEXT)"
+    )
+    assert run_rule_set(hook, FACT_RULES, log, run_id="run_1") == {"row_count": 0}
+    assert hook.conn.execute("SELECT COUNT(*) FROM silver.dq_results").fetchone() == (
+        0,
+    )
+
+
+def test_missing_column():
+    hook = SQLiteHook([("1", "a", 10)])
+    rule_set = RuleSet(
+        "validate_providers", "providers", RELATION_SQL, [not_null("zip")]
+    )
+    with pytest.raises(ValueError, match=r"Missing expected columns: \['zip'\]"):
+        run_rule_set(hook, rule_set, log)
+
+
+def test_range_regex_and_reference_rules():
+    hook = SQLiteHook([("1", "a", -1, "AL"), ("2", "b", 5, "ny"), ("3", "c", 9, "TX")])
+    rule_set = RuleSet(
+        "validate_providers",
+        "providers",
+        "SELECT ccn, beds, state FROM providers",
+        [
+            accepted_range("beds", low=0),
+            matches("state", "^[A-Z]{2}$"),
+            references("state", "silver.states", "code"),
+        ],
+    )
+    with pytest.raises(ValueError) as exc:
+        run_rule_set(hook, rule_set, log)
+    assert str(exc.value).splitlines()[1:] == [
+        "1 values in beds outside [0, inf]",
+        "1 values in state do not match ^[A-Z]{2}$",
+        "2 values in state not found in silver.states.code",
+    ]
+
+
+def test_missing_reference_table_is_skipped():
+    hook = SQLiteHook([("1", "a", 1, "AL")])
+    rule_set = RuleSet(
+        "validate_providers",
+        "providers",
+        "SELECT ccn, state FROM providers",
+        [references("state", "silver.not_built_yet", "code")],
+    )
+    assert run_rule_set(hook, rule_set, log) == {"row_count": 1}
+
+
+def test_results_history_and_row_count_delta():
+    hook = SQLiteHook([("1", "a", 1), ("2", "b", 2), ("3", "c", 3), ("4", "d", 4)])
+    rule_set = RuleSet(
+        "validate_providers",
+        "providers",
+        RELATION_SQL,
+        [not_null("ccn"), row_count_delta(max_drop_pct=25)],
+    )
+    run_rule_set(hook, rule_set, log, run_id="run_1")
+    assert hook.get_records(
+        "SELECT rule_name, metric_value, passed FROM silver.dq_results ORDER BY rule_name"
+    ) == [("not_null_ccn", 0, 1), ("row_count", 4, 1), ("row_count_delta", 0, 1)]
+
+    hook.load([("1", "a", 1), ("2", "b", 2)])
+    with pytest.raises(ValueError, match=r"row count 2 dropped 50.0% from 4"):
+        run_rule_set(hook, rule_set, log, run_id="run_2")
+
+    # the failed run is no baseline: the next run is still compared with 4
+    with pytest.raises(ValueError, match=r"from 4 "):
+        run_rule_set(hook, rule_set, log, run_id="run_3")
+
+    # growth is never flagged
+    hook.load([(str(n), "x", n) for n in range(12)])
+    assert run_rule_set(hook, rule_set, log, run_id="run_4")["row_count_delta"] == 8
+    hook.load([(str(n), "x", n) for n in range(10)])
+    assert run_rule_set(hook, rule_set, log, run_id="run_5")["row_count_delta"] == -2
+
+
+def test_one_query_per_rule_set():
+    for rule_set in RULE_SETS.values():
+        sql = build_rule_sql(rule_set)
+        # one pass over the relation, plus one DISTINCT key join per reference
+        refs = sum(rule.kind == "references" for rule in rule_set.rules)
+        assert sql.count("FROM (") == 1
+        assert sql.count("LEFT JOIN (SELECT DISTINCT") == refs
+        assert sql.count("SELECT") == 1 + rule_set.relation_sql.count("SELECT") + refs
+
+
+def test_fact_types_are_checked_against_the_catalog():
+    # the staged fact is validated before transform_dim_staffing_type runs
+    (rule,) = [r for r in FACT_RULES.rules if r.kind == "references"]
+    assert (rule.ref_table, rule.ref_column) == (
+        "silver.staffingtypecatalog",
+        "staffingtypeid",
+    )
@@ -0,0 +1,313 @@
+"""
+===============================================================================
+    Benchmark: Lambda cold and warm invocations against local service stubs
+
+    Summary:
+    --------
+    Loads each Lambda in a fresh process (a cold container) and invokes it
+    --invocations times (the first is the cold invocation, the rest are
+    warm), with every service it calls replaced by an in-process stub that
+    answers after --latency-ms:
+
+      - ingest_gdrive_to_s3  Secrets Manager (the service-account secret,
+                             with a throwaway RSA key), the Google OAuth
+                             token endpoint, the Drive changes feed and one
+                             changed CSV to download, and S3 (page token,
+                             listing, upload)
+      - trigger_mwaa         MWAA create_cli_token and the web server's
+                             /aws_mwaa/cli endpoint over HTTPS (each new
+                             connection also pays --connect-ms for the TLS
+                             handshake)
+
+    For each Lambda it reports the module load time (including the boto3
+    and httplib2 imports), the cold invocation, the warm p50 / max, and how
+    many secret reads, token requests, client builds and connections the
+    cold and a warm invocation made: a warm invocation should only call the
+    APIs that do the work.
+
+    Usage:
+    ------
+        python lambda/benchmarks/bench_lambda_start.py
+        python lambda/benchmarks/bench_lambda_start.py --invocations 50 \\
+            --latency-ms 30 --connect-ms 60
+===============================================================================
+"""
+
+import argparse
+import base64
+import contextlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from unittest import mock
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), "..")
+LAMBDAS = ("ingest_gdrive_to_s3", "trigger_mwaa")
+
+TOKEN_URI = "https://oauth2.stub.local/token"
+CSV_BODY = b"PROVNUM,CY_Qtr,WorkDate\n015009,2024Q1,20240101\n"
+
+
+class Stubs:
+    """Call counts and simulated latency shared by every stub of one process."""
+
+    def __init__(self, latency, connect):
+        self.latency = latency
+        self.connect = connect
+        self.calls = Counter()
+
+    def call(self, name, latency=None):
+        self.calls[name] += 1
+        time.sleep(self.latency if latency is None else latency)
+
+
+def _service_account():
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    return {
+        "type": "service_account",
+        "project_id": "bench",
+        "private_key_id": "bench",
+        "private_key": pem,
+        "client_email": "bench@bench.iam.gserviceaccount.com",
+        "client_id": "1",
+        "token_uri": TOKEN_URI,
+    }
+
+
+class Paginator:
+    def __init__(self, stubs):
+        self.stubs = stubs
+
+    def paginate(self, **kwargs):
+        self.stubs.call("s3:ListObjectsV2")
+        yield {"Contents": []}
+
+
+class AwsClient:
+    """The AWS API calls the Lambdas make, answered locally."""
+
+    def __init__(self, stubs, service, secret):
+        self.stubs = stubs
+        self.service = service
+        self.secret = secret
+        stubs.call(f"client:{service}", latency=0)
+
+    def get_secret_value(self, SecretId):
+        self.stubs.call("secretsmanager:GetSecretValue")
+        return {"SecretString": json.dumps(self.secret)}
+
+    def get_object(self, Bucket, Key):
+        self.stubs.call("s3:GetObject")
+        return {"Body": io.BytesIO(json.dumps({"startPageToken": "1"}).encode())}
+
+    def put_object(self, **kwargs):
+        self.stubs.call("s3:PutObject")
+        return {}
+
+    def get_paginator(self, name):
+        return Paginator(self.stubs)
+
+    def create_cli_token(self, Name):
+        self.stubs.call("mwaa:CreateCliToken")
+        return {"CliToken": "token", "WebServerHostname": "mwaa.stub.local"}
+
+
+def _google_response(status, body, **headers):
+    import httplib2
+
+    response = httplib2.Response({"status": str(status), **headers})
+    return response, body
+
+
+def google_request(stubs):
+    """httplib2.Http.request answering the OAuth token and Drive endpoints."""
+
+    def request(http, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        if uri.startswith(TOKEN_URI):
+            stubs.call("google:token")
+            payload = {"access_token": "a", "expires_in": 3600, "token_type": "Bearer"}
+            return _google_response(200, json.dumps(payload).encode())
+        if "alt=media" in uri:
+            stubs.call("drive:download")
+            return _google_response(
+                200,
+                CSV_BODY,
+                **{"content-range": f"bytes 0-{len(CSV_BODY) - 1}/{len(CSV_BODY)}"},
+            )
+        if "/changes" in uri:
+            stubs.call("drive:changes.list")
+            changed = {
+                "id": "f1",
+                "name": "DailyNurseStaffing_2024Q1.csv",
+                "mimeType": "text/csv",
+                "parents": ["folder"],
+                "md5Checksum": "new",
+                "modifiedTime": datetime.now(timezone.utc).isoformat(),
+                "size": str(len(CSV_BODY)),
+            }
+            payload = {"newStartPageToken": "2", "changes": [{"file": changed}]}
+            return _google_response(200, json.dumps(payload).encode())
+        raise AssertionError(f"Unexpected Google request {method} {uri}")
+
+    return request
+
+
+class HttpsConnection:
+    """The MWAA web server: pays the handshake on the connection's first request."""
+
+    stubs = None
+
+    def __init__(self, host, *args, **kwargs):
+        self.connected = False
+
+    def request(self, method, url, body=None, headers=None):
+        if not self.connected:
+            self.stubs.call("https:connect", latency=self.stubs.connect)
+            self.connected = True
+        self.stubs.call("mwaa:cli")
+
+    def getresponse(self):
+        stdout = base64.b64encode(b"triggered").decode()
+        return mock.Mock(
+            status=200, read=lambda: repr({"stdout": stdout, "stderr": ""}).encode()
+        )
+
+    def close(self):
+        self.connected = False
+
+
+def _load(name):
+    path = os.path.join(LAMBDA_DIR, name, "lambda_function.py")
+    spec = importlib.util.spec_from_file_location(f"{name}_lambda", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _event(name):
+    if name == "trigger_mwaa":
+        record = {
+            "eventSource": "aws:s3",
+            "eventName": "ObjectCreated:Put",
+            "s3": {"object": {"key": "data/DailyNurseStaffing_2024Q1.csv"}},
+        }
+        return {"Records": [record]}
+    return {}
+
+
+def run_lambda(name, invocations, latency, connect):
+    """Load and invoke one Lambda in this (fresh) process; returns its timings."""
+    stubs = Stubs(latency, connect)
+    secret = _service_account()
+    HttpsConnection.stubs = stubs
+
+    # the load includes importing boto3 / httplib2, which patching does
+    started = time.perf_counter()
+    patches = [
+        mock.patch(
+            "boto3.client",
+            lambda service, *args, **kwargs: AwsClient(stubs, service, secret),
+        ),
+        mock.patch("httplib2.Http.request", google_request(stubs)),
+        mock.patch("http.client.HTTPSConnection", HttpsConnection),
+    ]
+    for patch in patches:
+        patch.start()
+    module = _load(name)
+    if name == "ingest_gdrive_to_s3":
+        module.FOLDER_ID = "folder"
+    load_seconds = time.perf_counter() - started
+
+    seconds = []
+    calls = []
+    for _ in range(invocations):
+        stubs.calls.clear()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            module.lambda_handler(_event(name), None)
+        seconds.append(time.perf_counter() - started)
+        calls.append(dict(stubs.calls))
+    return {
+        "lambda": name,
+        "load_s": load_seconds,
+        "cold_s": seconds[0],
+        "warm_p50_s": statistics.median(seconds[1:]) if len(seconds) > 1 else None,
+        "warm_max_s": max(seconds[1:]) if len(seconds) > 1 else None,
+        "cold_calls": calls[0],
+        "warm_calls": calls[-1] if len(calls) > 1 else {},
+    }
+
+
+def _ms(value):
+    return "-" if value is None else f"{value * 1000:.1f}"
+
+
+def report(results):
+    lines = [
+        f"{'lambda':<22}{'load ms':>9}{'cold ms':>9}{'warm p50':>10}{'warm max':>10}"
+    ]
+    for r in results:
+        lines.append(
+            f"{r['lambda']:<22}{_ms(r['load_s']):>9}{_ms(r['cold_s']):>9}"
+            f"{_ms(r['warm_p50_s']):>10}{_ms(r['warm_max_s']):>10}"
+        )
+    for r in results:
+        lines.append("")
+        lines.append(f"{r['lambda']} calls per invocation (cold / warm)")
+        for call in sorted(set(r["cold_calls"]) | set(r["warm_calls"])):
+            lines.append(
+                f"  {call:<34}{r['cold_calls'].get(call, 0):>5}"
+                f"{r['warm_calls'].get(call, 0):>7}"
+            )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--invocations", type=int, default=20)
+    parser.add_argument(
+        "--latency-ms", type=float, default=20.0, help="per stubbed API request"
+    )
+    parser.add_argument(
+        "--connect-ms", type=float, default=50.0, help="per new HTTPS connection"
+    )
+    parser.add_argument("--lambda", dest="lambdas", choices=LAMBDAS, action="append")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.lambdas or LAMBDAS:
+        # a fresh interpreter per Lambda: its first invocation is a cold start
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            results.append(
+                pool.submit(
+                    run_lambda,
+                    name,
+                    max(1, args.invocations),
+                    args.latency_ms / 1000,
+                    args.connect_ms / 1000,
+                ).result()
+            )
+    print(report(results))
+
+
+if __name__ == "__main__":
+    main()
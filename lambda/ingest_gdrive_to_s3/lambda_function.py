@@ -7,95 +7,347 @@
 
     Summary:
     --------
-    This AWS Lambda function automates the ingestion of CSV files from a 
-    specified Google Drive folder into an Amazon S3 bucket. The workflow 
+    This AWS Lambda function automates the ingestion of CSV files from a
+    specified Google Drive folder into an Amazon S3 bucket. The workflow
     includes the following key steps:
 
     1. Authenticate with Google Drive using a service account.
-    2. List all CSV files in the configured Google Drive folder.
-    3. For each file:
-         - Check if the file already exists in the target S3 bucket/prefix.
-         - If not present, download the file from Google Drive.
-         - Upload the file into Amazon S3.
-    4. Return a summary of uploaded files.
+    2. Find candidate CSV files in the configured Google Drive folder:
+         - SYNC_MODE=changes (default): read the Drive changes feed from the
+           start page token saved in S3 by the previous run (the first run
+           lists the whole folder and saves a token).
+         - SYNC_MODE=full: list the whole folder (all pages).
+    3. List the S3 `data/` prefix once and keep only files that are new or
+       changed (Drive md5Checksum / size / modifiedTime vs the S3 object).
+    4. Stream each of them from Google Drive into Amazon S3 in PART_SIZE_MB
+       chunks (multipart upload for files above one part), up to
+       MAX_WORKERS files concurrently.
+    5. Save the new changes page token and return a summary of uploaded files.
 
     Notes:
     ------
-    - Skips files that already exist in S3 (idempotent uploads).
-    - Requires a valid `credentials.json` service account key packaged 
+    - Skips files whose S3 copy is up to date (idempotent uploads); a file
+      re-uploaded to Drive under the same name is synced again.
+    - The page token is only advanced after every transfer succeeded.
+    - Peak memory is roughly PART_SIZE_MB x MAX_WORKERS (x2 while a chunk is
+      copied into the part buffer), independent of file size.
+    - Requires a valid `credentials.json` service account key packaged
       with the Lambda deployment.
-    - IAM role must allow `s3:HeadObject` and `s3:PutObject`.
+    - IAM role must allow `s3:ListBucket`, `s3:GetObject`, `s3:PutObject`
+      and `s3:AbortMultipartUpload`.
     - Only processes files with MIME type `text/csv`.
+    - Warm invocations reuse what the container already has: the S3 and
+      Secrets Manager clients, the service-account credentials (and their
+      OAuth access token) for SECRET_TTL_SECONDS, the Drive services and
+      the worker threads. The Drive client is built from the v3 discovery
+      document shipped with google-api-python-client (no discovery request),
+      parsed once per container; the Google libraries are imported on first
+      use.
 ===============================================================================
 """
 
 import boto3
+import io
 import json
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from botocore.exceptions import ClientError
 
 # Config
-FOLDER_ID = '1vjUpextEZWjX2DZEueRshk2GRAAmIQ1G'  # your Google Drive folder ID
-S3_BUCKET = 'health-data-project-bucket'
-S3_PREFIX = 'data/'  # target folder in S3
+FOLDER_ID = "1vjUpextEZWjX2DZEueRshk2GRAAmIQ1G"  # your Google Drive folder ID
+S3_BUCKET = "health-data-project-bucket"
+S3_PREFIX = "data/"  # target folder in S3
+PART_SIZE = (
+    max(5, int(os.environ.get("PART_SIZE_MB", "8"))) * 1024 * 1024
+)  # S3 minimum part is 5 MB
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", "4"))  # files transferred concurrently
+SYNC_MODE = os.environ.get("SYNC_MODE", "changes")  # 'changes' or 'full'
+PAGE_TOKEN_KEY = "state/gdrive_changes_page_token.json"  # outside S3_PREFIX
+FILE_FIELDS = "id, name, mimeType, parents, trashed, md5Checksum, modifiedTime, size"
+# Secret re-read after this long, so a rotated key is picked up by warm containers
+SECRET_TTL_SECONDS = int(os.environ.get("SECRET_TTL_SECONDS", "3600"))
 
-def get_gdrive_credentials():
+# Kept across warm invocations of the container
+_clients = {}
+_credentials = None  # (credentials, expires_at)
+_drive_document = None
+_executor = None
+
+# googleapiclient services are not thread-safe: one per worker thread
+_thread_local = threading.local()
+
+
+def get_client(name):
+    """boto3 client, created once per container (clients are thread-safe)."""
+    if name not in _clients:
+        _clients[name] = boto3.client(name)
+    return _clients[name]
+
+
+def get_gdrive_credentials(force=False):
     """
     Load Google Drive credentials from AWS Secrets Manager.
     The secret should contain the full JSON content of credentials.json.
+
+    The credentials are cached for SECRET_TTL_SECONDS; they keep their OAuth
+    access token (refreshed by google-auth when it expires) in between.
+    """
+    global _credentials
+    now = time.monotonic()
+    if force or _credentials is None or now >= _credentials[1]:
+        from google.oauth2 import service_account
+
+        secret_name = "gdrive_credential_json"  # your secret name
+        response = get_client("secretsmanager").get_secret_value(SecretId=secret_name)
+        secret_dict = json.loads(response["SecretString"])
+
+        # Create credentials from the JSON secret
+        creds = service_account.Credentials.from_service_account_info(
+            secret_dict, scopes=["https://www.googleapis.com/auth/drive"]
+        )
+        _credentials = (creds, now + SECRET_TTL_SECONDS)
+    return _credentials[0]
+
+
+def drive_document():
+    """The Drive v3 discovery document bundled with google-api-python-client."""
+    global _drive_document
+    if _drive_document is None:
+        from googleapiclient.discovery_cache import get_static_doc
+
+        _drive_document = json.loads(get_static_doc("drive", "v3"))
+    return _drive_document
+
+
+def get_drive_service(creds):
+    """Return the calling thread's Drive service, building it on first use."""
+    if getattr(_thread_local, "creds", None) is not creds:
+        from googleapiclient.discovery import build_from_document
+
+        _thread_local.service = build_from_document(drive_document(), credentials=creds)
+        _thread_local.creds = creds
+    return _thread_local.service
+
+
+def get_executor():
+    """Worker pool kept across invocations, with its threads' Drive services."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    return _executor
+
+
+def stream_file_to_s3(service, s3, file, s3_key, part_size=PART_SIZE):
+    """
+    Copy one Drive file to S3 holding at most one part in memory.
+
+    Drive is read in part_size chunks. Files that fit in a single chunk are
+    sent with put_object; larger files go through an S3 multipart upload,
+    one part per chunk, aborted if anything fails.
+    """
+    from googleapiclient.http import MediaIoBaseDownload
+
+    request = service.files().get_media(fileId=file["id"])
+    buffer = io.BytesIO()
+    downloader = MediaIoBaseDownload(buffer, request, chunksize=part_size)
+
+    _, done = downloader.next_chunk(num_retries=3)
+    if done:
+        s3.put_object(Bucket=S3_BUCKET, Key=s3_key, Body=buffer.getvalue())
+        return
+
+    upload_id = s3.create_multipart_upload(Bucket=S3_BUCKET, Key=s3_key)["UploadId"]
+    parts = []
+    try:
+        while True:
+            buffer.seek(0)
+            response = s3.upload_part(
+                Bucket=S3_BUCKET,
+                Key=s3_key,
+                UploadId=upload_id,
+                PartNumber=len(parts) + 1,
+                Body=buffer,
+            )
+            parts.append({"PartNumber": len(parts) + 1, "ETag": response["ETag"]})
+            buffer.seek(0)
+            buffer.truncate()
+            if done:
+                break
+            _, done = downloader.next_chunk(num_retries=3)
+
+        s3.complete_multipart_upload(
+            Bucket=S3_BUCKET,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=S3_BUCKET, Key=s3_key, UploadId=upload_id)
+        raise
+
+
+def list_folder_files(service):
+    """List every CSV in the Drive folder, following nextPageToken."""
+    files = []
+    page_token = None
+    while True:
+        results = (
+            service.files()
+            .list(
+                q=f"'{FOLDER_ID}' in parents and mimeType='text/csv' and trashed=false",
+                fields=f"nextPageToken, files({FILE_FIELDS})",
+                pageSize=1000,
+                pageToken=page_token,
+            )
+            .execute()
+        )
+        files.extend(results.get("files", []))
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return files
+
+
+def list_changed_files(service, page_token):
     """
-    secret_name = 'gdrive_credential_json'  # your secret name
-    region_name = boto3.session.Session().region_name
+    Read the Drive changes feed from page_token.
+
+    Returns the CSVs in the folder that were added or modified, and the
+    token to resume from next time.
+    """
+    changed = {}
+    while True:
+        results = (
+            service.changes()
+            .list(
+                pageToken=page_token,
+                spaces="drive",
+                fields=(
+                    "nextPageToken, newStartPageToken, "
+                    f"changes(fileId, removed, file({FILE_FIELDS}))"
+                ),
+                pageSize=1000,
+            )
+            .execute()
+        )
+        for change in results.get("changes", []):
+            file = change.get("file")
+            if change.get("removed") or not file or file.get("trashed"):
+                continue
+            if file.get("mimeType") == "text/csv" and FOLDER_ID in file.get(
+                "parents", []
+            ):
+                changed[file["id"]] = file  # later changes of a file win
+        if "newStartPageToken" in results:
+            return list(changed.values()), results["newStartPageToken"]
+        page_token = results["nextPageToken"]
+
 
-    client = boto3.client('secretsmanager', region_name=region_name)
-    response = client.get_secret_value(SecretId=secret_name)
-    secret_dict = json.loads(response['SecretString'])
+def load_page_token(s3):
+    try:
+        response = s3.get_object(Bucket=S3_BUCKET, Key=PAGE_TOKEN_KEY)
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "NoSuchKey":
+            raise
+        return None
+    return json.loads(response["Body"].read())["startPageToken"]
 
-    # Create credentials from the JSON secret
-    creds = service_account.Credentials.from_service_account_info(
-        secret_dict,
-        scopes=['https://www.googleapis.com/auth/drive']
+
+def save_page_token(s3, page_token):
+    body = json.dumps(
+        {
+            "startPageToken": page_token,
+            "savedAt": datetime.now(timezone.utc).isoformat(),
+        }
     )
-    return creds
+    s3.put_object(Bucket=S3_BUCKET, Key=PAGE_TOKEN_KEY, Body=body.encode("utf-8"))
+
+
+def list_s3_objects(s3):
+    """One paginated listing of S3_PREFIX: key -> object summary."""
+    objects = {}
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=S3_PREFIX):
+        for obj in page.get("Contents", []):
+            objects[obj["Key"]] = obj
+    return objects
+
+
+def needs_upload(file, obj):
+    """
+    Decide whether a Drive file must be (re)copied over its S3 object.
+
+    Single-part uploads have the file's MD5 as ETag, so a matching Drive
+    md5Checksum proves the copy is current. Otherwise (multipart ETag, or
+    Drive files without checksum) the copy is current when the sizes match
+    and it is not older than the Drive modification.
+    """
+    if obj is None:
+        return True
+    if file.get("md5Checksum") and obj["ETag"].strip('"') == file["md5Checksum"]:
+        return False
+    if "size" in file and int(file["size"]) != obj["Size"]:
+        return True
+    modified = datetime.fromisoformat(file["modifiedTime"].replace("Z", "+00:00"))
+    return modified > obj["LastModified"]
+
 
 def lambda_handler(event, context):
     # ✅ Authenticate with Google using credentials from Secrets Manager
     creds = get_gdrive_credentials()
-    service = build('drive', 'v3', credentials=creds)
+    service = get_drive_service(creds)
 
-    # List CSV files in the Google Drive folder
-    results = service.files().list(
-        q=f"'{FOLDER_ID}' in parents and mimeType='text/csv'",
-        fields="files(id, name)"
-    ).execute()
-    files = results.get('files', [])
+    s3 = get_client("s3")
 
-    s3 = boto3.client('s3')
-    uploaded = []
+    # Candidate files: changes since the saved page token, or the whole folder
+    page_token = None
+    if SYNC_MODE == "changes":
+        page_token = load_page_token(s3)
+    if page_token:
+        files, new_page_token = list_changed_files(service, page_token)
+    else:
+        if SYNC_MODE == "changes":
+            # Take the token before listing so nothing changed mid-listing is lost
+            new_page_token = (
+                service.changes().getStartPageToken().execute()["startPageToken"]
+            )
+        files = list_folder_files(service)
+
+    # One bulk listing instead of a HEAD request per file
+    objects = list_s3_objects(s3)
+    pending = []
 
     for file in files:
         s3_key = f"{S3_PREFIX}{file['name']}"
 
-        # Check if file already exists in S3
-        try:
-            s3.head_object(Bucket=S3_BUCKET, Key=s3_key)
-            print(f"Skipping {file['name']} (already exists in S3)")
-            continue  # Skip upload if file exists
-        except ClientError as e:
-            if e.response['Error']['Code'] != "404":
-                raise  # Only ignore "Not Found" errors
-
-        # Download file from Google Drive
-        file_data = service.files().get_media(fileId=file['id']).execute()
-
-        # Upload to S3
-        s3.put_object(Bucket=S3_BUCKET, Key=s3_key, Body=file_data)
+        if not needs_upload(file, objects.get(s3_key)):
+            print(f"Skipping {file['name']} (S3 copy is up to date)")
+            continue
+
+        pending.append((file, s3_key))
+
+    def transfer(item):
+        file, s3_key = item
+        stream_file_to_s3(get_drive_service(creds), s3, file, s3_key)
         print(f"Uploaded {file['name']} to s3://{S3_BUCKET}/{s3_key}")
-        uploaded.append(file['name'])
+        return file["name"]
+
+    # Bounded pool: memory stays ~PART_SIZE x MAX_WORKERS whatever the file sizes
+    uploaded = []
+    errors = []
+    futures = [get_executor().submit(transfer, item) for item in pending]
+    for future in futures:
+        try:
+            uploaded.append(future.result())
+        except Exception as e:
+            errors.append(e)
+
+    if errors:
+        raise errors[0]
+
+    if SYNC_MODE == "changes":
+        save_page_token(s3, new_page_token)
 
-    return {
-        'status': 'success',
-        'files_uploaded': uploaded,
-        'count': len(uploaded)
-    }
+    return {"status": "success", "files_uploaded": uploaded, "count": len(uploaded)}
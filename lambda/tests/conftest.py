@@ -0,0 +1,32 @@
+"""
+Test configuration: every Lambda is a standalone ``lambda_function.py``, so
+tests load a fresh copy of the module (a cold container) per test.
+"""
+
+import importlib.util
+import os
+
+import pytest
+
+LAMBDA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# The Lambda runtime always sets the region the boto3 clients are created in
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+def load_lambda(name):
+    path = os.path.join(LAMBDA_DIR, name, "lambda_function.py")
+    spec = importlib.util.spec_from_file_location(f"{name}_lambda_function", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def gdrive():
+    return load_lambda("ingest_gdrive_to_s3")
+
+
+@pytest.fixture
+def trigger():
+    return load_lambda("trigger_mwaa")
@@ -0,0 +1,380 @@
+"""ingest_gdrive_to_s3 tests: part streaming, syncing new or changed files, warm reuse."""
+
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from botocore.exceptions import ClientError
+
+PART = 5
+FOLDER = "folder"
+SYNCED_AT = datetime(2025, 10, 7, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeS3:
+    """The S3 calls of the Lambda on an in-memory bucket."""
+
+    def __init__(self, fail_part=None, listing=None):
+        self.objects = {}
+        self.uploads = {}
+        self.aborted = []
+        self.fail_part = fail_part
+        # key -> ListObjectsV2 entry of objects already in the bucket
+        self.listing = listing or {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = Body
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def get_paginator(self, name):
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        contents = [dict(obj, Key=key) for key, obj in self.listing.items()]
+        yield {"Contents": contents} if contents else {}
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload{len(self.uploads) + 1}"
+        self.uploads[upload_id] = []
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_part:
+            raise RuntimeError("part failed")
+        self.uploads[UploadId].append((PartNumber, Body.read()))
+        return {"ETag": f"etag{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        assert [p["PartNumber"] for p in MultipartUpload["Parts"]] == [
+            n for n, _ in parts
+        ]
+        self.objects[Key] = b"".join(body for _, body in parts)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+        self.aborted.append(Key)
+
+
+class FakeDownloader:
+    """MediaIoBaseDownload over the bytes of a FakeDrive file."""
+
+    def __init__(self, fd, request, chunksize):
+        self.fd = fd
+        self.data = request
+        self.chunksize = chunksize
+        self.offset = 0
+
+    def next_chunk(self, num_retries=0):
+        chunk = self.data[self.offset : self.offset + self.chunksize]
+        self.fd.write(chunk)
+        self.offset += len(chunk)
+        return None, self.offset >= len(self.data)
+
+
+class Request:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeDrive:
+    """
+    Drive v3 files / changes on in-memory data: ``contents`` by file id, the
+    folder ``listing`` and the ``changes`` feed as ``{page_token: page}``.
+    """
+
+    def __init__(self, contents=None, listing=(), changes=None, start_token="10"):
+        self.contents = contents or {}
+        self.listing = list(listing)
+        self.changes_pages = changes or {}
+        self.start_token = start_token
+        self.calls = []
+
+    def files(self):
+        return self
+
+    def changes(self):
+        return self
+
+    def get_media(self, fileId):
+        return self.contents[fileId]
+
+    def list(self, pageToken=None, **kwargs):
+        if "spaces" in kwargs:
+            self.calls.append(("changes.list", pageToken))
+            return Request(self.changes_pages[pageToken])
+        self.calls.append(("files.list", pageToken))
+        return Request({"files": self.listing})
+
+    def getStartPageToken(self):
+        self.calls.append(("changes.getStartPageToken", None))
+        return Request({"startPageToken": self.start_token})
+
+
+def drive_file(file_id, name, body=b"a,b\n", **fields):
+    return dict(
+        {
+            "id": file_id,
+            "name": name,
+            "mimeType": "text/csv",
+            "parents": [FOLDER],
+            "md5Checksum": f"md5-{file_id}",
+            "modifiedTime": SYNCED_AT.isoformat().replace("+00:00", "Z"),
+            "size": str(len(body)),
+        },
+        **fields,
+    )
+
+
+def s3_object(etag, size, last_modified=SYNCED_AT):
+    return {"ETag": f'"{etag}"', "Size": size, "LastModified": last_modified}
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    import googleapiclient.http
+
+    monkeypatch.setattr(googleapiclient.http, "MediaIoBaseDownload", FakeDownloader)
+
+
+def test_small_file_is_a_single_put(gdrive, downloads):
+    s3 = FakeS3()
+    drive = FakeDrive({"f1": b"a,b\n1,2\n"})
+    gdrive.stream_file_to_s3(drive, s3, {"id": "f1"}, "data/a.csv", part_size=PART)
+    assert s3.objects == {"data/a.csv": b"a,b\n1,2\n"}
+    assert s3.uploads == {}
+
+
+@pytest.mark.parametrize("size", [PART + 1, 2 * PART, 3 * PART - 1])
+def test_large_file_is_uploaded_in_parts(gdrive, downloads, size):
+    body = bytes(range(size))
+    s3 = FakeS3()
+    gdrive.stream_file_to_s3(
+        FakeDrive({"f1": body}), s3, {"id": "f1"}, "data/a.csv", part_size=PART
+    )
+    assert s3.objects == {"data/a.csv": body}
+    assert s3.uploads == {} and s3.aborted == []
+
+
+def test_failed_part_aborts_the_upload(gdrive, downloads):
+    s3 = FakeS3(fail_part=2)
+    with pytest.raises(RuntimeError, match="part failed"):
+        gdrive.stream_file_to_s3(
+            FakeDrive({"f1": b"x" * (3 * PART)}),
+            s3,
+            {"id": "f1"},
+            "data/a.csv",
+            part_size=PART,
+        )
+    assert s3.aborted == ["data/a.csv"]
+    assert s3.objects == {} and s3.uploads == {}
+
+
+@pytest.fixture
+def sync(gdrive, downloads, monkeypatch):
+    """Run the handler against a FakeDrive and FakeS3."""
+    monkeypatch.setattr(gdrive, "FOLDER_ID", FOLDER)
+    monkeypatch.setattr(gdrive, "get_gdrive_credentials", lambda: "creds")
+
+    def run(drive, s3):
+        monkeypatch.setattr(gdrive, "get_drive_service", lambda creds: drive)
+        monkeypatch.setitem(gdrive._clients, "s3", s3)
+        return gdrive.lambda_handler({}, None)
+
+    return run
+
+
+@pytest.mark.parametrize(
+    "obj, fields, upload",
+    [
+        (None, {}, True),
+        # single-part copy: the ETag is the MD5
+        (s3_object("md5-f1", 4), {}, False),
+        (s3_object("other", 4), {"size": "5"}, True),
+        # multipart ETag: size, then modification time decide
+        (s3_object("abc-2", 4), {}, False),
+        (s3_object("abc-2", 9), {}, True),
+        (s3_object("abc-2", 4, SYNCED_AT - timedelta(minutes=1)), {}, True),
+        # no Drive checksum and size
+        (s3_object("abc", 4), {"md5Checksum": None}, False),
+    ],
+)
+def test_needs_upload(gdrive, obj, fields, upload):
+    assert gdrive.needs_upload(drive_file("f1", "a.csv", **fields), obj) is upload
+
+
+def test_page_token_round_trip(gdrive):
+    s3 = FakeS3()
+    assert gdrive.load_page_token(s3) is None
+    gdrive.save_page_token(s3, "42")
+    assert gdrive.load_page_token(s3) == "42"
+    assert json.loads(s3.objects[gdrive.PAGE_TOKEN_KEY])["startPageToken"] == "42"
+
+
+def test_page_token_read_errors_are_raised(gdrive):
+    class DeniedS3(FakeS3):
+        def get_object(self, Bucket, Key):
+            raise ClientError({"Error": {"Code": "AccessDenied"}}, "GetObject")
+
+    with pytest.raises(ClientError):
+        gdrive.load_page_token(DeniedS3())
+
+
+def test_changes_feed_keeps_the_latest_csv_of_the_folder(gdrive, monkeypatch):
+    monkeypatch.setattr(gdrive, "FOLDER_ID", FOLDER)
+    first = drive_file("f1", "a.csv", md5Checksum="old")
+    latest = drive_file("f1", "a.csv", md5Checksum="new")
+    drive = FakeDrive(
+        changes={
+            "1": {
+                "nextPageToken": "2",
+                "changes": [
+                    {"fileId": "f1", "file": first},
+                    {"fileId": "f2", "removed": True},
+                    {"fileId": "f3", "file": drive_file("f3", "c.csv", trashed=True)},
+                    {"fileId": "f4", "file": drive_file("f4", "d.csv", parents=["x"])},
+                    {
+                        "fileId": "f5",
+                        "file": drive_file("f5", "e.txt", mimeType="text/plain"),
+                    },
+                ],
+            },
+            "2": {
+                "newStartPageToken": "3",
+                "changes": [{"fileId": "f1", "file": latest}],
+            },
+        }
+    )
+    files, token = gdrive.list_changed_files(drive, "1")
+    assert files == [latest]
+    assert token == "3"
+
+
+def test_first_sync_lists_the_folder_and_saves_a_start_token(gdrive, sync):
+    current = drive_file("f1", "a.csv")
+    new = drive_file("f2", "b.csv", body=b"x,y\n")
+    drive = FakeDrive(
+        contents={"f2": b"x,y\n"}, listing=[current, new], start_token="10"
+    )
+    s3 = FakeS3(listing={"data/a.csv": s3_object("md5-f1", 4)})
+
+    result = sync(drive, s3)
+    assert result["files_uploaded"] == ["b.csv"]
+    assert s3.objects["data/b.csv"] == b"x,y\n"
+    # the token is taken before listing, so nothing changed meanwhile is lost
+    assert [name for name, _ in drive.calls] == [
+        "changes.getStartPageToken",
+        "files.list",
+    ]
+    assert gdrive.load_page_token(s3) == "10"
+
+
+def test_changes_sync_uploads_changed_files_and_advances_the_token(gdrive, sync):
+    # a.csv was edited in Drive after its last sync
+    s3 = FakeS3(
+        listing={"data/a.csv": s3_object("md5-old", 4, SYNCED_AT - timedelta(days=1))}
+    )
+    gdrive.save_page_token(s3, "5")
+    drive = FakeDrive(
+        contents={"f1": b"a,b\n"},
+        changes={
+            "5": {
+                "newStartPageToken": "6",
+                "changes": [{"file": drive_file("f1", "a.csv")}],
+            }
+        },
+    )
+
+    assert sync(drive, s3)["files_uploaded"] == ["a.csv"]
+    assert ("files.list", None) not in drive.calls
+    assert gdrive.load_page_token(s3) == "6"
+
+    # nothing changed since: no upload, the token still moves on
+    drive.changes_pages["6"] = {"newStartPageToken": "7", "changes": []}
+    assert sync(drive, s3)["count"] == 0
+    assert gdrive.load_page_token(s3) == "7"
+
+
+def test_failed_transfer_keeps_the_page_token(gdrive, sync):
+    s3 = FakeS3()
+    gdrive.save_page_token(s3, "5")
+    changes = [{"file": drive_file("f1", "a.csv")}, {"file": drive_file("f2", "b.csv")}]
+    # f2 cannot be downloaded
+    drive = FakeDrive(
+        contents={"f1": b"a,b\n"},
+        changes={"5": {"newStartPageToken": "6", "changes": changes}},
+    )
+
+    with pytest.raises(KeyError):
+        sync(drive, s3)
+    assert s3.objects["data/a.csv"] == b"a,b\n"
+    # the next run reads the same changes again
+    assert gdrive.load_page_token(s3) == "5"
+
+
+def test_warm_invocations_reuse_clients_and_credentials(gdrive, monkeypatch):
+    from google.oauth2 import service_account
+
+    created = []
+    secrets = []
+
+    class FakeSecrets:
+        def get_secret_value(self, SecretId):
+            secrets.append(SecretId)
+            return {"SecretString": json.dumps({"client_email": "sa@x"})}
+
+    def client(name):
+        created.append(name)
+        return FakeSecrets()
+
+    clock = [0.0]
+    monkeypatch.setattr(gdrive.boto3, "client", client)
+    monkeypatch.setattr(gdrive.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(
+        service_account.Credentials,
+        "from_service_account_info",
+        lambda info, scopes: object(),
+    )
+
+    creds = gdrive.get_gdrive_credentials()
+    assert gdrive.get_gdrive_credentials() is creds
+    assert gdrive.get_client("secretsmanager") is gdrive.get_client("secretsmanager")
+    assert (created, len(secrets)) == (["secretsmanager"], 1)
+
+    # a rotated secret is picked up after the TTL
+    clock[0] += gdrive.SECRET_TTL_SECONDS
+    assert gdrive.get_gdrive_credentials() is not creds
+    assert (created, len(secrets)) == (["secretsmanager"], 2)
+
+
+def test_drive_service_is_built_once_per_thread_and_credentials(gdrive, monkeypatch):
+    import googleapiclient.discovery
+
+    built = []
+
+    def build_from_document(document, credentials):
+        built.append(credentials)
+        return object()
+
+    monkeypatch.setattr(
+        googleapiclient.discovery, "build_from_document", build_from_document
+    )
+    service = gdrive.get_drive_service("creds")
+    assert gdrive.get_drive_service("creds") is service
+    # the worker threads, kept across invocations, each build their own
+    pool = gdrive.get_executor()
+    assert gdrive.get_executor() is pool
+    assert pool.submit(gdrive.get_drive_service, "creds").result() is not service
+    assert gdrive.get_drive_service("renewed") is not service
+    assert built == ["creds", "creds", "renewed"]
+    # the bundled discovery document: parsed once, no request
+    assert gdrive.drive_document() is gdrive.drive_document()
+    assert gdrive.drive_document()["name"] == "drive"
@@ -0,0 +1,167 @@
+"""trigger_mwaa tests: S3 keys from the events, the conf payload, and token / connection reuse."""
+
+import base64
+import http.client
+import json
+import shlex
+
+import pytest
+
+
+def s3_record(key, event_name="ObjectCreated:Put"):
+    return {
+        "eventSource": "aws:s3",
+        "eventName": event_name,
+        "s3": {"object": {"key": key}},
+    }
+
+
+def sqs_record(*s3_records):
+    return {"eventSource": "aws:sqs", "body": json.dumps({"Records": list(s3_records)})}
+
+
+class FakeMwaa:
+    def __init__(self):
+        self.tokens = 0
+
+    def create_cli_token(self, Name):
+        self.tokens += 1
+        return {"CliToken": f"token{self.tokens}", "WebServerHostname": "mwaa.local"}
+
+
+class FakeResponse:
+    def __init__(self, status, stdout=b"triggered"):
+        self.status = status
+        self.body = repr({"stdout": base64.b64encode(stdout).decode(), "stderr": ""})
+
+    def read(self):
+        return self.body.encode()
+
+
+class FakeConnection:
+    """The web server; ``send_errors`` / ``read_errors`` fail the next calls."""
+
+    opened = []
+
+    def __init__(self, host):
+        self.host = host
+        self.requests = []
+        self.send_errors = []
+        self.read_errors = []
+        self.statuses = []
+        self.closed = False
+        FakeConnection.opened.append(self)
+
+    def request(self, method, url, body=None, headers=None):
+        if self.send_errors:
+            raise self.send_errors.pop(0)
+        self.requests.append((method, url, body, headers))
+
+    def getresponse(self):
+        if self.read_errors:
+            raise self.read_errors.pop(0)
+        return FakeResponse(self.statuses.pop(0) if self.statuses else 200)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def mwaa(trigger, monkeypatch):
+    FakeConnection.opened = []
+    fake = FakeMwaa()
+    monkeypatch.setattr(trigger.boto3, "client", lambda name: fake)
+    monkeypatch.setattr(trigger.http.client, "HTTPSConnection", FakeConnection)
+    return fake
+
+
+def test_new_csv_keys_from_s3_and_sqs_events(trigger):
+    event = {
+        "Records": [
+            s3_record("data/DailyNurseStaffing_2024Q1.csv"),
+            sqs_record(
+                s3_record("data/Provider+Info%282024%29.csv"),
+                s3_record("data/DailyNurseStaffing_2024Q1.csv"),
+                s3_record("data/notes.txt"),
+                s3_record("quarantine/bad.csv"),
+                s3_record("data/gone.csv", "ObjectRemoved:Delete"),
+            ),
+            # s3:TestEvent
+            {"eventSource": "aws:sqs", "body": json.dumps({"Event": "s3:TestEvent"})},
+        ]
+    }
+    assert trigger.new_csv_keys(event) == [
+        "data/DailyNurseStaffing_2024Q1.csv",
+        "data/Provider Info(2024).csv",
+    ]
+
+
+def test_handler_passes_the_keys_as_conf(trigger, mwaa):
+    keys = ["data/a b.csv", "data/it's.csv"]
+    result = trigger.lambda_handler({"Records": [s3_record(k) for k in keys]}, None)
+    assert result == b"triggered"
+
+    (conn,) = FakeConnection.opened
+    method, url, payload, headers = conn.requests[0]
+    assert (method, url) == ("POST", "/aws_mwaa/cli")
+    assert headers["Authorization"] == "Bearer token1"
+    args = shlex.split(payload)
+    assert args[:3] == ["dags", "trigger", trigger.dag_name]
+    assert args[3] == "--conf"
+    assert json.loads(args[4]) == {"s3_keys": keys}
+
+
+def test_handler_without_new_csvs_triggers_nothing(trigger, mwaa):
+    event = {"Records": [s3_record("data/notes.txt")]}
+    assert trigger.lambda_handler(event, None) is None
+    assert trigger.client is None
+    assert FakeConnection.opened == []
+
+
+def test_warm_invocations_reuse_token_and_connection(trigger, mwaa, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(trigger.time, "monotonic", lambda: clock[0])
+    event = {"Records": [s3_record("data/a.csv")]}
+
+    trigger.lambda_handler(event, None)
+    clock[0] += 5
+    trigger.lambda_handler(event, None)
+    assert mwaa.tokens == 1
+    assert len(FakeConnection.opened) == 1
+    assert len(FakeConnection.opened[0].requests) == 2
+
+    # the token expires; the idle connection is replaced
+    clock[0] += trigger.TOKEN_TTL_SECONDS
+    trigger.lambda_handler(event, None)
+    assert mwaa.tokens == 2
+    assert len(FakeConnection.opened) == 2
+    assert FakeConnection.opened[0].closed
+
+
+def test_revoked_token_is_renewed_once(trigger, mwaa):
+    conn = trigger.get_connection("mwaa.local")
+    conn.statuses = [401, 200]
+    assert trigger.run_cli("dags trigger x") == b"triggered"
+    assert mwaa.tokens == 2
+    assert [r[3]["Authorization"] for r in conn.requests] == [
+        "Bearer token1",
+        "Bearer token2",
+    ]
+
+
+def test_failed_send_is_retried_on_a_new_connection(trigger, mwaa):
+    stale = trigger.get_connection("mwaa.local")
+    stale.send_errors = [BrokenPipeError()]
+    assert trigger.post("mwaa.local", "payload", {}) == (200, FakeResponse(200).read())
+    assert stale.closed and stale.requests == []
+    assert len(FakeConnection.opened) == 2
+    assert len(FakeConnection.opened[1].requests) == 1
+
+
+def test_failure_after_the_request_went_out_is_not_retried(trigger, mwaa):
+    conn = trigger.get_connection("mwaa.local")
+    conn.read_errors = [http.client.RemoteDisconnected("closed")]
+    with pytest.raises(http.client.RemoteDisconnected):
+        trigger.post("mwaa.local", "payload", {})
+    assert len(conn.requests) == 1
+    assert len(FakeConnection.opened) == 1
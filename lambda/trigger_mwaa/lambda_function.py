@@ -7,22 +7,39 @@
 
     Summary:
     --------
-    This AWS Lambda function programmatically triggers an Apache Airflow DAG 
-    running in Amazon Managed Workflows for Apache Airflow (MWAA). The workflow 
+    This AWS Lambda function programmatically triggers an Apache Airflow DAG
+    running in Amazon Managed Workflows for Apache Airflow (MWAA). The workflow
     includes the following key steps:
 
-    1. Request a temporary CLI token from the MWAA environment.
-    2. Establish an HTTPS connection to the MWAA web server.
-    3. Construct and send a CLI command (`dags trigger <dag_name>`).
+    1. Collect the S3 keys of the object-created events in the invocation
+       (S3 notifications delivered through SQS, or direct S3 notifications),
+       keeping only new CSVs under `data/`.
+    2. Reuse the MWAA CLI token while it is still valid, otherwise request a
+       new one from the MWAA environment.
+    3. Send one CLI command (`dags trigger <dag_name> --conf ...`) for the
+       whole batch; the keys are passed as {"s3_keys": [...]} so the DAG
+       ingests exactly those files instead of re-listing the bucket.
     4. Parse the response and decode the output for logging or downstream use.
 
     Notes:
     ------
+    - Bursts are coalesced by the SQS trigger: set its batching window
+      (MaximumBatchingWindowInSeconds, up to 300) to the debounce window and
+      its BatchSize high enough for a burst; every event delivered in the
+      window ends up in a single DAG run.
     - MWAA environment name is defined in `mwaa_env_name`.
     - DAG name to trigger is defined in `dag_name`.
     - Requires IAM permissions to call `mwaa:create_cli_token`.
-    - Returns the decoded CLI output from MWAA.
+    - Returns the decoded CLI output from MWAA (None when the batch held no
+      new CSVs and nothing was triggered).
     - Designed for event-driven orchestration (e.g., CloudWatch, API Gateway).
+    - Warm invocations reuse the MWAA client, the CLI token and the HTTPS
+      connection to the web server (kept alive; reopened after
+      CONNECTION_IDLE_SECONDS idle, or once if sending on it fails). The
+      MWAA client is created on first use, so batches with nothing to
+      trigger never build it.
+    - Only sending the trigger is retried: a failure after the request went
+      out is raised, since MWAA may already have started the run.
 ===============================================================================
 """
 
@@ -30,27 +47,131 @@ import boto3
 import http.client
 import base64
 import ast
-mwaa_env_name = 'health_data_project_mwaa'
-dag_name = 'health_data_project_dag'
-mwaa_cli_command = 'dags trigger'
-​
-client = boto3.client('mwaa')
-​
-def lambda_handler(event, context):
-    # get web token
-    mwaa_cli_token = client.create_cli_token(
-        Name=mwaa_env_name
-    )
-    
-    conn = http.client.HTTPSConnection(mwaa_cli_token['WebServerHostname'])
-    payload = mwaa_cli_command + " " + dag_name
-    headers = {
-      'Authorization': 'Bearer ' + mwaa_cli_token['CliToken'],
-      'Content-Type': 'text/plain'
-    }
-    conn.request("POST", "/aws_mwaa/cli", payload, headers)
+import json
+import shlex
+import time
+from urllib.parse import unquote_plus
+
+mwaa_env_name = "health_data_project_mwaa"
+dag_name = "health_data_project_dag"
+mwaa_cli_command = "dags trigger"
+s3_prefix = "data/"
+
+# MWAA CLI tokens are valid for 60 seconds; renew a little before that
+TOKEN_TTL_SECONDS = 60
+TOKEN_RENEW_MARGIN_SECONDS = 10
+# Idle connections are reopened before the load balancer's 60s idle timeout
+CONNECTION_IDLE_SECONDS = 50
+
+# Kept across warm invocations of the container
+client = None
+# (token, hostname, expires_at)
+_cli_token = None
+# (hostname, HTTPSConnection, reopen_at)
+_connection = None
+
+
+def get_client():
+    global client
+    if client is None:
+        client = boto3.client("mwaa")
+    return client
+
+
+def get_cli_token(force=False):
+    global _cli_token
+    now = time.monotonic()
+    if force or _cli_token is None or now >= _cli_token[2]:
+        mwaa_cli_token = get_client().create_cli_token(Name=mwaa_env_name)
+        _cli_token = (
+            mwaa_cli_token["CliToken"],
+            mwaa_cli_token["WebServerHostname"],
+            now + TOKEN_TTL_SECONDS - TOKEN_RENEW_MARGIN_SECONDS,
+        )
+    return _cli_token[0], _cli_token[1]
+
+
+def s3_records(event):
+    """Yield the S3 notification records of a direct or SQS-delivered event."""
+    for record in event.get("Records", []):
+        if record.get("eventSource") == "aws:sqs":
+            # s3:TestEvent messages carry no Records
+            yield from json.loads(record["body"]).get("Records", [])
+        elif record.get("eventSource") == "aws:s3":
+            yield record
+
+
+def new_csv_keys(event):
+    """Object-created CSV keys under the data prefix, deduplicated, in arrival order."""
+    keys = []
+    for record in s3_records(event):
+        if not record.get("eventName", "").startswith("ObjectCreated"):
+            continue
+        key = unquote_plus(record["s3"]["object"]["key"])
+        if (
+            key.startswith(s3_prefix)
+            and key.lower().endswith(".csv")
+            and key not in keys
+        ):
+            keys.append(key)
+    return keys
+
+
+def get_connection(hostname, fresh=False):
+    """The kept-alive HTTPS connection to the MWAA web server."""
+    global _connection
+    now = time.monotonic()
+    conn = None
+    # the load balancer in front of the web server drops idle connections:
+    # open a new one rather than send on a socket it has likely closed
+    if _connection is not None:
+        if fresh or _connection[0] != hostname or now >= _connection[2]:
+            _connection[1].close()
+        else:
+            conn = _connection[1]
+    if conn is None:
+        conn = http.client.HTTPSConnection(hostname)
+    _connection = (hostname, conn, now + CONNECTION_IDLE_SECONDS)
+    return conn
+
+
+def post(hostname, payload, headers):
+    """
+    POST the CLI command. Only sending is retried, once on a new connection
+    (the kept-alive one may have been closed by the server): once the request
+    went out MWAA may have triggered the DAG already, so a failure reading
+    the response is raised rather than risk a second run for the same keys.
+    """
+    try:
+        conn = get_connection(hostname)
+        conn.request("POST", "/aws_mwaa/cli", payload, headers)
+    except (http.client.HTTPException, ConnectionError):
+        conn = get_connection(hostname, fresh=True)
+        conn.request("POST", "/aws_mwaa/cli", payload, headers)
     res = conn.getresponse()
-    data = res.read()
+    return res.status, res.read()
+
+
+def run_cli(payload):
+    for attempt in range(2):
+        token, hostname = get_cli_token(force=attempt > 0)
+        headers = {"Authorization": "Bearer " + token, "Content-Type": "text/plain"}
+        status, data = post(hostname, payload, headers)
+        # a cached token revoked or expired early: renew it once
+        if status not in (401, 403):
+            break
     dict_str = data.decode("UTF-8")
     mydata = ast.literal_eval(dict_str)
-    return base64.b64decode(mydata['stdout'])
\ No newline at end of file
+    return base64.b64decode(mydata["stdout"])
+
+
+def lambda_handler(event, context):
+    keys = new_csv_keys(event)
+    if not keys:
+        print("No new CSV objects in this batch, nothing to trigger")
+        return None
+
+    conf = json.dumps({"s3_keys": keys})
+    payload = mwaa_cli_command + " " + dag_name + " --conf " + shlex.quote(conf)
+    print(f"Triggering {dag_name} for {len(keys)} file(s)")
+    return run_cli(payload)